@@ -1,9 +1,30 @@
 import pandas as pd
 import os
 import re
-from typing import List, Dict, Tuple, Optional
+import argparse
+import datetime
+import hashlib
+import inspect
+import json
+import pickle
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 import numpy as np
 
+# Analizador de expresiones regulares de la biblioteca estándar (para validar prefiltros)
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+
 # Para exportar a Excel
 try:
     import openpyxl
@@ -11,17 +32,1080 @@ except ImportError:
     print("Advertencia: openpyxl no está instalado. La exportación a Excel no estará disponible.")
     print("Instale openpyxl con: pip install openpyxl")
 
+# Para exportar a Parquet (salida columnar tipada)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+    print("Advertencia: pyarrow no está instalado. La exportación a Parquet no estará disponible.")
+    print("Instale pyarrow con: pip install pyarrow")
+
+
+# ---------------------------------------------------------------------------
+# Reglas de extracción precompiladas
+# ---------------------------------------------------------------------------
+# Todas las expresiones se compilan una sola vez al cargar el módulo. El orden de
+# cada lista es la prioridad de la regla: gana la primera que coincide.
+
+def _literales_requeridos(patron: str) -> Optional[Tuple[str, ...]]:
+    """
+    Deriva del patrón las subcadenas literales que garantizan una posible coincidencia:
+    por cada alternativa de primer nivel toma la secuencia literal obligatoria más larga
+    (fuera de grupos, clases y cuantificadores opcionales). Si alguna alternativa no
+    tiene literal obligatorio, devuelve None y la regla se evalúa siempre.
+    También devuelve None ante construcciones que este análisis no modela: flags en
+    línea como (?i), escapes numéricos o con nombre (\\x41, \\u00E1, \\N{...}, \\1) y
+    repeticiones con llaves ({2}, {1,3}).
+    """
+    if re.search(r'\(\?[aiLmsux-]', patron) or '{' in patron:
+        return None
+    alternativas = []
+    actual = []
+    profundidad = 0
+    en_clase = False
+    i = 0
+    while i < len(patron):
+        c = patron[i]
+        if c == '\\':
+            if patron[i + 1:i + 2] in ('x', 'u', 'U', 'N') or patron[i + 1:i + 2].isdigit():
+                return None
+            actual.append(patron[i:i + 2])
+            i += 2
+            continue
+        if en_clase:
+            en_clase = c != ']'
+        elif c == '[':
+            en_clase = True
+        elif c == '(':
+            profundidad += 1
+        elif c == ')':
+            profundidad -= 1
+        elif c == '|' and profundidad == 0:
+            alternativas.append(actual)
+            actual = []
+            i += 1
+            continue
+        actual.append(c)
+        i += 1
+    alternativas.append(actual)
+    
+    literales = []
+    for tokens in alternativas:
+        mejor = ''
+        corrida = ''
+        profundidad = 0
+        en_clase = False
+        for j, token in enumerate(tokens):
+            siguiente = tokens[j + 1] if j + 1 < len(tokens) else ''
+            opcional = siguiente[:1] in ('?', '*', '{')
+            es_literal = False
+            if en_clase:
+                en_clase = token != ']'
+            elif token == '[':
+                en_clase = True
+            elif token == '(':
+                profundidad += 1
+            elif token == ')':
+                profundidad -= 1
+            elif profundidad == 0:
+                if len(token) == 2:
+                    es_literal = not token[1].isalnum()  # \. \- son literales; \b \s \d no
+                else:
+                    es_literal = token not in '.^$?*+{}|'
+            if es_literal and not opcional:
+                corrida += token[-1]
+                if siguiente == '+':
+                    mejor = max(mejor, corrida, key=len)
+                    corrida = ''
+            else:
+                mejor = max(mejor, corrida, key=len)
+                corrida = ''
+        mejor = max(mejor, corrida, key=len)
+        if not mejor:
+            return None
+        literales.append(mejor)
+    # Si un literal contiene a otro de la misma regla, alcanza con verificar el más corto
+    literales = list(dict.fromkeys(literales))
+    return tuple(literal for literal in literales
+                 if not any(otro != literal and otro in literal for otro in literales))
+
+
+def _requisitos_patron(items) -> List:
+    """
+    Requisitos de coincidencia de un patrón ya analizado por sre_parse: toda coincidencia
+    cumple todos los requisitos. Un requisito es una cadena que la coincidencia contiene
+    o, para una alternancia, una tupla con los requisitos de cada alternativa (se cumple
+    alguna). Es una aproximación conservadora: lo que no se puede asegurar (clases,
+    repeticiones opcionales, grupos con flags) no aporta requisitos.
+    """
+    requisitos = []
+    corrida = ''
+    for operador, argumento in items:
+        if operador is _sre_parse.LITERAL:
+            corrida += chr(argumento)
+            continue
+        if operador is _sre_parse.BRANCH:
+            # sre_parse saca el prefijo común de las alternativas (URGEN(?:CIA|TE)):
+            # se vuelve a pegar a cada una para no partir los literales
+            prefijo = [(_sre_parse.LITERAL, ord(caracter)) for caracter in corrida]
+            corrida = ''
+            requisitos.append(tuple(_requisitos_patron(prefijo + list(alternativa))
+                                    for alternativa in argumento[1]))
+            continue
+        if corrida:
+            requisitos.append(corrida)
+            corrida = ''
+        if operador is _sre_parse.SUBPATTERN:
+            _, agregados, quitados, subpatron = argumento
+            if not agregados and not quitados:
+                requisitos.extend(_requisitos_patron(subpatron))
+        elif operador in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT,
+                          getattr(_sre_parse, 'POSSESSIVE_REPEAT', None)):
+            minimo, _, subpatron = argumento
+            if minimo >= 1:
+                requisitos.extend(_requisitos_patron(subpatron))
+    if corrida:
+        requisitos.append(corrida)
+    return requisitos
+
+def _requisitos_cubiertos(requisitos: List, subcadenas: Tuple[str, ...]) -> bool:
+    """True si alguno de los requisitos garantiza que aparece alguna de las subcadenas"""
+    for requisito in requisitos:
+        if isinstance(requisito, str):
+            if any(subcadena in requisito for subcadena in subcadenas):
+                return True
+        elif all(_requisitos_cubiertos(alternativa, subcadenas) for alternativa in requisito):
+            return True
+    return False
+
+def _prefiltro_valido(patron: str, subcadenas: Tuple[str, ...], todas: bool = False) -> bool:
+    """
+    Verifica con el analizador de re que un prefiltro de subcadenas no descarte textos
+    en los que el patrón podría coincidir: con todas=False alcanza con que aparezca
+    alguna subcadena; con todas=True se exige cada una.
+    """
+    try:
+        analizado = _sre_parse.parse(patron)
+    except Exception:
+        return False
+    if analizado.state.flags & re.IGNORECASE:
+        return False
+    requisitos = _requisitos_patron(analizado)
+    if todas:
+        return all(_requisitos_cubiertos(requisitos, (subcadena,)) for subcadena in subcadenas)
+    return _requisitos_cubiertos(requisitos, subcadenas)
+
+def _prefiltro_patron(patron: str) -> Optional[Tuple[str, ...]]:
+    """Literales de _literales_requeridos, solo si el analizador de re confirma que son obligatorios"""
+    literales = _literales_requeridos(patron)
+    if literales is not None and not _prefiltro_valido(patron, literales):
+        print(f"Advertencia: prefiltro {literales} no validado para el patrón {patron!r}; se evalúa siempre")
+        return None
+    return literales
+
+
+class _CascadaPrioridad:
+    """
+    Lista de patrones evaluados en orden de prioridad (gana el primero que coincide)
+    con prefiltro de subcadenas: antes de ejecutar un regex se verifica con un `in`
+    barato que alguno de sus literales obligatorios esté presente en el texto.
+    """
+    
+    def __init__(self, patrones: List[Tuple[str, str]]):
+        self.nombres = [nombre for nombre, _ in patrones]
+        self.regex = [re.compile(patron) for _, patron in patrones]
+        self.literales = [_prefiltro_patron(patron) for _, patron in patrones]
+        # Índice inverso literal -> reglas, para resolver candidatas en una sola pasada
+        self._reglas_por_literal: Dict[str, List[int]] = {}
+        self._siempre: List[int] = []
+        for indice, literales in enumerate(self.literales):
+            if literales is None:
+                self._siempre.append(indice)
+                continue
+            for literal in literales:
+                self._reglas_por_literal.setdefault(literal, []).append(indice)
+        self._literales = list(self._reglas_por_literal)
+    
+    def candidatas(self, texto: str) -> List[int]:
+        """Índices (ordenados por prioridad) de las reglas que podrían coincidir"""
+        indices = set(self._siempre)
+        for literal in self._literales:
+            if literal in texto:
+                indices.update(self._reglas_por_literal[literal])
+        return sorted(indices)
+    
+    def buscar(self, texto: str, telemetria: Optional['_TelemetriaPatrones'] = None,
+               grupo: str = '') -> Optional[int]:
+        """Devuelve el índice de la primera regla que coincide en texto, o None"""
+        candidatas = self.candidatas(texto)
+        if telemetria is not None:
+            return self._buscar_con_telemetria(texto, candidatas, telemetria, grupo)
+        for indice in candidatas:
+            if self.regex[indice].search(texto):
+                return indice
+        return None
+    
+    def _buscar_con_telemetria(self, texto: str, candidatas: List[int], telemetria: '_TelemetriaPatrones',
+                               grupo: str) -> Optional[int]:
+        """Igual que buscar, pero registrando descartes, coincidencias y tiempo de cada regla"""
+        evaluadas = set()
+        encontrada = None
+        for indice in candidatas:
+            evaluadas.add(indice)
+            if telemetria.buscar(grupo, self.nombres[indice], self.regex[indice], texto):
+                encontrada = indice
+                break
+        # Las reglas que no pasaron el prefiltro (antes de la que coincidió) no costaron regex
+        limite = len(self.nombres) if encontrada is None else encontrada
+        for indice in range(limite):
+            if indice not in evaluadas:
+                telemetria.descartar(grupo, self.nombres[indice])
+        return encontrada
+
+
+class _ReglaDoctor:
+    """
+    Patrón de extracción de doctor con prefiltro por subcadenas.
+    - requeridos: subcadenas que deben aparecer TODAS para que el patrón pueda coincidir
+    - alternativos: subcadenas de las que debe aparecer AL MENOS UNA
+    - formato: 'normal' (invierte "APELLIDO, NOMBRE"), 'solo_nombre' (deja el nombre tal cual)
+      o 'prefijo_lic' (antepone "LIC.")
+    """
+    __slots__ = ('patron', 'requeridos', 'alternativos', 'formato', 'nombre')
+
+    def __init__(self, patron: str, requeridos: Tuple[str, ...] = (), alternativos: Tuple[str, ...] = (),
+                 formato: str = 'normal'):
+        self.patron = re.compile(patron)
+        # Un prefiltro que no se puede validar se descarta: solo costaría velocidad
+        if requeridos and not _prefiltro_valido(patron, requeridos, todas=True):
+            print(f"Advertencia: subcadenas requeridas {requeridos} no validadas para {patron!r}")
+            requeridos = ()
+        if alternativos and not _prefiltro_valido(patron, alternativos):
+            print(f"Advertencia: subcadenas alternativas {alternativos} no validadas para {patron!r}")
+            alternativos = ()
+        self.requeridos = requeridos
+        self.alternativos = alternativos
+        self.formato = formato
+        self.nombre = ''  # se asigna con la posición en _REGLAS_DOCTOR (para la telemetría)
+
+    def puede_coincidir(self, texto: str) -> bool:
+        """Chequeo barato previo al regex: descarta patrones que no pueden coincidir"""
+        for subcadena in self.requeridos:
+            if subcadena not in texto:
+                return False
+        if self.alternativos:
+            return any(subcadena in texto for subcadena in self.alternativos)
+        return True
+
+
+class _TelemetriaPatrones:
+    """
+    Contadores y tiempos por patrón de la cascada de extracción (áreas, doctor, tipos
+    de turno y chequeos de exclusión). Es opcional porque medir cada regex por separado
+    agrega bastante costo. Escribe sobre el diccionario `mediciones` que recibe, con
+    clave (grupo, patrón), para que viaje dentro de la instrumentación de la corrida.
+    - evaluaciones: veces que se ejecutó el regex; coincidencias: veces que encontró algo
+    - descartes: veces que el prefiltro de subcadenas evitó ejecutarlo
+    - aceptados: (doctor) coincidencias que pasaron las exclusiones y dieron el resultado
+    - max_segundos/titulo_mas_lento: la evaluación más cara, para detectar backtracking
+    """
+    
+    def __init__(self, mediciones: Dict[Tuple[str, str], Dict]):
+        self.mediciones = mediciones
+    
+    def _medicion(self, grupo: str, patron: str) -> Dict:
+        medicion = self.mediciones.get((grupo, patron))
+        if medicion is None:
+            medicion = self.mediciones[(grupo, patron)] = {
+                'evaluaciones': 0, 'coincidencias': 0, 'descartes': 0, 'aceptados': 0,
+                'segundos': 0.0, 'max_segundos': 0.0, 'titulo_mas_lento': '',
+            }
+        return medicion
+    
+    def buscar(self, grupo: str, patron: str, regex: 're.Pattern', texto: str, metodo: str = 'search'):
+        """Ejecuta regex.search (o match) sobre texto y registra el resultado y su duración"""
+        inicio = time.perf_counter()
+        resultado = getattr(regex, metodo)(texto)
+        duracion = time.perf_counter() - inicio
+        medicion = self._medicion(grupo, patron)
+        medicion['evaluaciones'] += 1
+        medicion['segundos'] += duracion
+        if resultado:
+            medicion['coincidencias'] += 1
+        if duracion > medicion['max_segundos']:
+            medicion['max_segundos'] = duracion
+            medicion['titulo_mas_lento'] = texto
+        return resultado
+    
+    def descartar(self, grupo: str, patron: str):
+        self._medicion(grupo, patron)['descartes'] += 1
+    
+    def aceptar(self, grupo: str, patron: str):
+        self._medicion(grupo, patron)['aceptados'] += 1
+    
+    @staticmethod
+    def combinar(destino: Dict[Tuple[str, str], Dict], origen: Dict[Tuple[str, str], Dict]):
+        """Suma las mediciones de otro proceso de trabajo"""
+        for clave, medicion in origen.items():
+            acumulada = destino.get(clave)
+            if acumulada is None:
+                destino[clave] = dict(medicion)
+                continue
+            for campo in ('evaluaciones', 'coincidencias', 'descartes', 'aceptados', 'segundos'):
+                acumulada[campo] += medicion[campo]
+            if medicion['max_segundos'] > acumulada['max_segundos']:
+                acumulada['max_segundos'] = medicion['max_segundos']
+                acumulada['titulo_mas_lento'] = medicion['titulo_mas_lento']
+    
+    @staticmethod
+    def tabla(mediciones: Dict[Tuple[str, str], Dict]) -> pd.DataFrame:
+        """Mediciones como tabla, con el orden de prioridad de cada grupo"""
+        df = pd.DataFrame([{'grupo': grupo, 'patron': patron, **medicion}
+                           for (grupo, patron), medicion in mediciones.items()])
+        if df.empty:
+            return df
+        df['us_promedio'] = (df['segundos'] / df['evaluaciones'].where(df['evaluaciones'] > 0) * 1e6).round(2)
+        df['max_us'] = (df['max_segundos'] * 1e6).round(1)
+        df['segundos'] = df['segundos'].round(6)
+        return df[['grupo', 'patron', 'evaluaciones', 'coincidencias', 'aceptados', 'descartes',
+                   'segundos', 'us_promedio', 'max_us', 'titulo_mas_lento']]
+
+
+# Los patrones de áreas médicas están en el archivo de reglas externo (ver cargar_reglas)
+
+
+# Patrones de doctor (ORDEN IMPORTA: más específicos primero)
+_REGLAS_DOCTOR = [
+    # Patrón específico para "ESPECIALIDAD - DRA/DR NOMBRE APELLIDO - EVENTUAL" (solo EVENTUAL)
+    _ReglaDoctor(
+        r'\b(?:ODONTOLOGIA|PEDIATRIA)\s+(?:ADULTOS?|PEDIATRIA|INFANTIL)?\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*-\s*EVENTUAL\s*$',
+        requeridos=('-', 'DR', 'EVENTUAL'), alternativos=('ODONTOLOGIA', 'PEDIATRIA')),
+    # Patrón específico para "ESPECIALIDAD - DRA/DR NOMBRE APELLIDO - TIPO" con EVENTUAL ESPONTANEA
+    _ReglaDoctor(
+        r'\b(?:ODONTOLOGIA|PEDIATRIA)\s+(?:ADULTOS?|PEDIATRIA|INFANTIL)?\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*-\s*(?:EVENTUAL\s+)?(?:ESPONTANEA|PROGRAMADA)',
+        requeridos=('-', 'DR'), alternativos=('ODONTOLOGIA', 'PEDIATRIA')),
+    # Patrón para profesiones que incluyen DR/DRA en el medio - PROFESION - DRA/DR NOMBRE - ACTIVIDAD (opcional)
+    _ReglaDoctor(
+        r'\b(?:PSICOLOG[OA]|NUTRICIONISTA|KINESIOLOGO|FONOAUDIOLOGO)\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ].+?\s+.+?|DRA?\s+[A-ZÁÉÍÓÚÑÜ].+?\s+.+?)(?:\s*-\s*\w+.*|\s*$)',
+        requeridos=('-', 'DR')),
+    # Patrón específico para ESTIMULACION TEMPRANA - DRA/DR NOMBRE (maneja caracteres corruptos)
+    _ReglaDoctor(
+        r'\bESTIMULACION\s+TEMPRANA\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ].+?\s+.+?)(?:\s*$|\s*-)',
+        requeridos=('ESTIMULACION', '-', 'DR')),
+    # Patrón para profesiones seguido de nombre - NUTRICIONISTA/KINESIOLOGO/etc - NOMBRE - TIPO
+    _ReglaDoctor(
+        r'\b(?:NUTRICIONISTA|KINESIOLOGO|FONOAUDIOLOGO|TRABAJADOR[A]?\s+SOCIAL|TRABAJO\s+SOCIAL|PSICOLOG[OA])[\.\s]*[-\.\s]\s*([A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*(?:-\s*(?:GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PROGRAMADA|ESPONTANEA|ESPONTÁNEA|PAP|CAI|CONTROL|URGENCIA|SOBRETURNO|REUNION\s+DE\s+EQUIPO)|\s*$)',
+        alternativos=('NUTRICIONISTA', 'KINESIOLOGO', 'FONOAUDIOLOGO', 'TRABAJ', 'PSICOLOG')),
+    # Patrón específico para DRA/DR CON COMA - PEDIATRIA - DRA, NOMBRE APELLIDO (PRESERVAR formato completo)
+    _ReglaDoctor(
+        r'(?:PEDIATRIA|ODONTOLOGIA|GINECOLOGIA|OBSTETRICIA|CARDIOLOGIA|TRAUMATOLOGIA|NEUROLOGIA|OFTALMOLOGIA|OTORRINOLARINGOLOGIA|UROLOGIA|DERMATOLOGIA|ENDOCRINOLOGIA|GASTROENTEROLOGIA|HEMATOLOGIA|INFECTOLOGIA|NEFROLOGIA|NEUMONOLOGIA|ONCOLOGIA|REUMATOLOGIA|PSIQUIATRIA)(?:\s*-\s*\w+)*\s*-\s*(DRA?,\s*[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
+        requeridos=('-', 'DR', ',')),
+    # Patrón para DRA/DR seguido del nombre - detener antes de palabras clave (PRESERVAR DR/DRA con o sin punto)
+    _ReglaDoctor(
+        r'\b(DRA?\.\s*[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)(?=\s+(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA))|(\bDRA?\.\s*[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)\s*(?:-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
+        requeridos=('DR', '.')),
+    # Patrón para DRA/DR SIN punto seguido del nombre (PRESERVAR DR/DRA sin punto)
+    _ReglaDoctor(
+        r'\b(DRA?\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)(?=\s+(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA))|(\bDRA?\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)\s*(?:-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
+        requeridos=('DR',)),
+    # Patrón para DOCTOR/DOCTORA seguido del nombre (PRESERVAR DOCTOR/DOCTORA)
+    _ReglaDoctor(
+        r'\b(DOCTOR[A]?\s+[A-ZÁÉÍÓÚÑÜ].+?)(?:\s*-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
+        requeridos=('DOCTOR',)),
+    # Patrón específico para formato "APELLIDO ,NOMBRE" después de tipo de turno (se conserva tal cual, sin invertir)
+    _ReglaDoctor(
+        r'-\s*(?:A\s+LA\s+BREVEDAD|URGENCIA|PROGRAMADA|ESPONTANEA|ESPONTÁNEA)\s*-\s*([A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+\s*,\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)',
+        requeridos=('-', ','), formato='solo_nombre'),
+
+    # PATRONES DE LIC. - MÁS ESPECÍFICOS PRIMERO
+    # Patrón específico para LIC. EN PSICOLOGIA NOMBRE - extraer solo el nombre (SIN agregar LIC.)
+    _ReglaDoctor(
+        r'\bLIC\.\s*EN\s+PSICOLOGIA\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
+        requeridos=('LIC.', 'PSICOLOGIA'), formato='solo_nombre'),
+    # Patrón específico para LIC. EN TRABAJO SOCIAL NOMBRE - extraer solo el nombre (SIN agregar LIC.)
+    _ReglaDoctor(
+        r'\bLIC\.\s*EN\s+TRABAJO\s+SOCIAL\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
+        requeridos=('LIC.', 'TRABAJO'), formato='solo_nombre'),
+    # Patrón específico para LIC.EN NUTRICION - TRATAMIENTO - NOMBRE - extraer solo el nombre (SIN agregar LIC.)
+    _ReglaDoctor(
+        r'\bLIC\.EN\s+NUTRICION\s*-\s*TRATAMIENTO\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
+        requeridos=('LIC.EN', 'TRATAMIENTO'), formato='solo_nombre'),
+    # Patrón específico para LIC.EN NUTRICION - GENERAL - NOMBRE - extraer solo el nombre (SIN agregar LIC.)
+    _ReglaDoctor(
+        r'\bLIC\.EN\s+NUTRICION\s*-\s*GENERAL\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
+        requeridos=('LIC.EN', 'GENERAL'), formato='solo_nombre'),
+
+    # PATRONES ESPECÍFICOS ADICIONALES (SIN agregar LIC.)
+    # Patrón para NUTRICION - PRIMERA VEZ/RONDA SANITARIA - LIC. NOMBRE - extraer solo el nombre
+    _ReglaDoctor(
+        r'\bNUTRICION\s*-\s*(?:PRIMERA\s+VEZ|RONDA\s+SANITARIA)\s*-\s*LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
+        requeridos=('NUTRICION', 'LIC.'), formato='solo_nombre'),
+    # Patrón para TRABAJADORA SOCIAL - LIC. NOMBRE (agregar "LIC." al resultado)
+    _ReglaDoctor(
+        r'\bTRABAJADOR[A]?\s+SOCIAL\s*-\s*LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
+        requeridos=('TRABAJADOR', 'LIC.'), formato='prefijo_lic'),
+    # Patrón general para ESPECIALIDAD - LIC. NOMBRE (agregar "LIC." al resultado)
+    _ReglaDoctor(
+        r'\b(?:PSICOLOGIA|PSICLOGIA|NUTRICION|KINESIOLOGIA|FONOAUDIOLOGIA|TRABAJO\s+SOCIAL|MUSICOTERAPIA|TERAPIA\s+OCUPACIONAL|PSICOPEDAGOGIA|OBSTETRICIA|ESTIMULACION\s+TEMPRANA|PSICO-ONCOLOGIA|DEGLUCION|AUDIOMETRIA)(?:\s+(?:INFANTIL|GENERAL|TRATAMIENTO|ESPONTANEA|Y\s+FISIATRIA))*\s*-?\s*LIC\.\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)(?:\s*$|\s*-)',
+        requeridos=('LIC.',), formato='prefijo_lic'),
+    # Patrón general para ESPECIALIDAD - LIC NOMBRE (sin punto, agregar "LIC." al resultado)
+    _ReglaDoctor(
+        r'\b(?:PSICOLOGIA|PSICLOGIA|NUTRICION|KINESIOLOGIA|FONOAUDIOLOGIA|TRABAJO\s+SOCIAL|MUSICOTERAPIA|TERAPIA\s+OCUPACIONAL|PSICOPEDAGOGIA|OBSTETRICIA|ESTIMULACION\s+TEMPRANA|PSICO-ONCOLOGIA|DEGLUCION|AUDIOMETRIA)(?:\s+(?:INFANTIL|GENERAL|TRATAMIENTO|ESPONTANEA|Y\s+FISIATRIA))*\s*-?\s*LIC\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)(?:\s*$|\s*-)',
+        requeridos=('LIC',), formato='prefijo_lic'),
+    # PSICOLOGIA PATRÓN ESPECÍFICO DESHABILITADO - usar solo el patrón general arriba
+    # r'\bPSIC(?:O)?LOG(?:I)?A(?:\s+INFANTIL)?\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)\s+LIC\.?\s*(?:\s*$|\s*-)',
+    # PSICO-ONCOLOGIA PATRÓN ESPECÍFICO DESHABILITADO - usar solo el patrón general arriba
+    # r'\bPSICO-ONCOLOGIA\s+LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
+
+    # Patrón para LIC. que aparece JUSTO ANTES del nombre (agregar "LIC." al resultado)
+    _ReglaDoctor(
+        r'[-\s]+LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
+        requeridos=('LIC.',), formato='prefijo_lic'),
+    # Patrón para LIC que aparece JUSTO ANTES del nombre (SIN agregar "LIC.")
+    _ReglaDoctor(
+        r'[-\s]+LIC\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
+        requeridos=('LIC',)),
+
+    # Patrón para nombres al final después de guión - solo nombres de personas (DEBE IR AL FINAL)
+    # EXCLUIR casos donde haya "LIC." justo antes del nombre para que los patrones específicos los manejen
+    _ReglaDoctor(
+        r'[-\s]+(?!LIC\.?\s+)([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+)+)$'
+    ),
+
+    # Patrón ESPECÍFICO para nombres conocidos al inicio - solo casos muy obvios
+    # Solo detectar apellidos típicos que claramente son nombres de doctores
+    _ReglaDoctor(
+        r'^(DE\s+ACETIS|DE\s+ROSSI|VAN\s+DER\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+|DEL\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)\s+(?:ADULTO|PEDIATRICO|INFANTIL|GENERAL|PROGRAMADA|ESPONTANEA|ESPONTÁNEA|CONTROL|URGENCIA|TRATAMIENTO)',
+        alternativos=('DE', 'VAN')),
+]
+for _indice, _regla in enumerate(_REGLAS_DOCTOR):
+    _regla.nombre = f"{_indice:02d} {_regla.patron.pattern[:60]}"
+
+# Palabras que indican que el candidato a doctor es una especialidad o palabra clave
+_PALABRAS_EXCLUIR_DOCTOR = [
+    'PSICOLOGIA', 'NUTRICION', 'TRABAJO SOCIAL', 'KINESIOLOGIA',
+    'TRATAMIENTO', 'GENERAL', 'PAP', 'ESPONTANEA', 'PROGRAMADA', 'ADMISION', 'ADMISIÓN',
+    'EN PSICOLOGIA', 'EN NUTRICION', 'EN TRABAJO', 'EN KINESIOLOGIA',
+    'LICENCIADA', 'LICENCIADO', 'MEDICO', 'MEDICA', 'AGENDA SÁBADOS',
+    'AGENDA SABADOS', 'RESIDENTE', 'AGENDA', 'ESPONTANEA', 'AGENDA BIS',
+    'BIS', 'DIU', 'IMPLANTE', 'EXTRACCION', 'COLOCACION', 'REUNION EQUIPO',
+    'ADULTOS', 'ADULTO', 'INFANTIL', 'INFANTILES', 'NINOS', 'NIÑOS',
+    'ADOLESCENTES', 'DISCAPACIDAD', 'REHABILITACION', 'REHABILITACIÓN',
+    'PEDIATRICA', 'PEDIÁTRICA', 'CLINICA', 'CLÍNICA', 'EXTERNA',
+    'CONSULTORIO', 'SALA', 'BOX', 'QUIROFANO', 'QUIRÓFANO',
+    'ECG', 'EKG', 'RX', 'LAB', 'LABORATORIO', 'RADIOLOGIA', 'ECOGRAFIA', 'TAC', 'RMN',
+    # Nuevas exclusiones para casos administrativos/descriptivos
+    'RECIEN NACIDOS', 'RECIÉN NACIDOS', 'DE FAMILIAS', 'UNICA USUARIA', 'ÚNICA USUARIA',
+    'TRIAGE PEDIATRIA', 'TRIAGE', 'POST ALTA', 'GINECOLOGIA QUIRUGICA HMI', 'OBSTETRICIA HMI',
+    'ESPIROMETRIA PEDIATRIA HMI', 'DE PSIQUIATRIA PEDIATRICO', 'DE PSIQUIATRÍA PEDIÁTRICO'
+]
+_PALABRAS_EXCLUIR_REGEX = re.compile('|'.join(re.escape(palabra) for palabra in _PALABRAS_EXCLUIR_DOCTOR))
+
+# Consultorios/salas/ubicaciones que no son nombres de doctores
+_UBICACION_EXACTA_REGEX = re.compile(r'^(?:CONSULTORIO|SALA|BOX|QUIROFANO|QUIRÓFANO|PISO|PLANTA)\s*(?:\d+|[A-Z]|\w+)$')
+_SOLO_NUMERO_REGEX = re.compile(r'^\d+$')
+_CONTIENE_UBICACION_REGEX = re.compile(r'\b(?:CONSULTORIO|SALA|BOX|QUIROFANO|QUIRÓFANO|PISO|PLANTA)\b')
+_SUFIJOS_DOCTOR_REGEX = re.compile(r'\s*-\s*(DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO)\s*$', re.IGNORECASE)
+_PREFIJO_DOCTOR_REGEX = re.compile(r'^(DRA?\.\s*|DRA?\s+|DRA?,\s*|DOCTOR[A]?\s+)', re.IGNORECASE)
+_PREFIJO_LIC_REGEX = re.compile(r'^(LIC\.\s*|LIC\s+)', re.IGNORECASE)
+_CONSULTORIO_NUMERO_REGEX = re.compile(r'CONSULTORIO\s+\d+', re.IGNORECASE)
+
+# Procedimientos/siglas médicas y términos técnicos que no son doctores
+_PROCEDIMIENTOS_MEDICOS = frozenset(proc.upper() for proc in [
+    'ECG', 'EKG', 'RX', 'LAB', 'LABORATORIO', 'RADIOLOGIA', 'ECOGRAFIA', 'TAC', 'RMN', 'PREOCUPACIONAL',
+    'QUIROFANO', 'CURACIONES', 'PLASTICA', 'TORAX', 'ADULTOS', 'NIÑOS HSI', 'GENERAL DOS', 'GENERAL UNO',
+    'CABEZA Y CUELLO DOS', 'CABEZA Y CUELLO UNO', 'COLOPROCTOLOGIA UNO', 'COLOPROCTOLOGIA DOS',
+    '173 TECNICO', '200 TECNICO', '233 TECNICO', '122 TECNICO', 'CARDIO RESIDENTES', 'DIABETOLOGIA PRODIABA'
+])
+
+# Patrones de tipo de turno. "A LA BREVEDAD" se verifica primero por ser el más específico
+_TIPOS_PATTERNS = [
+    ('A LA BREVEDAD', r'\bA\s+LA\s+BREVEDAD\b'),
+    ('GUARDIA', r'\bGUARDIA\b|\bGUARDIA\s+MEDICA\b|\bGUARDIAS\b'),
+    ('EVENTUAL ESPONTANEA', r'\bEVENTUAL\s+ESPONTANEA\b|\bEVENTUAL\s+ESPONTÁNEA\b'),
+    ('EVENTUAL', r'\bEVENTUAL\b'),
+    ('CAI/Espontánea', r'\bESPONTANEA\b|\bESPONTÁNEA\b|\bESPONTÃ_x0081_NEA\b|\bCAI\b'),
+    ('DEMANDA A DOMICILIO', r'\bDEMANDA\s+A\s+DOMICILIO\b'),
+    ('URGENCIA', r'\bURGENCIA\b|\bURGENTE\b'),
+    ('PROGRAMADA', r'\bPROGRAMADA\b|\bTURNO\s+PROGRAMADO\b|\bPROGRAMADO\b'),
+    ('SOBRETURNO', r'\bSOBRETURNO\b|\bSOBRETURNOS\b'),
+    ('CONTROL', r'\bCONTROL\b'),
+    ('INTERCONSULTA', r'\bINTERCONSULTA\b'),
+    ('CONSULTA EXTERNA', r'\bCONSULTA\s+EXTERNA\b|\bEXTERNA\b'),
+    ('TRATAMIENTO', r'\bTRATAMIENTO\b'),
+    ('ADMISION', r'\bADMISION\b|\bADMISIÓN\b'),
+    ('REUNION DE EQUIPO', r'\bREUNION\s+DE\s+EQUIPO\b|\bREUNIÓN\s+DE\s+EQUIPO\b'),
+    ('MONITOREO', r'\bMONITOREO\b'),
+]
+_CASCADA_TIPOS = _CascadaPrioridad(_TIPOS_PATTERNS)
+
+_GENERAL_REGEX = re.compile(r'\bGENERAL\b')
+_GENERAL_LEITES_REGEX = re.compile(r'GINECOLOGIA\s*-\s*DR\.\s*LEITES\s*-\s*GENERAL')
+_GENERAL_CON_GUION_REGEX = re.compile(r'-\s*GENERAL\b')
+_GENERAL_AL_INICIO_REGEX = re.compile(r'^\s*GENERAL\b')
+_COMITE_FAMILIAS_REGEX = re.compile(r'\bCOMITE\s+DE\s+FAMILIAS\b')
+
+
+# ---------------------------------------------------------------------------
+# Reglas externas: áreas, ventanillas y exclusiones del Materno, efectores
+# ---------------------------------------------------------------------------
+# Viven en datos/reglas/reglas_agendas.json para poder ajustarlas sin tocar el código.
+# Se compilan una sola vez (patrones, diccionarios, frozensets) y se vuelven a leer
+# solo cuando cambia la fecha de modificación del archivo.
+ARCHIVO_REGLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos', 'reglas', 'reglas_agendas.json')
+
+class _ReglasAgendas:
+    """
+    Reglas externas ya compiladas. `version` combina la versión declarada en el archivo
+    con un hash de su contenido: se guarda en las salidas y en el manifiesto para
+    invalidar cachés aunque se edite el archivo sin subir la versión.
+    """
+    
+    def __init__(self, datos: Dict, huella: str):
+        self.version = f"{datos['version']}-{huella[:12]}"
+        # Patrones de áreas en orden de prioridad (se evalúan sobre el texto en mayúsculas)
+        self.cascada_areas = _CascadaPrioridad([(regla['area'], regla['patron']) for regla in datos['areas']])
+        # Área -> ventanilla del Hospital Materno; si un área figura en más de una
+        # ventanilla gana la primera de la lista
+        self.ventanilla_por_area: Dict[str, str] = {}
+        for grupo in datos['ventanillas_materno']:
+            for area in grupo['areas']:
+                self.ventanilla_por_area.setdefault(area.upper().strip(), grupo['ventanilla'])
+        # Agendas del Hospital Materno que NO deben tener área
+        self.agendas_sin_area_materno = frozenset(datos['agendas_sin_area_materno'])
+        # Efector según el nombre del archivo: gana la primera regla cuyo texto aparece
+        self.efectores = [(tuple(regla['contiene']), regla['efector']) for regla in datos['efectores']]
+
+_REGLAS_CARGADAS: Dict[str, Tuple[int, _ReglasAgendas]] = {}
+
+def cargar_reglas(archivo_reglas: str = ARCHIVO_REGLAS) -> _ReglasAgendas:
+    """Reglas compiladas del archivo; solo se vuelve a leer si cambió su mtime"""
+    mtime = os.stat(archivo_reglas).st_mtime_ns
+    cargadas = _REGLAS_CARGADAS.get(archivo_reglas)
+    if cargadas is not None and cargadas[0] == mtime:
+        return cargadas[1]
+    with open(archivo_reglas, 'rb') as f:
+        contenido = f.read()
+    reglas = _ReglasAgendas(json.loads(contenido.decode('utf-8')), hashlib.sha256(contenido).hexdigest())
+    _REGLAS_CARGADAS[archivo_reglas] = (mtime, reglas)
+    return reglas
+
+
+# ---------------------------------------------------------------------------
+# Reparación de caracteres corruptos (UTF-8 mal interpretado como Latin-1)
+# ---------------------------------------------------------------------------
+
+class _ReparadorMojibake:
+    """
+    Reemplaza secuencias corruptas en una sola pasada con una alternativa precompilada.
+    
+    `reemplazos` es una lista (corrupto, correcto) en el MISMO orden en que el algoritmo
+    original aplicaba str.replace clave por clave. En cada posición la alternativa elige
+    la primera clave de esa lista, que es la que el algoritmo original aplicaba primero.
+    Los reemplazos en cadena (una corrección que forma una nueva secuencia corrupta con
+    sus vecinos) solo son posibles cuando hay coincidencias pegadas o solapadas, o
+    cuando el resultado todavía contiene una clave: en esos casos, muy raros, se usa el
+    recorrido secuencial original para que la salida sea idéntica.
+    """
+    
+    def __init__(self, reemplazos: List[Tuple[str, str]]):
+        self.reemplazos = reemplazos
+        self.tabla = dict(reemplazos)
+        self.regex = re.compile('|'.join(re.escape(corrupto) for corrupto, _ in reemplazos))
+        self.longitud_maxima = max(len(corrupto) for corrupto, _ in reemplazos)
+        # Si toda clave contiene alguno de estos caracteres y el texto no tiene ninguno,
+        # no hay nada que reparar (el caso de la gran mayoría de los títulos)
+        self.marcadores = frozenset(c for corrupto, _ in reemplazos for c in corrupto
+                                    if not (c.isascii() and (c.isalnum() or c == ' ')))
+        if any(self.marcadores.isdisjoint(corrupto) for corrupto, _ in reemplazos):
+            self.marcadores = None
+    
+    def _reemplazar_secuencial(self, texto: str) -> str:
+        """Algoritmo original: un str.replace por clave, en orden"""
+        for corrupto, correcto in self.reemplazos:
+            if corrupto in texto:
+                texto = texto.replace(corrupto, correcto)
+        return texto
+    
+    def reparar(self, texto: str) -> str:
+        """Repara un texto en una pasada (con la salvedad de los reemplazos en cadena)"""
+        if self.marcadores is not None and self.marcadores.isdisjoint(texto):
+            return texto
+        
+        coincidencias = list(self.regex.finditer(texto))
+        if not coincidencias:
+            return texto
+        
+        # Cada coincidencia debe estar aislada: ninguna otra clave empieza dentro de ella
+        # ni lo bastante cerca como para combinarse con su reemplazo
+        for coincidencia in coincidencias:
+            siguiente = self.regex.search(texto, coincidencia.start() + 1)
+            if siguiente and siguiente.start() < coincidencia.end() + self.longitud_maxima:
+                return self._reemplazar_secuencial(texto)
+        
+        partes = []
+        posicion = 0
+        for coincidencia in coincidencias:
+            partes.append(texto[posicion:coincidencia.start()])
+            partes.append(self.tabla[coincidencia.group()])
+            posicion = coincidencia.end()
+        partes.append(texto[posicion:])
+        resultado = ''.join(partes)
+        
+        if self.regex.search(resultado):
+            return self._reemplazar_secuencial(texto)
+        return resultado
+    
+    def reparar_serie(self, serie: pd.Series) -> pd.Series:
+        """
+        Modo por lotes: repara solo los valores únicos de la columna y mapea el resultado
+        a todas las filas. Los valores nulos se conservan.
+        """
+        unicos = serie.dropna().unique()
+        reparados = {valor: self.reparar(str(valor)) for valor in unicos}
+        return serie.map(reparados).where(serie.notna(), serie)
+
+
+# Mapeo de caracteres corruptos a caracteres correctos para decodificar_caracteres_especiales
+# Basado en codificación UTF-8 mal interpretada como Latin-1
+_CORRECCIONES_CODIFICACION = {
+    # Casos más específicos PRIMERO - orden importante!
+    'MUÃ\u2019OZ': 'MUÑOZ',  # MUÑOZ completo con comilla curva derecha (8217)
+    'MUÃ\u2018OZ': 'MUÑOZ',  # MUÑOZ completo con comilla curva izquierda (8216)
+    'MUÁ\u2018OZ': 'MUÑOZ',  # MUÑOZ ya parcialmente convertido (Á + comilla izquierda)
+    'Á\u2018': 'Ñ',         # Á + comilla curva izquierda -> Ñ (para casos ya convertidos)
+    'Ã\u2019': 'Ñ',         # Ã + comilla curva derecha -> Ñ
+    'Ã\u2018': 'Ñ',         # Ã + comilla curva izquierda -> Ñ  
+    'Ã_x008d_': 'Í',        # Para NOEMÍ
+    'Ã\x8d': 'Í',           # Corrección para BUFELLI MARÍAA (0xC3 0x8D -> Í)
+    'MARÃA': 'MARÍA',       # Corrección específica para BUFELLI MARÍAA DE LOS MILAGROS
+    'Ã"NICA': 'ÓNICA',      # Para VERÓNICA - patrón específico primero
+    'Á\u201d': 'Ó',         # Á + comilla doble derecha (8221) -> Ó (para casos ya convertidos)
+    'Á\u201c': 'Ó',         # Á + comilla doble izquierda (8220) -> Ó (para casos ya convertidos)
+    'Ã\u201d': 'Ó',         # Ã + comilla doble derecha (8221) -> Ó
+    'Ã\u201c': 'Ó',         # Ã + comilla doble izquierda (8220) -> Ó
+    'Ã"': 'Ó',              # Ó mayúscula - debe ir antes que el patrón general
+    'Í"': 'Ó',              # Corrección exacta: Í" -> Ó (ord 8220)
+    'Ã_x0081_': 'Á',        # Corrección exacta: Ã_x0081_ -> Á
+    
+    # Patrones comunes de UTF-8 mal interpretado
+    'Ã¡': 'á',   'Ã©': 'é',   'Ã­': 'í',   'Ã³': 'ó',   'Ãº': 'ú',    # Vocales con tilde minúsculas
+    'Ã‰': 'É',   'Ãš': 'Ú',                                            # Vocales con tilde mayúsculas
+    'Ã ': 'à',   'Ã¨': 'è',   'Ã¬': 'ì',   'Ã²': 'ò',   'Ã¹': 'ù',    # Vocales con acento grave
+    'Ã¤': 'ä',   'Ã«': 'ë',   'Ã¯': 'ï',   'Ã¶': 'ö',   'Ã¼': 'ü',    # Vocales con diéresis
+    'Ã¢': 'â',   'Ãª': 'ê',   'Ã®': 'î',   'Ã´': 'ô',   'Ã»': 'û',    # Vocales con circunflejo
+    'Ã§': 'ç',   'Ã‡': 'Ç',                                           # C cedilla
+    'Ã±': 'ñ',   'Ã\u00d1': 'Ñ',                                     # Eñe
+    
+    # Patrones específicos de codificación hexadecimal
+    '_x008d_': 'Í',         # Patrón hex para Í
+    '_x0081_': 'Á',         # Patrón hex para Á
+    
+    # Casos específicos completos para nombres comunes
+    'MUÃ_x0081_OZ': 'MUÑOZ',
+    'MUÃOZ': 'MUÑOZ',
+    'MUÃIÃ±OZ': 'MUÑOZ',    # Variante doble corrupción
+    'JIMÃ©NEZ': 'JIMÉNEZ',
+    'MÃ¡RQUEZ': 'MÁRQUEZ',
+    'GÃ³MEZ': 'GÓMEZ',
+    
+    # Regla general AL FINAL - solo cuando no hay patrones más específicos
+    'Ã': 'Á'               # Corrección general: Ã -> Á (SOLO cuando no hay patrones más específicos)
+}
+
+# Reemplazos de limpiar_texto (se aplican en el orden del diccionario)
+_REEMPLAZOS_LIMPIEZA = {
+    'Ã_x008d_': 'Í',
+    'Ã_x0081_': 'Á',
+    'Ã_x0081_N': 'ÁN',
+    'MÃ‰DICA': 'MÉDICA',
+    'CLÃ_x008d_NICA': 'CLÍNICA',
+    'PEDIÃ_x0081_TRICA': 'PEDIÁTRICA',
+    'BARILÃ_x0081_': 'BARILÁ',
+    'INÃ‰S': 'INÉS',
+    'Ã‰S': 'ÉS',
+    'Ã‰': 'É',
+    'Ã\u201dNICA': 'ÓNICA',
+    'Ã\u201d': 'Ó',
+    'VERÃ\u201dNICA': 'VERÓNICA',
+    '├ô': 'Ó',  # Mapeo específico para VER├ôNICA
+    'VER├ôNICA': 'VERÓNICA',  # Mapeo completo para VERÓNICA
+    'MUÃ\u2019OZ': 'MUÑOZ',  # Mapeo para MUÑOZ
+    'Ã\u2019OZ': 'ÑOZ',  # Mapeo genérico para Ñ
+    'Ã\u2019': 'Ñ',  # Mapeo genérico para Ñ
+    'NOEMÃ_x008d_': 'NOEMÍ',  # Mapeo específico para NOEMÍ
+    'ODONTOLOGÃ_x008d_A': 'ODONTOLOGÍA',  # Mapeo específico para ODONTOLOGÍA
+    'Ã¡': 'á',
+    'Ã©': 'é',
+    'Ã­': 'í',
+    'Ã³': 'ó',
+    'Ãº': 'ú',
+    'Ã±': 'ñ',
+    'Ã\u00d1': 'Ñ',
+    'Ãü': 'ü',
+    'Ã‚': 'Â',
+    'Ã¢': 'â',
+    'Ã¨': 'è',
+    'Ã¬': 'ì',
+    'Ã²': 'ò',
+    'Ã¹': 'ù',
+    'Ã§': 'ç'
+}
+
+# Aplicar correcciones en orden (más específicas primero): las claves más largas primero
+_REPARADOR_CODIFICACION = _ReparadorMojibake(
+    sorted(_CORRECCIONES_CODIFICACION.items(), key=lambda item: len(item[0]), reverse=True))
+_REPARADOR_LIMPIEZA = _ReparadorMojibake(list(_REEMPLAZOS_LIMPIEZA.items()))
+
+# Mapeo adicional para casos específicos como TABOADA: cualquier secuencia problemática antes de NICA
+_VERONICA_REGEX = re.compile(r'VER[^A-Z]*NICA')
+
+
+# ---------------------------------------------------------------------------
+# Lectura de planillas
+# ---------------------------------------------------------------------------
+# Las agendas solo usan las columnas A-C (título o día, hora inicio, hora fin).
+# El lector entrega cada fila como una tupla de 3 valores crudos, con None en las
+# celdas vacías, replicando lo que devolvía pd.read_excel(header=None).
+_COLUMNAS_AGENDA = 3
+
+# Textos que pd.read_excel interpreta como NaN por defecto, más los códigos de error
+# de Excel (openpyxl los devuelve como texto, pandas los convierte a NaN)
+_VALORES_NA_EXCEL = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!',
+])
+
+def _normalizar_celda(valor):
+    """Convierte una celda cruda de openpyxl al valor que daría pd.read_excel"""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        return None if valor in _VALORES_NA_EXCEL else valor
+    if isinstance(valor, float):
+        if valor != valor:
+            return None
+        if valor.is_integer():
+            return int(valor)
+    return valor
+
+def _mapear_valores_unicos(serie: pd.Series, funcion) -> Dict:
+    """Diccionario valor -> funcion(valor) evaluado una sola vez por valor distinto"""
+    return {valor: funcion(valor) for valor in pd.unique(serie)}
+
+_DIAS_SEMANA_REGEX = re.compile('LUNES|MARTES|MIÉRCOLES|MIERCOLES|JUEVES|VIERNES|SÁBADO|SABADO|DOMINGO')
+_DIAS_NORMALIZADOS = {
+    'LUNES': 'Lunes', 'MARTES': 'Martes', 'MIÉRCOLES': 'Miércoles',
+    'MIERCOLES': 'Miércoles', 'JUEVES': 'Jueves', 'VIERNES': 'Viernes',
+    'SÁBADO': 'Sábado', 'SABADO': 'Sábado', 'SÁB': 'Sábado', 'DOMINGO': 'Domingo'
+}
+_HORA_REGEX = re.compile(r'(\d{1,2}):(\d{2})')
+
+MINUTOS_POR_DIA = 24 * 60
+
+def minutos_del_dia(horas: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de horas 'HH:MM' a minutos desde la medianoche (Int16).
+    Los valores vacíos o ilegibles (p. ej. '25:00', 'sin horario') quedan como <NA>.
+    Cada texto distinto se interpreta una sola vez.
+    """
+    codigos, valores = pd.factorize(horas)
+    partes = pd.Series(valores, dtype=object).astype(str).str.extract(r'^\s*(\d{1,2}):(\d{2})\s*$')
+    hora = pd.to_numeric(partes[0]).to_numpy()
+    minuto = pd.to_numeric(partes[1]).to_numpy()
+    legibles = (hora < 24) & (minuto < 60)
+    minutos_valores = np.where(legibles, hora * 60 + minuto, -1)
+    
+    minutos = np.append(minutos_valores, -1)[codigos] if len(valores) else np.full(len(horas), -1)
+    return pd.Series(minutos, index=horas.index).astype('Int16').mask(minutos < 0)
+
+def agregar_minutos_del_dia(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega minuto_inicio, minuto_fin y duracion_min (turnos que pasan la medianoche
+    se cuentan hasta el día siguiente) junto con horario_valido, que marca las filas
+    con ambas horas legibles y duración positiva. hora_inicio/hora_fin quedan para mostrar.
+    """
+    df['minuto_inicio'] = minutos_del_dia(df['hora_inicio'])
+    df['minuto_fin'] = minutos_del_dia(df['hora_fin'])
+    df['duracion_min'] = (df['minuto_fin'] - df['minuto_inicio']) % MINUTOS_POR_DIA
+    df['horario_valido'] = (df['duracion_min'] > 0).fillna(False).astype(bool)
+    return df
+
+def agregar_agenda_uid(df: pd.DataFrame, ocurrencias: Optional[Dict[Tuple[str, str], int]] = None) -> pd.DataFrame:
+    """
+    Agrega agenda_uid, un identificador estable de cada agenda derivado de su contenido:
+    efector + hash de (efector, título, ocurrencia), donde ocurrencia numera las agendas
+    con el mismo título dentro del efector en el orden en que aparecen. A diferencia de
+    agenda_id (contador correlativo), no cambia si se agregan o quitan otras agendas.
+    Si una fuente llega en varios bloques, pasar el mismo diccionario ocurrencias en cada
+    llamada continúa la numeración del bloque anterior.
+    """
+    if ocurrencias is None:
+        ocurrencias = {}
+    agendas = df.drop_duplicates('agenda_id')[['agenda_id', 'efector', 'nombre_original_agenda']]
+    uids = {}
+    for agenda_id, efector, titulo in zip(agendas['agenda_id'], agendas['efector'], agendas['nombre_original_agenda']):
+        ocurrencia = ocurrencias.get((efector, titulo), 0)
+        ocurrencias[(efector, titulo)] = ocurrencia + 1
+        uids[agenda_id] = f"{efector}_{_hash_agenda(efector, titulo, ocurrencia)}"
+    df['agenda_uid'] = df['agenda_id'].map(uids)
+    return df
+
+def _hash_agenda(efector: str, titulo: str, ocurrencia: int) -> str:
+    return hashlib.sha1(f"{efector}\x1f{titulo}\x1f{ocurrencia}".encode('utf-8')).hexdigest()[:12]
+
+def mapa_ids_agenda(df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por agenda con su agenda_id correlativo y su agenda_uid estable"""
+    return df.drop_duplicates('agenda_id')[['agenda_id', 'agenda_uid', 'efector', 'nombre_original_agenda']]
+
+# Formato tabular del HCSI: días abreviados y tipos de turno de la base de datos
+_DIAS_HCSI = {
+    'LUN': 'Lunes', 'LUNES': 'Lunes',
+    'MAR': 'Martes', 'MARTES': 'Martes',
+    'MIE': 'Miércoles', 'MIERCOLES': 'Miércoles', 'MIÉRCOLES': 'Miércoles',
+    'JUE': 'Jueves', 'JUEVES': 'Jueves',
+    'VIE': 'Viernes', 'VIERNES': 'Viernes',
+    'SAB': 'Sábado', 'SABADO': 'Sábado', 'SÁBADO': 'Sábado', 'SÁB': 'Sábado',
+    'DOM': 'Domingo', 'DOMINGO': 'Domingo'
+}
+_COLUMNAS_HCSI = frozenset(['Especialidad', 'Subespecialidad', 'Profesional', 'Dia', 'Horario', 'TipoTurno'])
+_TIPOS_TURNO_HCSI = {
+    'PROGRAMADO': 'PROGRAMADA',
+    'ESPONTANEO': 'CAI/Espontánea',
+    'ESPONTÁNEO': 'CAI/Espontánea',
+}
+
+
+# Formatos que puede generar exportar_consolidado
+FORMATOS_SALIDA = ('csv', 'xlsx', 'parquet')
+
+
 class AgendaNormalizer:
     """
     Clase para normalizar y consolidar agendas médicas de múltiples centros de salud
     """
     
-    def __init__(self):
+    def __init__(self, tamano_cache_componentes: int = 4096, tamano_bloque_hcsi: Optional[int] = None,
+                 medir_memoria: bool = False, telemetria_patrones: bool = False,
+                 archivo_reglas: Optional[str] = None, archivo_cache_persistente: Optional[str] = None,
+                 procesos_por_archivo: int = 1, directorio_grillas: Optional[str] = None,
+                 filas_minimas_fragmento: Optional[int] = None):
         self.df_consolidado = pd.DataFrame(columns=[
             'agenda_id', 'nombre_original_agenda', 'doctor', 'area', 'tipo_turno', 
             'dia', 'hora_inicio', 'hora_fin', 'efector', 'ventanilla'
         ])
         
+        # Caché acotada (LRU) de componentes extraídos, clave = título limpio.
+        # Un mismo título aparece en varias filas de horarios (una por día/franja).
+        self.tamano_cache_componentes = tamano_cache_componentes
+        self._cache_componentes: 'OrderedDict[str, Dict[str, str]]' = OrderedDict()
+        self.estadisticas_cache = {'aciertos': 0, 'fallos': 0, 'desalojos': 0, 'persistentes': 0, 'grillas': 0}
+        self.estadisticas_incremental = {'reutilizados': 0, 'reprocesados': 0}
+        
+        # Caché en disco (SQLite) de componentes entre corridas; None = deshabilitada
+        self.archivo_cache_persistente = archivo_cache_persistente
+        self._cache_persistente: Optional['_CachePersistenteComponentes'] = None
+        self._versiones_componentes: Optional[Tuple[str, Dict[str, str]]] = None
+        
+        # Grillas de celdas ya decodificadas de cada Excel (Arrow), por hash del archivo;
+        # None = siempre se lee el Excel
+        self.directorio_grillas = directorio_grillas
+        
+        # Reglas externas (áreas, ventanillas, exclusiones del Materno, efectores)
+        self.archivo_reglas = archivo_reglas or ARCHIVO_REGLAS
+        self.reglas = cargar_reglas(self.archivo_reglas)
+        
+        # Filas del CSV del HCSI leídas por bloque (None = todo el archivo de una vez)
+        self.tamano_bloque_hcsi = tamano_bloque_hcsi
+        
+        # Procesos para construir los registros de una sola hoja grande, cortada en
+        # fragmentos en los títulos de agenda (1 = sin fragmentar, 0 = todos los núcleos),
+        # y filas mínimas de cada fragmento (None = FILAS_MINIMAS_FRAGMENTO)
+        self.procesos_por_archivo = procesos_por_archivo
+        self.filas_minimas_fragmento = filas_minimas_fragmento
+        
+        # Instrumentación: tiempos por etapa y por archivo; memoria pico con tracemalloc
+        # (opcional porque tracemalloc hace bastante más lento el procesamiento)
+        self.medir_memoria = medir_memoria
+        # Telemetría por patrón de la cascada de extracción (también opcional por su costo)
+        self.telemetria_patrones = telemetria_patrones
+        self.reiniciar_instrumentacion()
+    
+    def configuracion(self) -> Dict:
+        """Parámetros del constructor, para recrear el normalizador en otro proceso"""
+        return {
+            'tamano_cache_componentes': self.tamano_cache_componentes,
+            'tamano_bloque_hcsi': self.tamano_bloque_hcsi,
+            'medir_memoria': self.medir_memoria,
+            'telemetria_patrones': self.telemetria_patrones,
+            'archivo_reglas': self.archivo_reglas,
+            'archivo_cache_persistente': self.archivo_cache_persistente,
+            'procesos_por_archivo': self.procesos_por_archivo,
+            'directorio_grillas': self.directorio_grillas,
+            'filas_minimas_fragmento': self.filas_minimas_fragmento,
+        }
+    
+    def actualizar_reglas(self) -> bool:
+        """
+        Vuelve a cargar el archivo de reglas si cambió. Como las áreas dependen de las
+        reglas, un cambio de versión vacía la caché de componentes. Devuelve True si cambió.
+        """
+        reglas = cargar_reglas(self.archivo_reglas)
+        if reglas is self.reglas:
+            return False
+        cambio = reglas.version != self.reglas.version
+        self.reglas = reglas
+        if cambio:
+            print(f"Reglas actualizadas (versión {reglas.version})")
+            self.reiniciar_cache_componentes()
+        return cambio
+    
+    def reiniciar_instrumentacion(self):
+        """Vacía los tiempos y mediciones de memoria acumulados"""
+        self.instrumentacion = {'etapas': {}, 'memoria_etapas_kib': {}, 'archivos': {}, 'memoria_pico_kib': None,
+                                'patrones': {}}
+        self._telemetria = (_TelemetriaPatrones(self.instrumentacion['patrones'])
+                            if self.telemetria_patrones else None)
+        self._archivo_actual: Optional[str] = None
+        self._error_fuente: Optional[str] = None
+        self._picos_abiertos: List[int] = []
+    
+    # Las mediciones de memoria se anidan (corrida > archivo > etapa). tracemalloc tiene
+    # un único pico global: antes de reiniciarlo se acumula en todas las mediciones abiertas.
+    def _plegar_picos_memoria(self):
+        pico = tracemalloc.get_traced_memory()[1]
+        self._picos_abiertos = [max(pico_abierto, pico) for pico_abierto in self._picos_abiertos]
+        tracemalloc.reset_peak()
+    
+    def _abrir_pico_memoria(self) -> bool:
+        """Empieza una medición de memoria pico; devuelve True si inició tracemalloc"""
+        iniciado = not tracemalloc.is_tracing()
+        if iniciado:
+            tracemalloc.start()
+        else:
+            self._plegar_picos_memoria()
+        self._picos_abiertos.append(0)
+        return iniciado
+    
+    def _cerrar_pico_memoria(self, iniciado: bool) -> int:
+        """Termina la medición más reciente y devuelve su pico en KiB"""
+        self._plegar_picos_memoria()
+        pico = self._picos_abiertos.pop()
+        if iniciado:
+            tracemalloc.stop()
+        return pico // 1024
+    
+    @contextmanager
+    def medir(self, etapa: str):
+        """
+        Acumula el tiempo del bloque en la etapa indicada, en el total de la corrida y en
+        el archivo que se está procesando. Las etapas pueden anidarse (cascada_regex
+        ocurre dentro de extraccion), por eso sus tiempos no se suman entre sí.
+        Con medir_memoria también registra el mayor pico de memoria de la etapa.
+        """
+        iniciado = self._abrir_pico_memoria() if self.medir_memoria else False
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            etapas = self.instrumentacion['etapas']
+            etapas[etapa] = etapas.get(etapa, 0.0) + duracion
+            if self._archivo_actual is not None:
+                etapas_archivo = self.instrumentacion['archivos'][self._archivo_actual]['etapas']
+                etapas_archivo[etapa] = etapas_archivo.get(etapa, 0.0) + duracion
+            if self.medir_memoria:
+                pico = self._cerrar_pico_memoria(iniciado)
+                memoria_etapas = self.instrumentacion['memoria_etapas_kib']
+                memoria_etapas[etapa] = max(memoria_etapas.get(etapa, 0), pico)
+    
+    def _combinar_instrumentacion(self, otra: Dict):
+        """Suma la instrumentación de un proceso de trabajo a la de esta corrida"""
+        for etapa, segundos in otra['etapas'].items():
+            self.instrumentacion['etapas'][etapa] = self.instrumentacion['etapas'].get(etapa, 0.0) + segundos
+        for etapa, pico in otra['memoria_etapas_kib'].items():
+            self.instrumentacion['memoria_etapas_kib'][etapa] = max(
+                self.instrumentacion['memoria_etapas_kib'].get(etapa, 0), pico)
+        self.instrumentacion['archivos'].update(otra['archivos'])
+        _TelemetriaPatrones.combinar(self.instrumentacion['patrones'], otra['patrones'])
+    
+    def reiniciar_cache_componentes(self):
+        """Vacía la caché de componentes y sus contadores (una caché por ejecución)"""
+        self._cache_componentes.clear()
+        self.estadisticas_cache = {'aciertos': 0, 'fallos': 0, 'desalojos': 0, 'persistentes': 0, 'grillas': 0}
+    
+    def obtener_componentes_agenda(self, agenda: str) -> Dict[str, str]:
+        """
+        Versión memoizada de extraer_componentes_agenda: limpia el título y solo ejecuta
+        la cascada de patrones la primera vez que aparece. El resultado se comparte entre
+        llamadas, por lo que no debe modificarse.
+        """
+        clave = self.limpiar_texto(agenda)
+        componentes = self._cache_componentes.get(clave)
+        if componentes is not None:
+            self._cache_componentes.move_to_end(clave)
+            self.estadisticas_cache['aciertos'] += 1
+            return componentes
+        
+        self.estadisticas_cache['fallos'] += 1
+        if self._cache_persistente is not None and clave:
+            componentes = self._componentes_con_cache_persistente(clave)
+        else:
+            with self.medir('cascada_regex'):
+                componentes = self.extraer_componentes_agenda(clave)
+        self._cache_componentes[clave] = componentes
+        if len(self._cache_componentes) > self.tamano_cache_componentes:
+            self._cache_componentes.popitem(last=False)
+            self.estadisticas_cache['desalojos'] += 1
+        return componentes
+        
+    def _componentes_con_cache_persistente(self, clave: str) -> Dict[str, str]:
+        """
+        Componentes de un título limpio usando la caché en disco: solo se ejecutan los
+        patrones de los componentes que no están guardados para la versión vigente
+        de sus reglas (p. ej. al tocar un patrón de áreas, el doctor sigue en caché).
+        """
+        componentes = self._cache_persistente.obtener(clave)
+        if len(componentes) == len(COMPONENTES_AGENDA):
+            self.estadisticas_cache['persistentes'] += 1
+        else:
+            with self.medir('cascada_regex'):
+                nombre_limpio = self.decodificar_caracteres_especiales(clave.strip())
+                if 'doctor' not in componentes:
+                    componentes['doctor'] = self._extraer_doctor(nombre_limpio)
+                if 'area' not in componentes or 'tipo_turno' not in componentes:
+                    componentes['area'], componentes['tipo_turno'] = self._extraer_area_y_tipo(nombre_limpio.upper())
+            self._cache_persistente.agregar(clave, componentes)
+        return {componente: componentes[componente] for componente in COMPONENTES_AGENDA}
+    
+    def versiones_componentes(self) -> Dict[str, str]:
+        """
+        Huella de las reglas y del código de los que depende cada componente extraído.
+        Es la versión con la que se guardan los valores en la caché en disco: cambiar un
+        patrón de doctor invalida solo 'doctor'; uno de áreas, solo 'area'. Incluye el
+        código de los auxiliares que deciden cada resultado (reparación de codificación,
+        prefiltro por literales, cascada de áreas, reglas de doctor).
+        """
+        if self._versiones_componentes is not None and self._versiones_componentes[0] == self.reglas.version:
+            return self._versiones_componentes[1]
+        versiones = _versiones_componentes(self.reglas.cascada_areas)
+        self._versiones_componentes = (self.reglas.version, versiones)
+        return versiones
+    
+    def _abrir_cache_persistente(self):
+        """Abre la caché en disco (o la reabre si cambiaron las versiones de los componentes)"""
+        if self.archivo_cache_persistente is None:
+            return
+        versiones = self.versiones_componentes()
+        if self._cache_persistente is not None:
+            if self._cache_persistente.versiones == versiones:
+                return
+            self._cache_persistente.cerrar()
+        self._cache_persistente = _CachePersistenteComponentes(self.archivo_cache_persistente, versiones)
+    
     def decodificar_caracteres_especiales(self, texto: str) -> str:
         """
         Decodifica caracteres especiales corruptos comunes en la base de datos.
@@ -29,65 +1113,11 @@ class AgendaNormalizer:
         """
         if not texto:
             return texto
-            
-        # Mapeo de caracteres corruptos a caracteres correctos
-        # Basado en codificación UTF-8 mal interpretada como Latin-1
-        correcciones = {
-            # Casos más específicos PRIMERO - orden importante!
-            'MUÃ\u2019OZ': 'MUÑOZ',  # MUÑOZ completo con comilla curva derecha (8217)
-            'MUÃ\u2018OZ': 'MUÑOZ',  # MUÑOZ completo con comilla curva izquierda (8216)
-            'MUÁ\u2018OZ': 'MUÑOZ',  # MUÑOZ ya parcialmente convertido (Á + comilla izquierda)
-            'Á\u2018': 'Ñ',         # Á + comilla curva izquierda -> Ñ (para casos ya convertidos)
-            'Ã\u2019': 'Ñ',         # Ã + comilla curva derecha -> Ñ
-            'Ã\u2018': 'Ñ',         # Ã + comilla curva izquierda -> Ñ  
-            'Ã_x008d_': 'Í',        # Para NOEMÍ
-            'Ã\x8d': 'Í',           # Corrección para BUFELLI MARÍAA (0xC3 0x8D -> Í)
-            'MARÃA': 'MARÍA',       # Corrección específica para BUFELLI MARÍAA DE LOS MILAGROS
-            'Ã"NICA': 'ÓNICA',      # Para VERÓNICA - patrón específico primero
-            'Á\u201d': 'Ó',         # Á + comilla doble derecha (8221) -> Ó (para casos ya convertidos)
-            'Á\u201c': 'Ó',         # Á + comilla doble izquierda (8220) -> Ó (para casos ya convertidos)
-            'Ã\u201d': 'Ó',         # Ã + comilla doble derecha (8221) -> Ó
-            'Ã\u201c': 'Ó',         # Ã + comilla doble izquierda (8220) -> Ó
-            'Ã"': 'Ó',              # Ó mayúscula - debe ir antes que el patrón general
-            'Í"': 'Ó',              # Corrección exacta: Í" -> Ó (ord 8220)
-            'Ã_x0081_': 'Á',        # Corrección exacta: Ã_x0081_ -> Á
-            
-            # Patrones comunes de UTF-8 mal interpretado
-            'Ã¡': 'á',   'Ã©': 'é',   'Ã­': 'í',   'Ã³': 'ó',   'Ãº': 'ú',    # Vocales con tilde minúsculas
-            'Ã‰': 'É',   'Ãš': 'Ú',                                            # Vocales con tilde mayúsculas
-            'Ã ': 'à',   'Ã¨': 'è',   'Ã¬': 'ì',   'Ã²': 'ò',   'Ã¹': 'ù',    # Vocales con acento grave
-            'Ã¤': 'ä',   'Ã«': 'ë',   'Ã¯': 'ï',   'Ã¶': 'ö',   'Ã¼': 'ü',    # Vocales con diéresis
-            'Ã¢': 'â',   'Ãª': 'ê',   'Ã®': 'î',   'Ã´': 'ô',   'Ã»': 'û',    # Vocales con circunflejo
-            'Ã§': 'ç',   'Ã‡': 'Ç',                                           # C cedilla
-            'Ã±': 'ñ',   'Ã\u00d1': 'Ñ',                                     # Eñe
-            'Ã¢': 'â',   'Ãª': 'ê',   'Ã®': 'î',   'Ã´': 'ô',   'Ã»': 'û',    # Vocales con circunflejo
-            'Ã§': 'ç',   'Ã‡': 'Ç',                                           # C cedilla
-            'Ã±': 'ñ',   'Ã\u00d1': 'Ñ',                                     # Eñe
-            
-            # Patrones específicos de codificación hexadecimal
-            '_x008d_': 'Í',         # Patrón hex para Í
-            '_x0081_': 'Á',         # Patrón hex para Á
-            
-            # Casos específicos completos para nombres comunes
-            'MUÃ_x0081_OZ': 'MUÑOZ',
-            'MUÃOZ': 'MUÑOZ',
-            'MUÃIÃ±OZ': 'MUÑOZ',    # Variante doble corrupción
-            'JIMÃ©NEZ': 'JIMÉNEZ',
-            'MÃ¡RQUEZ': 'MÁRQUEZ',
-            'GÃ³MEZ': 'GÓMEZ',
-            
-            # Regla general AL FINAL - solo cuando no hay patrones más específicos
-            'Ã': 'Á'               # Corrección general: Ã -> Á (SOLO cuando no hay patrones más específicos)
-        }
-        
-        texto_corregido = texto
-        # Aplicar correcciones en orden (más específicas primero)
-        # Ordenar por longitud descendente para que los patrones más largos se apliquen primero
-        for corrupto in sorted(correcciones.keys(), key=len, reverse=True):
-            if corrupto in texto_corregido:
-                texto_corregido = texto_corregido.replace(corrupto, correcciones[corrupto])
-            
-        return texto_corregido
+        return _REPARADOR_CODIFICACION.reparar(texto)
+    
+    def decodificar_columna(self, serie: pd.Series) -> pd.Series:
+        """Versión por lotes de decodificar_caracteres_especiales (solo valores únicos)"""
+        return _REPARADOR_CODIFICACION.reparar_serie(serie)
     
     def extraer_componentes_agenda(self, nombre_agenda: str) -> Dict[str, str]:
         """
@@ -99,744 +1129,873 @@ class AgendaNormalizer:
             
         # PASO 1: Decodificar caracteres especiales corruptos
         nombre_limpio = self.decodificar_caracteres_especiales(str(nombre_agenda).strip())
+        area, tipo_turno = self._extraer_area_y_tipo(nombre_limpio.upper())
+        doctor = self._extraer_doctor(nombre_limpio)
         
-        # Inicializar componentes
-        doctor = ""
-        area = ""
-        tipo_turno = ""
-        
-        # Patrones para identificar áreas médicas
-        areas_patterns = {
-            'ODONTOLOGIA': r'\bODONTOLOGIA\b|\bODONTOLOGÍA\b|\bODONTOLGIA\b|\bORTODONCIA\b|\bODONTOLOGIA\s+OBSTETRICIA\b',
-            'PSICOLOGIA INFANTIL': r'\bPSICOLOGIA\s+INFANTIL\b|\bPSICOLOGÍA\s+INFANTIL\b|\bPSCIOLOGIA\s+INFANTIL\b',
-            'PSICOLOGIA': r'\bPSICOLOG[AO]\b|\bLIC\.\s*EN\s+PSICOLOGIA\b|\bPSICOLOGIA\s*(?:-\s*(?:LIC|DR|DRA))?\b|\bADOLESCENCIA\b|\bPSICOLOGIA\s+OBSTETRICIA\b|\bPSCIOLOGIA\b',
-            'INFECTOLOGIA': r'\bINFECTOLOGIA\b|\bINFECTOLOGIA\s+ADULTO\b',
-            'OBSTETRICIA': r'\bOBSTETRICIA\b|\bOSBTETRICIA\b|\bPLANIFICACION\s+FAMILIAR\b|\bPLANIFICACIÓN\s+FAMILIAR\b|\bPUERPERIO\b',
-            'PEDIATRIA': r'\bPEDIATRIA\b|\bMEDIANO\s+RIESGO\b|\b(?<!OBSTETRICIA\s)(?<!OSBTETRICIA\s)ALTO\s+RIESGO\b|\bINFANTO\s+JUVENIL\b|\bRECIEN\s+NACIDO\b|\bRECIÉN\s+NACIDO\b|\bNIÑO\s+SANO\b|\bNINO\s+SANO\b',
-            'CARDIOLOGIA': r'\bCARDIOLOGIA\b|\bCARDIOLOGÍA\b|\bELECTROCARDIOGRAMA\b',
-            'NEUROLOGIA': r'\bNEUROLOGIA\b|\bEEG\b',
-            'NEUMONOLOGIA': r'\bNEUMONOLOGIA\b|\bTUBERCULOSIS\b',
-            'GINECOLOGIA': r'\bGINECOLOGIA\b|\bTRACTO\s+GENITAL\s+INFERIOR\b',
-            'UROLOGIA': r'\bUROLOGIA\b',
-            'DERMATOLOGIA': r'\bDERMATOLOGIA\b',
-            'OFTALMOLOGIA': r'\bOFTALMOLOGIA\b|\bOFTALMOLOGÍA\b',
-            'TRAUMATOLOGIA Y ORTOPEDIA': r'\bTRAUMATOLOGIA\s+Y\s+ORTOPEDIA\b|\bTRAUMATOLOGIA\s+INFANTIL\b',
-            'TRAUMATOLOGIA': r'\bTRAUMATOLOGIA\b',
-            'ENDOCRINOLOGIA': r'\bENDOCRINOLOGIA\b',
-            'GASTROENTEROLOGIA': r'\bGASTROENTEROLOGIA\b|\bGASTROENTEROLOGÍA\b',
-            'NEUMOLOGIA': r'\bNEUMOLOGIA\b',
-            'HEMATOLOGIA': r'\bHEMATOLOGIA\b',
-            'ONCOLOGIA': r'\bONCOLOGIA\b',
-            'REUMATOLOGIA': r'\bREUMATOLOGIA\b',
-            'NEFROLOGIA PEDIATRICA': r'\bNEFROLOGIA\s+INFANTIL\b',
-            'NEFROLOGIA': r'\bNEFROLOGIA\b',
-            'CLINICA MEDICA': r'\bCLINICA\s+MEDICA\b|\bMEDICO\s+CLINICO\b|\bMEDICA\s+CLINICA\b|\bMEDICO\s+CLINCO\b',
-            'MEDICINA INTERNA': r'\bMEDICINA\s+INTERNA\b',
-            'CIRUGIA PEDIATRICA': r'\bCIRUGIA\s+PEDIATRICA\b|\bCIRUGIA\s+INFANTIL\b|\bCRANEO\s+FACIAL\b|\bCIRUGIA\s+PLASTICA\s+INFANTIL\b',
-            'CIRUGIA': r'\bCIRUGIA\b',
-            'ANESTESIOLOGIA': r'\bANESTESIOLOGIA\b',
-            'PSIQUIATRIA': r'\bPSIQUIATRIA\b',
-            'HEMOTERAPIA': r'\bHEMOTERAPIA\b',
-            'KINESIOLOGIA': r'\bKINESIOLOGIA\b',
-            'LABORATORIO': r'\bLABORATORIO\b',
-            'NUTRICION': r'\bNUTRICION\b|\bNUTRICIONISTA\b',
-            'NEUROCIRUGIA PEDIATRICA': r'\bNEUROCIRUGIA\s+INFANTIL\b|\bNEUROCIRUGÍA\s+INFANTIL\b',
-            'NEUROCIRUGÍA': r'\bNEUROCIRUGIA\b|\bNEUROCIRUGÍA\b',
-            'MEDICINA LABORAL': r'\bMEDICINA\s+LABORAL\b',
-            'SERVICIO SOCIAL': r'\bSERVICIO\s+SOCIAL\b|\bLIC\.\s*EN\s+TRABAJO\s+SOCIAL\b|\bTRABAJO\s+SOCIAL\b|\bTRABAJADORA\s+SOCIAL\b',
-            'DIABETOLOGIA': r'\bDIABETOLOGIA\b',
-            'GUARDIA MEDICA': r'\bGUARDIA\s+MEDICA\b(?!\s+(?:CLINICA|PEDIATRICA|PEDI))',
-            'GUARDIA CLINICA': r'\bGUARDIA\s+M[EÉ]DICA\s+CL[IÍ]NICA\b',
-            'GUARDIA PEDIATRICA': r'\bGUARDIA\s+M[EÉ]DICA\s+PEDI[AÁ]TRICA\b',
-            'DIRECCION MEDICA': r'\bDIRECCION\s+MEDICA\b',
-            'ANATOMIA PATOLOGICA': r'\bANATOMIA\s+PATOLOGICA\b|A\.\s*PATOLOGICA',
-            'CIRUGIA VASCULAR': r'\bCIRUGIA\s+VASCULAR\b',
-            'OTORRINOLARINGOLOGIA': r'\bOTORRINOLARINGOLOGIA\b|\bAUDIOMETRIA\b|\bAUDIOMETRIA\s+INFANTIL\b|\bOTORRINO\b|\bOAES\b|\bPEAT\b|\bPOTENCIALES\s+EVOCADOS\b',
-            'RADIOLOGIA': r'\bRADIOLOGIA\b',
-            'RAYOS': r'\bRAYOS\b|\bRX\s+SIMPLE\b|\bAGENDA\s+RAYOS\b',
-            'ENDODONCIA': r'\bENDODONCIA\b',
-            'PROTESIS': r'\bPROTESIS\b',
-            'ESTIMULACION TEMPRANA': r'\bESTIMULACION\s+TEMPRANA\b',
-            'ECOGRAFIA': r'\bECOGRAFIAS?\b|\bDIAGNOSTICO\s+POR\s+IMAGENES\b|\bECOCARDIOGRAMA\b',
-            'PSICOFISICO': r'\bPSICOFISICO\b',
-            'DIRECCION MEDICA': r'\bDIRECTOR\s+MEDICO\b|\bDIRECCION\s+MEDICA\b',
-            'GENETICA': r'\bGENETICA\b|\bGENÉTICA\b',
-            'MEDICINA GENERAL': r'\bGENERALISTA\b|\bMEDICINA\s+GENERAL\b',
-            'MEDICINA FAMILIAR': r'\bMEDICINA\s+FAMILIAR\b',
-            'SALUD SEXUAL': r'\bSALUD\s+SEXUAL\b',
-            'MEDICINA PREVENTIVA': r'\bCHARLA\s+TABAQUISMO\b|\bMEDICINA\s+PREVENTIVA\b',
-            'MUSICOTERAPIA': r'\bMUSICOTERAPIA\b',
-            'FONOAUDIOLOGIA': r'\bFONOAUDIOLOGIA\b|\bDEGLUCION\s+INFANTIL\b|\bDEGLUCIÓN\s+INFANTIL\b',
-            'TERAPIA OCUPACIONAL': r'\bTERAPIA\s+OCUPACIONAL\b',
-            'PSICOPEDAGOGIA': r'\bPSICOPEDAGOGIA\b',
-            'ENFERMERIA': r'\bENFERMERIA\b|\bENFERMERÍA\b|\bLIC\.\s*EN\s+ENFERMERIA\b|\bLIC\.\s*EN\s+ENFERMERÍA\b|\bENFERMER[AO]\b',
-            'VACUNACION': r'\bVACUNACION\b|\bVACUNACIÓN\b|\bVACUNAS\b|\bVACUNATORIO\b|\bAGENDA\s+VACUNATORIO\b',
-            'RONDA SANITARIA': r'\bRONDA\s+SANITARIA\b',
-            'ALERGOLOGIA PEDIATRICA': r'\bALERGIA\b',
-            'CUIDADOS PALIATIVOS': r'\bCUIDADOS\s+PALIATIVOS\b|\bCUIDADOS\s+PALEATIVOS\b',
-            'SERVICIO DE EMERGENCIAS': r'\bGUARDIA\s+PEDIATRICA\s+AMARILLO\b'
+        return {
+            'doctor': doctor,
+            'area': area,
+            'tipo_turno': tipo_turno
         }
+    
+    def _extraer_area_y_tipo(self, texto_upper: str) -> Tuple[str, str]:
+        """
+        Área y tipo de turno del título decodificado en mayúsculas. Se resuelven juntos
+        porque GENERAL puede terminar como tipo de turno o como área según el resto.
+        """
+        # Buscar área médica (solo se evalúan los patrones cuyo literal aparece en el texto)
+        cascada_areas = self.reglas.cascada_areas
+        indice_area = cascada_areas.buscar(texto_upper, self._telemetria, 'area')
+        area = cascada_areas.nombres[indice_area] if indice_area is not None else ""
         
-        # Buscar área médica
-        texto_upper = nombre_limpio.upper()
-        for area_nombre, pattern in areas_patterns.items():
-            if re.search(pattern, texto_upper):
-                area = area_nombre
-                break
+        # Buscar tipo de turno - "A LA BREVEDAD" tiene la prioridad más alta
+        indice_tipo = _CASCADA_TIPOS.buscar(texto_upper, self._telemetria, 'tipo_turno')
+        tipo_turno = _CASCADA_TIPOS.nombres[indice_tipo] if indice_tipo is not None else ""
         
-        # Buscar doctor - patrones mejorados (ORDEN IMPORTA: más específicos primero)
-        doctor_patterns = [
-            # Patrón específico para "ESPECIALIDAD - DRA/DR NOMBRE APELLIDO - EVENTUAL" (solo EVENTUAL)
-            r'\b(?:ODONTOLOGIA|PEDIATRIA)\s+(?:ADULTOS?|PEDIATRIA|INFANTIL)?\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*-\s*EVENTUAL\s*$',
-            # Patrón específico para "ESPECIALIDAD - DRA/DR NOMBRE APELLIDO - TIPO" con EVENTUAL ESPONTANEA
-            r'\b(?:ODONTOLOGIA|PEDIATRIA)\s+(?:ADULTOS?|PEDIATRIA|INFANTIL)?\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*-\s*(?:EVENTUAL\s+)?(?:ESPONTANEA|PROGRAMADA)',
-            # Patrón para profesiones que incluyen DR/DRA en el medio - PROFESION - DRA/DR NOMBRE - ACTIVIDAD (opcional)
-            r'\b(?:PSICOLOG[OA]|NUTRICIONISTA|KINESIOLOGO|FONOAUDIOLOGO)\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ].+?\s+.+?|DRA?\s+[A-ZÁÉÍÓÚÑÜ].+?\s+.+?)(?:\s*-\s*\w+.*|\s*$)',
-            # Patrón específico para ESTIMULACION TEMPRANA - DRA/DR NOMBRE (maneja caracteres corruptos)
-            r'\bESTIMULACION\s+TEMPRANA\s*-\s*(DRA?\.\s*[A-ZÁÉÍÓÚÑÜ].+?\s+.+?)(?:\s*$|\s*-)',
-            # Patrón para profesiones seguido de nombre - NUTRICIONISTA/KINESIOLOGO/etc - NOMBRE - TIPO  
-            r'\b(?:NUTRICIONISTA|KINESIOLOGO|FONOAUDIOLOGO|TRABAJADOR[A]?\s+SOCIAL|TRABAJO\s+SOCIAL|PSICOLOG[OA])[\.\s]*[-\.\s]\s*([A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+(?:\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)+)\s*(?:-\s*(?:GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PROGRAMADA|ESPONTANEA|ESPONTÁNEA|PAP|CAI|CONTROL|URGENCIA|SOBRETURNO|REUNION\s+DE\s+EQUIPO)|\s*$)',
-            # Patrón específico para DRA/DR CON COMA - PEDIATRIA - DRA, NOMBRE APELLIDO (PRESERVAR formato completo)
-            r'(?:PEDIATRIA|ODONTOLOGIA|GINECOLOGIA|OBSTETRICIA|CARDIOLOGIA|TRAUMATOLOGIA|NEUROLOGIA|OFTALMOLOGIA|OTORRINOLARINGOLOGIA|UROLOGIA|DERMATOLOGIA|ENDOCRINOLOGIA|GASTROENTEROLOGIA|HEMATOLOGIA|INFECTOLOGIA|NEFROLOGIA|NEUMONOLOGIA|ONCOLOGIA|REUMATOLOGIA|PSIQUIATRIA)(?:\s*-\s*\w+)*\s*-\s*(DRA?,\s*[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
-            # Patrón para DRA/DR seguido del nombre - detener antes de palabras clave (PRESERVAR DR/DRA con o sin punto)
-            r'\b(DRA?\.\s*[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)(?=\s+(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA))|(\bDRA?\.\s*[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)\s*(?:-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
-            # Patrón para DRA/DR SIN punto seguido del nombre (PRESERVAR DR/DRA sin punto)
-            r'\b(DRA?\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)(?=\s+(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA))|(\bDRA?\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜáéíóúñü\u00C0-\u017F][A-Za-záéíóúñüÁÉÍÓÚÑÜ\u00C0-\u017F]+)*)\s*(?:-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
-            # Patrón para DOCTOR/DOCTORA seguido del nombre (PRESERVAR DOCTOR/DOCTORA)
-            r'\b(DOCTOR[A]?\s+[A-ZÁÉÍÓÚÑÜ].+?)(?:\s*-\s*(?:EVENTUAL\s+)?(?:PROGRAMADA|ESPONTANEA|ESPONTÁNEA|GENERAL|TRATAMIENTO|ADMISION|ADMISIÓN|PAP|CAI|RECITADOS|RECIEN\s+NACIDOS|EMBARAZADAS|CONTROL|URGENCIA|SOBRETURNO|DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO|Copia|COPIA)|\s*$)',
-            # Patrón específico para formato "APELLIDO ,NOMBRE" después de tipo de turno
-            r'-\s*(?:A\s+LA\s+BREVEDAD|URGENCIA|PROGRAMADA|ESPONTANEA|ESPONTÁNEA)\s*-\s*([A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+\s*,\s*[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)',
-            
-            # PATRONES DE LIC. - MÁS ESPECÍFICOS PRIMERO
-            # Patrón específico para LIC. EN PSICOLOGIA NOMBRE - extraer solo el nombre (SIN agregar LIC.) - ÍNDICE 9
-            r'\bLIC\.\s*EN\s+PSICOLOGIA\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
-            # Patrón específico para LIC. EN TRABAJO SOCIAL NOMBRE - extraer solo el nombre (SIN agregar LIC.) - ÍNDICE 10
-            r'\bLIC\.\s*EN\s+TRABAJO\s+SOCIAL\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
-            # Patrón específico para LIC.EN NUTRICION - TRATAMIENTO - NOMBRE - extraer solo el nombre (SIN agregar LIC.) - ÍNDICE 11
-            r'\bLIC\.EN\s+NUTRICION\s*-\s*TRATAMIENTO\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
-            # Patrón específico para LIC.EN NUTRICION - GENERAL - NOMBRE - extraer solo el nombre (SIN agregar LIC.) - ÍNDICE 12
-            r'\bLIC\.EN\s+NUTRICION\s*-\s*GENERAL\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F_x0-9]+)*)',
+        # Solo detectar GENERAL como tipo de turno si está claramente separado por guiones
+        if not tipo_turno and _GENERAL_REGEX.search(texto_upper):
+            # Caso específico: GINECOLOGIA - DR. LEITES - GENERAL -> NO detectar GENERAL como tipo
+            if _GENERAL_LEITES_REGEX.search(texto_upper):
+                pass  # No hacer nada, dejar tipo_turno vacío
+            # GENERAL es tipo de turno solo si está precedido por un guión (otros casos)
+            elif _GENERAL_CON_GUION_REGEX.search(texto_upper):
+                tipo_turno = 'GENERAL'
+            # Si no hay área detectada y empieza con "GENERAL", asignar como área
+            elif not area and _GENERAL_AL_INICIO_REGEX.search(texto_upper):
+                area = 'GENERAL'
+        
+        # Solo detectar COMITE DE FAMILIAS como área si no hay ninguna otra área detectada
+        if not area and _COMITE_FAMILIAS_REGEX.search(texto_upper):
+            area = 'COMITE DE FAMILIAS'
+        
+        return area, tipo_turno
+    
+    def _extraer_doctor(self, nombre_limpio: str) -> str:
+        """
+        Recorre los patrones de doctor en orden de prioridad y devuelve el primer
+        candidato que supera las exclusiones (ubicaciones, especialidades, palabras clave)
+        """
+        doctor = ""
+        for regla in _REGLAS_DOCTOR:
+            if not regla.puede_coincidir(nombre_limpio):
+                if self._telemetria is not None:
+                    self._telemetria.descartar('doctor', regla.nombre)
+                continue
+            match = self._coincide('doctor', regla.nombre, regla.patron, nombre_limpio)
+            if not match:
+                continue
             
-            # PATRONES ESPECÍFICOS ADICIONALES (SIN agregar LIC.)
-            # Patrón para NUTRICION - PRIMERA VEZ/RONDA SANITARIA - LIC. NOMBRE - extraer solo el nombre - ÍNDICE 13  
-            r'\bNUTRICION\s*-\s*(?:PRIMERA\s+VEZ|RONDA\s+SANITARIA)\s*-\s*LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
-            # Patrón para TRABAJADORA SOCIAL - LIC. NOMBRE - extraer solo el nombre - ÍNDICE 14
-            r'\bTRABAJADOR[A]?\s+SOCIAL\s*-\s*LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
-            # Patrón general para ESPECIALIDAD - LIC. NOMBRE (agregar "LIC." al resultado) - ÍNDICE 15 (MOVIDO ANTES)
-            r'\b(?:PSICOLOGIA|PSICLOGIA|NUTRICION|KINESIOLOGIA|FONOAUDIOLOGIA|TRABAJO\s+SOCIAL|MUSICOTERAPIA|TERAPIA\s+OCUPACIONAL|PSICOPEDAGOGIA|OBSTETRICIA|ESTIMULACION\s+TEMPRANA|PSICO-ONCOLOGIA|DEGLUCION|AUDIOMETRIA)(?:\s+(?:INFANTIL|GENERAL|TRATAMIENTO|ESPONTANEA|Y\s+FISIATRIA))*\s*-?\s*LIC\.\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)(?:\s*$|\s*-)',
-            # Patrón general para ESPECIALIDAD - LIC NOMBRE (sin punto, agregar "LIC." al resultado) - ÍNDICE 16
-            r'\b(?:PSICOLOGIA|PSICLOGIA|NUTRICION|KINESIOLOGIA|FONOAUDIOLOGIA|TRABAJO\s+SOCIAL|MUSICOTERAPIA|TERAPIA\s+OCUPACIONAL|PSICOPEDAGOGIA|OBSTETRICIA|ESTIMULACION\s+TEMPRANA|PSICO-ONCOLOGIA|DEGLUCION|AUDIOMETRIA)(?:\s+(?:INFANTIL|GENERAL|TRATAMIENTO|ESPONTANEA|Y\s+FISIATRIA))*\s*-?\s*LIC\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)(?:\s*$|\s*-)',
-            # PSICOLOGIA PATRÓN ESPECÍFICO DESHABILITADO - usar solo el patrón general arriba
-            # r'\bPSIC(?:O)?LOG(?:I)?A(?:\s+INFANTIL)?\s*-\s*([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s\.]+?)\s+LIC\.?\s*(?:\s*$|\s*-)',
-            # PSICO-ONCOLOGIA PATRÓN ESPECÍFICO DESHABILITADO - usar solo el patrón general arriba
-            # r'\bPSICO-ONCOLOGIA\s+LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F\s]+?)(?:\s*$|\s*-)',
+            # Manejar patrones con múltiples grupos de captura (patrones híbridos de DR./DR)
+            nombre_candidato = next((grupo.strip() for grupo in match.groups()[:2] if grupo), None)
+            if not nombre_candidato:
+                continue
             
-            # Patrón para LIC. que aparece JUSTO ANTES del nombre (agregar "LIC." al resultado) - ÍNDICE 18
-            r'[-\s]+LIC\.\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
-            # Patrón para LIC que aparece JUSTO ANTES del nombre (agregar "LIC." al resultado) - ÍNDICE 19
-            r'[-\s]+LIC\s+([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][a-záéíóúñü\u00C0-\u017F]+)+)(?:\s*$|\s*-)',
+            candidato_upper = nombre_candidato.upper()
+            # Solo procesar si no es una ubicación (consultorio/sala con número o palabra identificativa)
+            if (len(nombre_candidato) <= 2 or
+                    self._coincide('exclusion', 'ubicacion_exacta', _UBICACION_EXACTA_REGEX, candidato_upper, 'match') or
+                    self._coincide('exclusion', 'solo_numero', _SOLO_NUMERO_REGEX, nombre_candidato, 'match') or
+                    self._coincide('exclusion', 'contiene_ubicacion', _CONTIENE_UBICACION_REGEX, candidato_upper)):
+                continue
             
-            # Patrón para nombres al final después de guión - solo nombres de personas (DEBE IR AL FINAL) - ÍNDICE 20
-            # EXCLUIR casos donde haya "LIC." justo antes del nombre para que los patrones específicos los manejen
-            r'[-\s]+(?!LIC\.?\s+)([A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+(?:\s+[A-ZÁÉÍÓÚÑÜ\u00C0-\u017F][A-Za-záéíóúñü\u00C0-\u017F]+)+)$',
+            # Verificar que no contenga palabras clave (no solo coincidencias exactas)
+            if self._coincide('exclusion', 'palabras_excluir', _PALABRAS_EXCLUIR_REGEX, candidato_upper):
+                continue
+            if self._telemetria is not None:
+                self._telemetria.aceptar('doctor', regla.nombre)
             
-            # Patrón ESPECÍFICO para nombres conocidos al inicio - solo casos muy obvios - ÍNDICE 21
-            # Solo detectar apellidos típicos que claramente son nombres de doctores
-            r'^(DE\s+ACETIS|DE\s+ROSSI|VAN\s+DER\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+|DEL\s+[A-ZÁÉÍÓÚÑÜ][A-Za-záéíóúñü]+)\s+(?:ADULTO|PEDIATRICO|INFANTIL|GENERAL|PROGRAMADA|ESPONTANEA|ESPONTÁNEA|CONTROL|URGENCIA|TRATAMIENTO)',
-        ]
-        
-        for i, pattern in enumerate(doctor_patterns):
-            match = re.search(pattern, nombre_limpio)
-            if match:
-                # Manejar patrones con múltiples grupos de captura (para patrones híbridos 6 y 7)
-                nombre_candidato = None
-                for group_idx in range(1, 3):  # Intentar grupos 1 y 2
-                    try:
-                        if match.group(group_idx):
-                            nombre_candidato = match.group(group_idx).strip()
-                            break
-                    except IndexError:
-                        continue
-                
-                if not nombre_candidato:
-                    continue
-                # Verificar que no sea una especialidad o palabra clave, pero permitir nombres largos
-                palabras_excluir = [
-                    'PSICOLOGIA', 'NUTRICION', 'TRABAJO SOCIAL', 'KINESIOLOGIA', 
-                    'TRATAMIENTO', 'GENERAL', 'PAP', 'ESPONTANEA', 'PROGRAMADA', 'ADMISION', 'ADMISIÓN',
-                    'EN PSICOLOGIA', 'EN NUTRICION', 'EN TRABAJO', 'EN KINESIOLOGIA',
-                    'LICENCIADA', 'LICENCIADO', 'MEDICO', 'MEDICA', 'AGENDA SÁBADOS',
-                    'AGENDA SABADOS', 'RESIDENTE', 'AGENDA', 'ESPONTANEA', 'AGENDA BIS',
-                    'BIS', 'DIU', 'IMPLANTE', 'EXTRACCION', 'COLOCACION', 'REUNION EQUIPO',
-                    'ADULTOS', 'ADULTO', 'INFANTIL', 'INFANTILES', 'NINOS', 'NIÑOS',
-                    'ADOLESCENTES', 'DISCAPACIDAD', 'REHABILITACION', 'REHABILITACIÓN',
-                    'PEDIATRICA', 'PEDIÁTRICA', 'CLINICA', 'CLÍNICA', 'EXTERNA',
-                    'CONSULTORIO', 'SALA', 'BOX', 'QUIROFANO', 'QUIRÓFANO',
-                    'ECG', 'EKG', 'RX', 'LAB', 'LABORATORIO', 'RADIOLOGIA', 'ECOGRAFIA', 'TAC', 'RMN',
-                    # Nuevas exclusiones para casos administrativos/descriptivos
-                    'RECIEN NACIDOS', 'RECIÉN NACIDOS', 'DE FAMILIAS', 'UNICA USUARIA', 'ÚNICA USUARIA',
-                    'TRIAGE PEDIATRIA', 'TRIAGE', 'POST ALTA', 'GINECOLOGIA QUIRUGICA HMI', 'OBSTETRICIA HMI',
-                    'ESPIROMETRIA PEDIATRIA HMI', 'DE PSIQUIATRIA PEDIATRICO', 'DE PSIQUIATRÍA PEDIÁTRICO'
-                ]
-                
-                # Verificar si es un consultorio/sala/ubicación con número o palabra identificativa
-                es_ubicacion = re.match(r'^(?:CONSULTORIO|SALA|BOX|QUIROFANO|QUIRÓFANO|PISO|PLANTA)\s*(?:\d+|[A-Z]|\w+)$', nombre_candidato.upper().strip())
-                
-                # Verificar si contiene solo números o palabras que indican ubicación
-                es_solo_numero = re.match(r'^\d+$', nombre_candidato.strip())
-                
-                # Verificar patrones de ubicación específicos
-                contiene_ubicacion = re.search(r'\b(?:CONSULTORIO|SALA|BOX|QUIROFANO|QUIRÓFANO|PISO|PLANTA)\b', nombre_candidato.upper())
-                
-                # Solo procesar si no es una ubicación
-                if nombre_candidato.strip() and len(nombre_candidato.strip()) > 2 and not es_ubicacion and not es_solo_numero and not contiene_ubicacion:
-                    # Verificar que no contenga palabras clave (no solo coincidencias exactas)
-                    es_palabra_clave = any(palabra in nombre_candidato.upper().strip() for palabra in palabras_excluir)
-                    # Verificar que no sea exactamente una palabra clave
-                    es_exactamente_palabra_clave = any(nombre_candidato.upper().strip() == palabra for palabra in palabras_excluir)
-                    
-                    if not es_palabra_clave and not es_exactamente_palabra_clave:
-                        # Limpiar palabras específicas del final del nombre
-                        nombre_limpio = re.sub(r'\s*-\s*(DIU|IMPLANTE|EXTRACCION|COLOCACION|AGENDA\s+BIS|REUNION\s+EQUIPO)\s*$', '', nombre_candidato, flags=re.IGNORECASE)
-                        
-                        # Si ya contiene DR./DRA/DOCTOR/DOCTORA al inicio, preservarlo tal como está
-                        if re.match(r'^(DRA?\.\s*|DRA?\s+|DRA?,\s*|DOCTOR[A]?\s+)', nombre_limpio, re.IGNORECASE):
-                            doctor = nombre_limpio.strip()
-                        # Si ya contiene LIC./LIC al inicio, preservarlo tal como está
-                        elif re.match(r'^(LIC\.\s*|LIC\s+)', nombre_limpio, re.IGNORECASE):
-                            doctor = nombre_limpio.strip()
-                        # Si viene de los patrones LIC. EN ESPECIALIDAD (índices 9-12), NO agregar "LIC." - solo el nombre
-                        elif i >= 9 and i <= 12:  # Patrones de LIC. EN PSICOLOGIA, TRABAJO SOCIAL, NUTRICION
-                            doctor = nombre_limpio.strip()  # Solo el nombre, sin LIC.
-                        # Si viene de los patrones específicos adicionales (índices 13-14), NO agregar "LIC." - solo el nombre
-                        elif (i >= 13 and i <= 14):  # Patrones NUTRICION-PRIMERA VEZ, TRABAJADORA SOCIAL
-                            doctor = nombre_limpio.strip()  # Solo el nombre, sin LIC.
-                        # Si viene del patrón general (índices 15-16) o patrones LIC. antes del nombre (índices 17-18), agregar "LIC." al frente
-                        elif (i >= 15 and i <= 16) or (i >= 17 and i <= 18):  # Patrón general y patrones de LIC. que aparece antes del nombre
-                            doctor = f"LIC. {nombre_limpio.strip()}"
-                        # Procesar formato "APELLIDO ,NOMBRE" y convertir a "NOMBRE APELLIDO"
-                        elif ',' in nombre_limpio:
-                            partes = nombre_limpio.split(',')
-                            if len(partes) == 2:
-                                apellido = partes[0].strip()
-                                nombre = partes[1].strip()
-                                doctor = f"{nombre} {apellido}"
-                            else:
-                                doctor = nombre_limpio.strip()
-                        else:
-                            doctor = nombre_limpio.strip()
-                        break
-        
-        # Buscar tipo de turno - patrones mejorados con orden de prioridad
-        # IMPORTANTE: Verificar primero patrones más específicos como "A LA BREVEDAD"
-        if re.search(r'\bA\s+LA\s+BREVEDAD\b', texto_upper):
-            tipo_turno = 'A LA BREVEDAD'
-        else:
-            tipo_patterns = {
-                'GUARDIA': r'\bGUARDIA\b|\bGUARDIA\s+MEDICA\b|\bGUARDIAS\b',
-                'EVENTUAL ESPONTANEA': r'\bEVENTUAL\s+ESPONTANEA\b|\bEVENTUAL\s+ESPONTÁNEA\b',
-                'EVENTUAL': r'\bEVENTUAL\b',
-                'CAI/Espontánea': r'\bESPONTANEA\b|\bESPONTÁNEA\b|\bESPONTÃ_x0081_NEA\b|\bCAI\b',
-                'DEMANDA A DOMICILIO': r'\bDEMANDA\s+A\s+DOMICILIO\b',
-                'URGENCIA': r'\bURGENCIA\b|\bURGENTE\b',
-                'PROGRAMADA': r'\bPROGRAMADA\b|\bTURNO\s+PROGRAMADO\b|\bPROGRAMADO\b',
-                'SOBRETURNO': r'\bSOBRETURNO\b|\bSOBRETURNOS\b',
-                'CONTROL': r'\bCONTROL\b',
-                'INTERCONSULTA': r'\bINTERCONSULTA\b',
-                'CONSULTA EXTERNA': r'\bCONSULTA\s+EXTERNA\b|\bEXTERNA\b',
-                'TRATAMIENTO': r'\bTRATAMIENTO\b',
-                'ADMISION': r'\bADMISION\b|\bADMISIÓN\b',
-                'REUNION DE EQUIPO': r'\bREUNION\s+DE\s+EQUIPO\b|\bREUNIÓN\s+DE\s+EQUIPO\b',
-                'MONITOREO': r'\bMONITOREO\b'
-            }
+            # Limpiar palabras específicas del final del nombre
+            nombre_final = _SUFIJOS_DOCTOR_REGEX.sub('', nombre_candidato)
             
-            for tipo_nombre, pattern in tipo_patterns.items():
-                if re.search(pattern, texto_upper):
-                    tipo_turno = tipo_nombre
-                    break
-            
-            # Solo detectar GENERAL como tipo de turno si está claramente separado por guiones
-            if not tipo_turno and re.search(r'\bGENERAL\b', texto_upper):
-                # Caso específico: GINECOLOGIA - DR. LEITES - GENERAL -> NO detectar GENERAL como tipo
-                if re.search(r'GINECOLOGIA\s*-\s*DR\.\s*LEITES\s*-\s*GENERAL', texto_upper):
-                    pass  # No hacer nada, dejar tipo_turno vacío
-                # GENERAL es tipo de turno solo si está precedido por un guión (otros casos)
-                elif re.search(r'-\s*GENERAL\b', texto_upper):
-                    tipo_turno = 'GENERAL'
-                # Si no hay área detectada y empieza con "GENERAL", asignar como área
-                elif not area and re.search(r'^\s*GENERAL\b', texto_upper):
-                    area = 'GENERAL'
-        
-        # Solo detectar COMITE DE FAMILIAS como área si no hay ninguna otra área detectada
-        if not area and re.search(r'\bCOMITE\s+DE\s+FAMILIAS\b', texto_upper):
-            area = 'COMITE DE FAMILIAS'
+            # Si ya contiene DR./DRA/DOCTOR/DOCTORA o LIC./LIC al inicio, preservarlo tal como está
+            if _PREFIJO_DOCTOR_REGEX.match(nombre_final) or _PREFIJO_LIC_REGEX.match(nombre_final):
+                doctor = nombre_final.strip()
+            elif regla.formato == 'solo_nombre':
+                doctor = nombre_final.strip()  # Solo el nombre, sin LIC.
+            elif regla.formato == 'prefijo_lic':
+                doctor = f"LIC. {nombre_final.strip()}"
+            # Procesar formato "APELLIDO ,NOMBRE" y convertir a "NOMBRE APELLIDO"
+            elif ',' in nombre_final:
+                partes = nombre_final.split(',')
+                if len(partes) == 2:
+                    doctor = f"{partes[1].strip()} {partes[0].strip()}"
+                else:
+                    doctor = nombre_final.strip()
+            else:
+                doctor = nombre_final.strip()
+            break
         
         # Limpiar campo doctor - reglas de corrección manual
         # Corrección #1: Los consultorios no son doctores, sino ubicaciones físicas
-        if doctor and re.search(r'CONSULTORIO\s+\d+', doctor, re.IGNORECASE):
+        if doctor and self._coincide('exclusion', 'consultorio_numero', _CONSULTORIO_NUMERO_REGEX, doctor):
             doctor = ""
         
         # Corrección #3: Procedimientos/siglas médicas y términos técnicos no son doctores
-        procedimientos_medicos = [
-            'ECG', 'EKG', 'RX', 'LAB', 'LABORATORIO', 'RADIOLOGIA', 'ECOGRAFIA', 'TAC', 'RMN', 'PREOCUPACIONAL',
-            'QUIROFANO', 'CURACIONES', 'PLASTICA', 'TORAX', 'ADULTOS', 'NIÑOS HSI', 'GENERAL DOS', 'GENERAL UNO',
-            'CABEZA Y CUELLO DOS', 'CABEZA Y CUELLO UNO', 'COLOPROCTOLOGIA UNO', 'COLOPROCTOLOGIA DOS',
-            '173 TECNICO', '200 TECNICO', '233 TECNICO', '122 TECNICO', 'CARDIO RESIDENTES', 'DIABETOLOGIA PRODIABA'
-        ]
-        if doctor and any(proc.upper() == doctor.upper().strip() for proc in procedimientos_medicos):
+        if doctor and doctor.upper().strip() in _PROCEDIMIENTOS_MEDICOS:
             doctor = ""
         
+        return doctor
+    
+    def _coincide(self, grupo: str, patron: str, regex: 're.Pattern', texto: str, metodo: str = 'search'):
+        """regex.search/match sobre texto, pasando por la telemetría de patrones si está activa"""
+        if self._telemetria is None:
+            return getattr(regex, metodo)(texto)
+        return self._telemetria.buscar(grupo, patron, regex, texto, metodo)
+    
+    def _leer_filas_excel(self, archivo_path: str) -> Iterator[Tuple]:
+        """
+        Recorre la primera hoja de un Excel fila por fila, sin cargarla entera en memoria.
+        Usa openpyxl en modo read_only/values_only; cada fila es una tupla (A, B, C).
+        Los .xls (no soportados por openpyxl) se leen con pandas como antes.
+        """
+        if archivo_path.lower().endswith('.xls'):
+            df = pd.read_excel(archivo_path, header=None)
+            for fila in df.iloc[:, :_COLUMNAS_AGENDA].itertuples(index=False, name=None):
+                fila = tuple(_normalizar_celda(valor) for valor in fila)
+                yield fila + (None,) * (_COLUMNAS_AGENDA - len(fila))
+            return
+        
+        libro = openpyxl.load_workbook(archivo_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            hoja = libro.worksheets[0]
+            # Las dimensiones guardadas en el archivo no son confiables (varios vienen sin ellas)
+            hoja.reset_dimensions()
+            for fila in hoja.iter_rows(max_col=_COLUMNAS_AGENDA, values_only=True):
+                fila = tuple(_normalizar_celda(valor) for valor in fila)
+                if len(fila) < _COLUMNAS_AGENDA:
+                    fila = fila + (None,) * (_COLUMNAS_AGENDA - len(fila))
+                yield fila
+        finally:
+            libro.close()
+    
+    def _leer_hoja_agenda(self, archivo_path: str) -> pd.DataFrame:
+        """Arma un DataFrame crudo de 3 columnas (A, B, C) con las filas de la primera hoja"""
+        return pd.DataFrame.from_records(self._leer_grilla(archivo_path), columns=range(_COLUMNAS_AGENDA))
+    
+    def _leer_grilla(self, archivo_path: str) -> List[Tuple]:
+        """
+        Filas (A, B, C) de la primera hoja. Con directorio_grillas se toman de la grilla
+        guardada si el contenido del Excel no cambió, sin volver a decodificar el XML;
+        si no, se lee el Excel y se guarda la grilla para la próxima corrida.
+        """
+        if self.directorio_grillas is None or pa is None:
+            return list(self._leer_filas_excel(archivo_path))
         
-        return {
-            'doctor': doctor,
-            'area': area,
-            'tipo_turno': tipo_turno
-        }
+        hash_archivo = _hash_archivo(archivo_path)
+        filas = _leer_grilla_guardada(self.directorio_grillas, archivo_path, hash_archivo)
+        if filas is not None:
+            self.estadisticas_cache['grillas'] += 1
+            return filas
+        filas = list(self._leer_filas_excel(archivo_path))
+        _guardar_grilla(self.directorio_grillas, archivo_path, hash_archivo, filas)
+        return filas
     
     def procesar_archivo_excel(self, archivo_path: str, efector: str) -> pd.DataFrame:
         """
         Procesa un archivo Excel con formato de agenda no tabular
         """
         try:
-            # Leer el archivo Excel sin encabezados
-            df = pd.read_excel(archivo_path, header=None)
+            # Leer el archivo Excel en streaming (filas crudas, sin encabezados)
+            with self.medir('lectura'):
+                hoja = self._leer_hoja_agenda(archivo_path)
             
             # Detectar si es el formato especial del Hospital Odontológico
             if 'Hospital Odontologico' in archivo_path:
-                return self._procesar_formato_odontologico(df, efector)
-            
-            registros = []
-            agenda_actual = ""
-            agenda_id_counter = 0  # Contador para generar IDs únicos de agenda
-            agenda_actual_id = ""
-            encontro_encabezado_horarios = False
+                return self._procesar_formato_odontologico(hoja, efector)
             
-            for idx, row in df.iterrows():
-                # Verificar si es una fila de encabezado de horarios "Día | Hora inicio | Hora fin"
-                if (pd.notna(row.iloc[0]) and str(row.iloc[0]).upper().strip() == 'DÍA' and
-                    len(row) >= 3 and pd.notna(row.iloc[1]) and pd.notna(row.iloc[2])):
-                    encontro_encabezado_horarios = True
-                    continue
-                
-                # Verificar si es una fila de agenda (contiene información del doctor/área)
-                if self._es_titulo_agenda(row):
-                    # Extraer el nombre de la agenda de la primera celda y decodificar caracteres especiales
-                    agenda_actual = self.decodificar_caracteres_especiales(str(row.iloc[0]).strip())
-                    agenda_id_counter += 1
-                    # Generar ID único que incluye el efector y un contador secuencial
-                    agenda_actual_id = f"{efector}_{agenda_id_counter:03d}_{agenda_actual}"
-                    encontro_encabezado_horarios = False  # Reset para la nueva agenda
-                    continue
-                
-                # Verificar si es una fila de horarios (contiene día, hora inicio, hora fin)
-                if self._es_fila_horarios(row):
-                    # Solo procesar horarios si tenemos una agenda actual Y hemos visto un encabezado
-                    if agenda_actual and encontro_encabezado_horarios:
-                        registro = self._extraer_datos_horarios(row, agenda_actual, efector, agenda_actual_id)
-                        if registro:
-                            registros.append(registro)
-            
-            df_resultado = pd.DataFrame(registros)
+            with self.medir('clasificacion'):
+                es_titulo, es_horario = self._clasificar_filas(hoja)
+            with self.medir('extraccion'):
+                df_resultado = self._construir_registros_fragmentados(hoja, es_titulo, es_horario, efector,
+                                                                      '_hora_desde_celda', agenda_id_al_final=True)
             
             # Postprocesamiento específico para Hospital Materno
             if efector == 'Hospital Materno' and not df_resultado.empty:
-                df_resultado = self._postprocesar_hospital_materno(df_resultado)
+                with self.medir('postproceso'):
+                    df_resultado = self._postprocesar_hospital_materno(df_resultado)
             
             return df_resultado
             
         except Exception as e:
             print(f"Error procesando {archivo_path}: {e}")
+            self._error_fuente = str(e)
             return pd.DataFrame()
     
-    def _es_titulo_agenda(self, row: pd.Series) -> bool:
+    def _clasificar_filas(self, hoja: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
         """
-        Determina si una fila es un título de agenda
-        CRITERIO PURAMENTE ESTRUCTURAL: Solo detecta títulos de agenda cuando:
-        - La primera columna tiene contenido (no es nan)
-        - La segunda columna está vacía (es nan)
-        - La tercera columna está vacía (es nan)
-        - La primera celda no está vacía después de hacer strip()
+        Clasifica todas las filas de la hoja de una vez (formato general) y devuelve las
+        máscaras (es_titulo, es_horario).
+        
+        Criterios estructurales:
+        - Encabezado: primera celda "Día" y columnas 2 y 3 con contenido
+        - Título de agenda: primera celda con texto, columnas 2 y 3 vacías
+        - Horario: primera celda con un día de la semana y columnas 2 y 3 con contenido
         
-        Este criterio es independiente del contenido y se basa únicamente en la estructura.
+        Un horario solo se toma si desde el último título apareció un encabezado.
         """
-        # Verificar que tengamos al menos 3 columnas
-        if len(row) < 3:
-            return False
+        tiene_a, tiene_b, tiene_c = (hoja[col].notna() for col in range(_COLUMNAS_AGENDA))
+        texto_a = hoja[0].where(tiene_a, '').astype(str)
+        primera_celda = texto_a.str.upper()
+        es_dia_encabezado = primera_celda.str.strip() == 'DÍA'
         
-        # CRITERIO ESTRICTO: Primera columna con contenido, segunda y tercera vacías
-        if pd.isna(row.iloc[0]):
-            return False
+        es_encabezado = tiene_a & es_dia_encabezado & tiene_b & tiene_c
+        es_titulo = tiene_a & ~tiene_b & ~tiene_c & (texto_a.str.strip() != '')
+        es_horario = (tiene_a & ~es_dia_encabezado & tiene_b & tiene_c &
+                      primera_celda.str.contains(_DIAS_SEMANA_REGEX))
         
-        # Verificar que las columnas 2 y 3 estén vacías (nan)
-        if pd.notna(row.iloc[1]) or pd.notna(row.iloc[2]):
-            return False
+        # Cada título abre un segmento; dentro del segmento el encabezado habilita los horarios
+        segmento = es_titulo.cumsum()
+        encabezado_visto = es_encabezado.groupby(segmento).cumsum() > 0
+        return es_titulo, es_horario & encabezado_visto
+    
+    def _construir_registros_fragmentados(self, hoja: pd.DataFrame, es_titulo: pd.Series, es_horario: pd.Series,
+                                          efector: str, formato_hora: str, agenda_id_al_final: bool,
+                                          requiere_ambas_horas: bool = False) -> pd.DataFrame:
+        """
+        _construir_registros sobre la hoja entera o, con procesos_por_archivo > 1 y una
+        hoja grande, cortada en fragmentos contiguos que empiezan en un título de agenda.
+        Cada fragmento se construye en un proceso de trabajo (que crea su normalizador
+        una sola vez, ver _iniciar_proceso_fragmentos) con la numeración de agenda_id que
+        le corresponde (títulos anteriores + 1), así que el resultado unido es idéntico.
+        formato_hora es el nombre del método que convierte las celdas de hora.
+        """
+        procesos = self.procesos_por_archivo if self.procesos_por_archivo > 0 else (os.cpu_count() or 1)
+        filas_minimas = self.filas_minimas_fragmento or FILAS_MINIMAS_FRAGMENTO
+        fragmentos = (_fragmentos_hoja(es_titulo.to_numpy(dtype=bool), procesos, filas_minimas)
+                      if procesos > 1 else [])
+        if len(fragmentos) < 2:
+            return self._construir_registros(hoja, es_titulo, es_horario, efector, getattr(self, formato_hora),
+                                             agenda_id_al_final, requiere_ambas_horas)
+        
+        # Los procesos de trabajo no vuelven a fragmentar
+        configuracion = {**self.configuracion(), 'procesos_por_archivo': 1}
+        titulos_previos = np.concatenate([[0], np.cumsum(es_titulo.to_numpy(dtype=np.int64))])
+        tareas = [(hoja.iloc[inicio:fin], es_titulo.iloc[inicio:fin], es_horario.iloc[inicio:fin], efector,
+                   formato_hora, agenda_id_al_final, requiere_ambas_horas, int(titulos_previos[inicio]) + 1)
+                  for inicio, fin in fragmentos]
+        resultados = []
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tareas)), initializer=_iniciar_proceso_fragmentos,
+                                 initargs=(configuracion,)) as executor:
+            for df_fragmento, estadisticas, instrumentacion in executor.map(_construir_fragmento_en_proceso, tareas):
+                for clave, valor in estadisticas.items():
+                    self.estadisticas_cache[clave] += valor
+                self._combinar_instrumentacion(instrumentacion)
+                if not df_fragmento.empty:
+                    resultados.append(df_fragmento)
+        return pd.concat(resultados, ignore_index=True) if resultados else pd.DataFrame()
+    
+    def _construir_registros(self, hoja: pd.DataFrame, es_titulo: pd.Series, es_horario: pd.Series,
+                             efector: str, formatear_hora, agenda_id_al_final: bool,
+                             requiere_ambas_horas: bool = False, primer_numero: int = 1) -> pd.DataFrame:
+        """
+        Asigna a cada fila de horario la agenda del último título (suma acumulada de
+        títulos) y arma los registros en bloque. primer_numero es el número de agenda_id
+        del primer título de la hoja (mayor que 1 en un fragmento que no es el primero).
+        """
+        # Nombre de agenda por segmento: el segmento 0 (antes del primer título) no tiene agenda
+        titulos = hoja.loc[es_titulo, 0].astype(str).str.strip()
+        agendas = [""] + self.decodificar_columna(titulos).tolist()
+        agenda_ids = [""] + [f"{efector}_{numero:03d}_{agenda}"
+                             for numero, agenda in enumerate(agendas[1:], start=primer_numero)]
         
-        primera_celda = str(row.iloc[0]).strip()
+        segmento = es_titulo.cumsum().to_numpy(dtype=np.int64)[es_horario.to_numpy(dtype=bool)]
+        con_agenda = np.array([bool(agenda) for agenda in agendas])[segmento]
+        segmento = segmento[con_agenda]
+        horarios = hoja[es_horario][con_agenda]
         
-        # Si la primera celda está vacía después de strip(), no es un título
-        if not primera_celda:
-            return False
+        # Día y horas: cada valor distinto se convierte una sola vez
+        dias_raw = horarios[0].astype(str).str.strip()
+        dias = dias_raw.map(_mapear_valores_unicos(dias_raw, lambda raw: _DIAS_NORMALIZADOS.get(raw.upper(), raw)))
+        horas_inicio = horarios[1].map(_mapear_valores_unicos(horarios[1], formatear_hora))
+        horas_fin = horarios[2].map(_mapear_valores_unicos(horarios[2], formatear_hora))
         
-        # Si cumple con el formato estructural "NOMBRE AGENDA, nan, nan", es un título
-        return True
+        if requiere_ambas_horas:
+            validas = (dias != '') & (horas_inicio != '') & (horas_fin != '')
+        else:
+            validas = (dias != '') & ((horas_inicio != '') | (horas_fin != ''))
+        validas = validas.to_numpy()
+        segmento = segmento[validas]
+        if not len(segmento):
+            return pd.DataFrame()
+        
+        # Componentes una vez por agenda (no por fila de horario)
+        componentes_por_segmento = {}
+        for numero in pd.unique(segmento):
+            componentes = self.obtener_componentes_agenda(agendas[numero])
+            ventanilla = ''
+            if efector == 'Hospital Materno':
+                ventanilla = self.asignar_ventanilla_hospital_materno(componentes['area'])
+            componentes_por_segmento[numero] = (
+                componentes['doctor'],  # SIN LIMPIAR - exactamente como está extraído
+                self.limpiar_texto(componentes['area']),
+                self.limpiar_texto(componentes['tipo_turno']),
+                ventanilla,
+            )
+        por_fila = [componentes_por_segmento[numero] for numero in segmento]
+        
+        columnas = {
+            'nombre_original_agenda': [agendas[numero] for numero in segmento],  # SIN LIMPIAR
+            'doctor': [fila[0] for fila in por_fila],
+            'area': [fila[1] for fila in por_fila],
+            'tipo_turno': [fila[2] for fila in por_fila],
+            'dia': dias.to_numpy()[validas].tolist(),
+            'hora_inicio': horas_inicio.to_numpy()[validas].tolist(),
+            'hora_fin': horas_fin.to_numpy()[validas].tolist(),
+            'efector': [efector] * len(segmento),
+            'ventanilla': [fila[3] for fila in por_fila],
+        }
+        ids = [agenda_ids[numero] for numero in segmento]
+        if agenda_id_al_final:
+            columnas['agenda_id'] = ids
+            return pd.DataFrame(columnas)
+        return pd.DataFrame({'agenda_id': ids, **columnas})
     
-    def _es_fila_horarios(self, row: pd.Series) -> bool:
-        """Determina si una fila contiene información de horarios"""
-        # Si la primera celda es "Día" (encabezado de tabla), NO es fila de horarios
-        if pd.notna(row.iloc[0]) and str(row.iloc[0]).upper().strip() == 'DÍA':
-            return False
+    def _hora_desde_celda(self, valor) -> str:
+        """Convierte la celda de hora del formato general a HH:MM ('' si no se reconoce)"""
+        if valor is None:
+            return ""
+        try:
+            # Si es un tiempo de pandas, convertirlo
+            if hasattr(valor, 'time'):
+                return valor.time().strftime('%H:%M')
+            # Buscar patrón de hora
+            match = _HORA_REGEX.search(str(valor).strip())
+            if match:
+                return f"{match.group(1).zfill(2)}:{match.group(2)}"
+        except Exception:
+            pass
+        return ""
+    
+    def _listar_fuentes(self, directorio: str) -> List[Tuple[str, str, str]]:
+        """
+        Arma la lista ordenada de fuentes a procesar como tuplas (tipo, ruta, efector):
+        primero el CSV del HCSI (si existe) y luego los Excel del directorio
+        """
+        fuentes = []
         
-        # Buscar días de la semana en la primera columna
-        dias_semana = ['LUNES', 'MARTES', 'MIÉRCOLES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SÁBADO', 'SABADO', 'DOMINGO']
+        # Primero, buscar el archivo HCSI CSV (si existe)
+        archivo_hcsi = os.path.join(os.path.dirname(directorio), "Agendas HCSI.csv")
+        if os.path.exists(archivo_hcsi):
+            fuentes.append(('hcsi', archivo_hcsi, 'HCSI'))
         
-        if pd.notna(row.iloc[0]):
-            primera_celda = str(row.iloc[0]).upper()
-            if any(dia in primera_celda for dia in dias_semana):
-                # Verificar que también tenga horarios en las columnas 2 y 3
-                if pd.notna(row.iloc[1]) and pd.notna(row.iloc[2]):
-                    return True
+        # Luego los archivos Excel normales
+        for archivo in os.listdir(directorio):
+            if archivo.endswith(('.xlsx', '.xls')):
+                # Excluir archivos HCSI ya que tienen formato diferente
+                if 'HCSI' in archivo.upper():
+                    print(f"Saltando archivo HCSI: {archivo} (formato diferente)")
+                    continue
+                
+                # Inferir efector del nombre del archivo
+                fuentes.append(('excel', os.path.join(directorio, archivo), self._inferir_efector(archivo)))
         
-        return False
+        return fuentes
+    
+    def procesar_fuente(self, tipo: str, ruta: str, efector: str) -> pd.DataFrame:
+        """
+        Procesa una fuente individual (CSV del HCSI o Excel de un efector) completa:
+        concatena los bloques de iterar_fuente.
+        Si la lectura falla devuelve un DataFrame vacío y deja el mensaje en la medición
+        del archivo (clave 'error'; ver fuente_fallida)
+        """
+        bloques = list(self.iterar_fuente(tipo, ruta, efector))
+        if not bloques:
+            return pd.DataFrame()
+        return pd.concat(bloques, ignore_index=True) if len(bloques) > 1 else bloques[0]
     
-    def _extraer_datos_horarios(self, row: pd.Series, agenda_actual: str, efector: str, agenda_id: Optional[str] = None) -> Optional[Dict]:
-        """Extrae datos de horarios de una fila"""
+    def iterar_fuente(self, tipo: str, ruta: str, efector: str) -> Iterator[pd.DataFrame]:
+        """
+        Procesa una fuente individual y entrega lo extraído por bloques: el CSV del HCSI
+        de a un bloque de tamano_bloque_hcsi filas, un Excel en un solo bloque (no se
+        entregan bloques vacíos). Registra el tiempo total de la fuente (sin contar lo que
+        tarda quien consume cada bloque), los registros extraídos y, si se pidió, su
+        memoria pico.
+        """
+        nombre = os.path.basename(ruta)
+        self.actualizar_reglas()
+        self._abrir_cache_persistente()
+        medicion = {'efector': efector, 'etapas': {}}
+        self.instrumentacion['archivos'][nombre] = medicion
+        self._error_fuente = None
+        
+        iniciado = self._abrir_pico_memoria() if self.medir_memoria else False
+        bloques = self._bloques_fuente(tipo, ruta, efector)
+        segundos = 0.0
+        registros = 0
         try:
-            # MANTENER el nombre de la agenda EXACTAMENTE como está (sin limpiar)
-            # Solo limpiar los componentes extraídos
-            
-            # Extraer componentes de la agenda (usando versión limpia para procesamiento)
-            agenda_limpia_para_procesamiento = self.limpiar_texto(agenda_actual)
-            componentes = self.extraer_componentes_agenda(agenda_limpia_para_procesamiento)
-            
-            # Extraer día de la primera columna
-            dia = ""
-            if pd.notna(row.iloc[0]):
-                dia_raw = str(row.iloc[0]).strip()
-                # Normalizar días de la semana
-                dia_mapping = {
-                    'LUNES': 'Lunes',
-                    'MARTES': 'Martes', 
-                    'MIÉRCOLES': 'Miércoles',
-                    'MIERCOLES': 'Miércoles',
-                    'JUEVES': 'Jueves',
-                    'VIERNES': 'Viernes',
-                    'SÁBADO': 'Sábado',
-                    'SABADO': 'Sábado',
-                    'SÁB': 'Sábado',
-                    'DOMINGO': 'Domingo'
-                }
-                dia = dia_mapping.get(dia_raw.upper(), dia_raw)
-            
-            # Extraer hora inicio (segunda columna)
-            hora_inicio = ""
-            if pd.notna(row.iloc[1]):
-                hora_raw = str(row.iloc[1]).strip()
-                # Si es un tiempo de pandas, convertirlo
-                try:
-                    if hasattr(row.iloc[1], 'time'):
-                        hora_inicio = row.iloc[1].time().strftime('%H:%M')
-                    else:
-                        # Buscar patrón de hora
-                        match = re.search(r'(\d{1,2}):(\d{2})', hora_raw)
-                        if match:
-                            hora_inicio = f"{match.group(1).zfill(2)}:{match.group(2)}"
-                except:
-                    pass
-            
-            # Extraer hora fin (tercera columna)
-            hora_fin = ""
-            if pd.notna(row.iloc[2]):
-                hora_raw = str(row.iloc[2]).strip()
+            while True:
+                self._archivo_actual = nombre
+                inicio = time.perf_counter()
                 try:
-                    if hasattr(row.iloc[2], 'time'):
-                        hora_fin = row.iloc[2].time().strftime('%H:%M')
-                    else:
-                        # Buscar patrón de hora
-                        match = re.search(r'(\d{1,2}):(\d{2})', hora_raw)
-                        if match:
-                            hora_fin = f"{match.group(1).zfill(2)}:{match.group(2)}"
-                except:
-                    pass
+                    bloque = next(bloques, None)
+                finally:
+                    segundos += time.perf_counter() - inicio
+                    self._archivo_actual = None
+                    if self._cache_persistente is not None:
+                        self._cache_persistente.guardar()
+                if bloque is None:
+                    break
+                if bloque.empty:
+                    continue
+                registros += len(bloque)
+                yield bloque
+        finally:
+            bloques.close()
+            medicion['segundos'] = segundos
+            medicion['registros'] = registros
+            if self._error_fuente is not None:
+                medicion['error'] = self._error_fuente
+            if self.medir_memoria:
+                medicion['memoria_pico_kib'] = self._cerrar_pico_memoria(iniciado)
+    
+    def _bloques_fuente(self, tipo: str, ruta: str, efector: str) -> Iterator[pd.DataFrame]:
+        """Bloques extraídos de una fuente según su tipo (ver iterar_fuente)"""
+        if tipo == 'hcsi':
+            yield from self._procesar_archivo_hcsi_csv(ruta)
+        else:
+            yield self.procesar_archivo_excel(ruta, efector)
+    
+    def fuente_fallida(self, ruta: str) -> bool:
+        """True si el último procesamiento de la fuente terminó con error"""
+        return 'error' in self.instrumentacion['archivos'].get(os.path.basename(ruta), {})
+    
+    def procesar_directorio(self, directorio: str, jobs: int = 1,
+                            directorio_manifiesto: Optional[str] = None,
+                            efectores: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Procesa todos los archivos de agenda en un directorio.
+        Con jobs > 1 cada archivo se procesa en un proceso aparte; los resultados se
+        consolidan en el mismo orden que la ejecución secuencial, así que las filas y
+        los agenda_id no cambian.
+        Si se indica directorio_manifiesto, las fuentes cuyo contenido (hash) y versión
+        del parser no cambiaron reutilizan la partición guardada en la corrida anterior.
+        Con efectores solo se procesan las fuentes de esos efectores (sin distinguir mayúsculas).
+        Equivale a concatenar los lotes de iter_batches.
+        """
+        self._iniciar_corrida()
+        iniciado = self._abrir_pico_memoria() if self.medir_memoria else False
+        try:
+            lotes = list(self._iterar_lotes_directorio(directorio, jobs, directorio_manifiesto, efectores))
+            if not lotes:
+                return pd.DataFrame()
             
-            # Crear registro si tenemos información básica
-            if dia and (hora_inicio or hora_fin):
-                # Para otros centros: preservar el formato original del doctor (sin limpiar)
-                doctor_original = componentes['doctor']  # Mantener formato original
-                
-                registro = {
-                    'nombre_original_agenda': agenda_actual,  # SIN LIMPIAR - exactamente como está
-                    'doctor': doctor_original,  # SIN LIMPIAR - exactamente como está extraído
-                    'area': self.limpiar_texto(componentes['area']),
-                    'tipo_turno': self.limpiar_texto(componentes['tipo_turno']),
-                    'dia': dia,
-                    'hora_inicio': hora_inicio,
-                    'hora_fin': hora_fin,
-                    'efector': efector,
-                    'ventanilla': ''  # Nueva variable Ventanilla (vacía por ahora)
-                }
+            # Consolidar todos los archivos (los lotes traen tipos distintos: se compacta al final)
+            with self.medir('concatenacion'):
+                df_consolidado = pd.concat(lotes, ignore_index=True)
+            with self.medir('compactacion'):
+                return compactar_consolidado(df_consolidado)
+        finally:
+            self._terminar_corrida(iniciado)
+    
+    def iter_batches(self, directorio: str, jobs: int = 1, directorio_manifiesto: Optional[str] = None,
+                     efectores: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Versión en streaming de procesar_directorio (mismos parámetros): entrega un lote
+        por fuente, ya postprocesado, apenas se termina de procesar; el CSV del HCSI con
+        tamano_bloque_hcsi sale en un lote por bloque. Los lotes salen en el
+        orden de la consolidación y con los mismos agenda_id, así que concatenarlos da el
+        mismo resultado que procesar_directorio. Solo el lote actual queda en memoria
+        (con jobs > 1 los procesos de trabajo pueden adelantarse algunas fuentes).
+        """
+        self._iniciar_corrida()
+        iniciado = self._abrir_pico_memoria() if self.medir_memoria else False
+        try:
+            yield from self._iterar_lotes_directorio(directorio, jobs, directorio_manifiesto, efectores)
+        finally:
+            self._terminar_corrida(iniciado)
+    
+    def iter_registros(self, directorio: str, **opciones) -> Iterator[Tuple]:
+        """Registros de a uno como tuplas con nombre (un campo por columna), vía iter_batches"""
+        for lote in self.iter_batches(directorio, **opciones):
+            yield from lote.itertuples(index=False, name='Registro')
+    
+    def _iniciar_corrida(self):
+        """Recarga reglas y reinicia cachés, instrumentación y contadores antes de una corrida"""
+        self.actualizar_reglas()
+        self._abrir_cache_persistente()
+        self.reiniciar_cache_componentes()
+        self.reiniciar_instrumentacion()
+        self.estadisticas_incremental = {'reutilizados': 0, 'reprocesados': 0}
+    
+    def _terminar_corrida(self, iniciado: bool):
+        """Cierra la medición de memoria de la corrida y guarda la caché en disco"""
+        if self.medir_memoria:
+            self.instrumentacion['memoria_pico_kib'] = self._cerrar_pico_memoria(iniciado)
+        if self._cache_persistente is not None:
+            self._cache_persistente.guardar()
+            self._cache_persistente.podar()
+    
+    def _iterar_lotes_directorio(self, directorio: str, jobs: int, directorio_manifiesto: Optional[str],
+                                 efectores: Optional[Iterable[str]]) -> Iterator[pd.DataFrame]:
+        """Cuerpo común de procesar_directorio e iter_batches: lotes por fuente (o bloque del HCSI), en orden"""
+        
+        fuentes = self._listar_fuentes(directorio)
+        nombres_vigentes = {os.path.basename(ruta) for _, ruta, _ in fuentes}
+        if efectores is not None:
+            seleccion = {efector.strip().upper() for efector in efectores}
+            fuentes = [fuente for fuente in fuentes if fuente[2].upper() in seleccion]
+            if not fuentes:
+                print(f"Ninguna fuente corresponde a los efectores indicados: {', '.join(sorted(seleccion))}")
+        jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        
+        # Particiones reutilizables del manifiesto (None = hay que procesar la fuente).
+        # Acá solo se comparan hashes: cada partición se lee recién cuando le toca salir.
+        particiones: List[Optional[str]] = [None] * len(fuentes)
+        hashes: List[Optional[str]] = [None] * len(fuentes)
+        manifiesto = None
+        if directorio_manifiesto:
+            manifiesto = self._cargar_manifiesto(directorio_manifiesto)
+            for i, (tipo, ruta, efector) in enumerate(fuentes):
+                hashes[i] = _hash_archivo(ruta)
+                particiones[i] = self._particion_vigente(manifiesto, ruta, hashes[i])
+        
+        # El HCSI por bloques se procesa acá y no en un proceso de trabajo: así sale de a un
+        # lote por bloque en vez de llegar entero desde el proceso hijo
+        pendientes = [i for i, particion in enumerate(particiones)
+                      if particion is None and not (fuentes[i][0] == 'hcsi' and self.tamano_bloque_hcsi)]
+        executor = None
+        resultados_paralelos = iter(())
+        if jobs > 1 and len(pendientes) > 1:
+            print(f"Procesando {len(pendientes)} archivos con {jobs} procesos...")
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            # Cada proceso ya tiene su archivo: no se fragmentan hojas dentro de los procesos
+            configuracion = {**self.configuracion(), 'procesos_por_archivo': 1}
+            tareas = [fuentes[i] + (configuracion,) for i in pendientes]
+            resultados_paralelos = executor.map(_procesar_fuente_en_proceso, tareas)
+        
+        entradas_nuevas: Dict[str, Dict] = {}
+        fallidas = set()
+        try:
+            for i, (tipo, ruta, efector) in enumerate(fuentes):
+                nombre = os.path.basename(ruta)
+                bloques = None
+                if particiones[i] is not None:
+                    bloques = self._leer_particion(directorio_manifiesto, ruta, particiones[i])
+                    if bloques is not None:
+                        print(f"Sin cambios: {nombre} (se reutiliza la partición)")
+                        self.estadisticas_incremental['reutilizados'] += 1
                 
-                # Asignar ventanilla para Hospital Materno
-                if efector == 'Hospital Materno':
-                    registro['ventanilla'] = self.asignar_ventanilla_hospital_materno(componentes['area'])
+                # Lo reprocesado se guarda en la partición bloque a bloque, antes de entregarlo
+                particion = None
+                if bloques is None:
+                    if executor is not None and i in pendientes:
+                        df_archivo, estadisticas, instrumentacion = next(resultados_paralelos)
+                        for clave, valor in estadisticas.items():
+                            self.estadisticas_cache[clave] += valor
+                        self._combinar_instrumentacion(instrumentacion)
+                        bloques = iter([df_archivo])
+                    else:
+                        if tipo == 'hcsi':
+                            print(f"Procesando archivo HCSI CSV: {nombre}")
+                        else:
+                            print(f"Procesando: {nombre}")
+                        bloques = self.iterar_fuente(tipo, ruta, efector)
+                    self.estadisticas_incremental['reprocesados'] += 1
+                    if manifiesto is not None:
+                        particion = _ParticionIncremental(directorio_manifiesto, nombre)
                 
-                # Agregar agenda_id si se proporciona
-                if agenda_id:
-                    registro['agenda_id'] = agenda_id
+                registros = 0
+                ocurrencias: Dict[Tuple[str, str], int] = {}
+                try:
+                    for bloque in bloques:
+                        if bloque.empty:
+                            continue
+                        if particion is not None:
+                            particion.escribir(bloque)
+                        registros += len(bloque)
+                        yield self._postprocesar_lote(bloque, ocurrencias)
+                    
+                    # Un error (archivo bloqueado, permisos) no se guarda: la próxima corrida reintenta
+                    if self.fuente_fallida(ruta):
+                        fallidas.add(nombre)
+                    elif particion is not None:
+                        entradas_nuevas[nombre] = particion.confirmar(tipo, efector, hashes[i])
+                finally:
+                    if particion is not None:
+                        particion.descartar()
                 
-                return registro
-        
-        except Exception as e:
-            print(f"Error extrayendo datos de horarios: {e}")
-        
-        return None
+                if registros:
+                    self._informar_fuente_procesada(tipo, ruta, registros)
+            
+            if manifiesto is not None:
+                self._actualizar_manifiesto(manifiesto, directorio_manifiesto, fuentes, entradas_nuevas,
+                                            nombres_vigentes, fallidas)
+            if self.directorio_grillas is not None:
+                _podar_grillas(self.directorio_grillas, nombres_vigentes)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
     
-    def procesar_directorio(self, directorio: str) -> pd.DataFrame:
+    def _postprocesar_lote(self, df_lote: pd.DataFrame,
+                           ocurrencias: Optional[Dict[Tuple[str, str], int]] = None) -> pd.DataFrame:
         """
-        Procesa todos los archivos de agenda en un directorio
+        Normalizaciones por fila que se aplican a cada lote antes de entregarlo.
+        ocurrencias se comparte entre los lotes de una misma fuente (ver agregar_agenda_uid).
         """
-        archivos_procesados = []
+        # Corrección #2: Normalizar días de la semana (corregir "Sáb" -> "Sábado")
+        df_lote['dia'] = df_lote['dia'].replace({'Sáb': 'Sábado'})
         
-        # Primero, buscar y procesar el archivo HCSI CSV (si existe)
-        archivo_hcsi = os.path.join(os.path.dirname(directorio), "Agendas HCSI.csv")
-        if os.path.exists(archivo_hcsi):
-            print(f"Procesando archivo HCSI CSV: {os.path.basename(archivo_hcsi)}")
-            df_hcsi = self._procesar_archivo_hcsi_csv(archivo_hcsi)
-            if not df_hcsi.empty:
-                archivos_procesados.append(df_hcsi)
-                print(f"  - {len(df_hcsi)} registros extraídos del HCSI")
+        # Horas como minutos del día (enteros) para que los cálculos no re-parseen texto
+        with self.medir('postproceso'):
+            return agregar_agenda_uid(agregar_minutos_del_dia(df_lote), ocurrencias)
+    
+    def _cargar_manifiesto(self, directorio_manifiesto: str) -> Dict:
+        """Lee el manifiesto de fuentes; si no existe, es ilegible o de otro parser, empieza de cero"""
+        archivo_manifiesto = os.path.join(directorio_manifiesto, ARCHIVO_MANIFIESTO)
+        vacio = {'version_parser': VERSION_PARSER, 'version_reglas': self.reglas.version, 'fuentes': {}}
+        if not os.path.exists(archivo_manifiesto):
+            return vacio
+        try:
+            with open(archivo_manifiesto, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Advertencia: no se pudo leer el manifiesto ({e}); se reprocesan todas las fuentes")
+            return vacio
+        if manifiesto.get('version_parser') != VERSION_PARSER:
+            print("El parser cambió desde la última corrida; se reprocesan todas las fuentes")
+            return vacio
+        if manifiesto.get('version_reglas') != self.reglas.version:
+            print("Las reglas cambiaron desde la última corrida; se reprocesan todas las fuentes")
+            return vacio
+        return manifiesto
+    
+    def _particion_vigente(self, manifiesto: Dict, ruta: str, hash_archivo: str) -> Optional[str]:
+        """Partición guardada de una fuente (ruta relativa) si su contenido no cambió"""
+        entrada = manifiesto['fuentes'].get(os.path.basename(ruta))
+        if not entrada or entrada.get('sha256') != hash_archivo:
+            return None
+        return entrada['particion']
+    
+    def _leer_particion(self, directorio_manifiesto: str, ruta: str,
+                        particion: str) -> Optional[Iterator[pd.DataFrame]]:
+        """
+        Abre una partición guardada y devuelve sus bloques, que se leen de a uno a medida
+        que se consumen. El primero se lee acá: si la partición está dañada devuelve None
+        y la fuente se reprocesa.
+        """
+        archivo = None
+        try:
+            archivo = open(os.path.join(directorio_manifiesto, particion), 'rb')
+            primero = pickle.load(archivo)
+        except EOFError:
+            # Partición sin bloques: la fuente no tenía registros
+            archivo.close()
+            return iter(())
+        except Exception as e:
+            if archivo is not None:
+                archivo.close()
+            print(f"Advertencia: partición ilegible para {os.path.basename(ruta)} ({e}); se reprocesa")
+            return None
+        return _bloques_particion(archivo, primero)
+    
+    def _actualizar_manifiesto(self, manifiesto: Dict, directorio_manifiesto: str,
+                               fuentes: List[Tuple[str, str, str]], entradas_nuevas: Dict[str, Dict],
+                               nombres_vigentes: Optional[set] = None, fallidas: Optional[set] = None):
+        """
+        Reescribe el manifiesto con las entradas de las fuentes reprocesadas (entradas_nuevas)
+        y las reutilizadas. Se conservan las entradas de fuentes que siguen en el directorio
+        aunque no se hayan procesado en esta corrida (nombres_vigentes) y se descartan las
+        de fuentes que ya no están. Las fuentes que fallaron (fallidas) quedan sin entrada,
+        así la próxima corrida las vuelve a procesar.
+        """
+        fuentes_anteriores = manifiesto['fuentes']
+        fuentes_actuales = {}
+        for _, ruta, _ in fuentes:
+            nombre = os.path.basename(ruta)
+            if nombre in (fallidas or ()):
+                continue
+            fuentes_actuales[nombre] = entradas_nuevas.get(nombre) or fuentes_anteriores[nombre]
         
-        # Luego procesar los archivos Excel normales
-        for archivo in os.listdir(directorio):
-            if archivo.endswith(('.xlsx', '.xls')):
-                # Excluir archivos HCSI ya que tienen formato diferente
-                if 'HCSI' in archivo.upper():
-                    print(f"Saltando archivo HCSI: {archivo} (formato diferente)")
-                    continue
-                
-                archivo_path = os.path.join(directorio, archivo)
-                
-                # Inferir efector del nombre del archivo
-                efector = self._inferir_efector(archivo)
-                
-                print(f"Procesando: {archivo}")
-                df_archivo = self.procesar_archivo_excel(archivo_path, efector)
-                
-                if not df_archivo.empty:
-                    archivos_procesados.append(df_archivo)
-                    print(f"  - {len(df_archivo)} registros extraídos")
+        for nombre, entrada in fuentes_anteriores.items():
+            if nombre not in fuentes_actuales and nombre in (nombres_vigentes or ()):
+                fuentes_actuales[nombre] = entrada
         
-        # Consolidar todos los archivos
-        if archivos_procesados:
-            df_consolidado = pd.concat(archivos_procesados, ignore_index=True)
-            
-            # Aplicar normalizaciones post-procesamiento
-            # Corrección #2: Normalizar días de la semana (corregir "Sáb" -> "Sábado")
-            df_consolidado['dia'] = df_consolidado['dia'].replace({'Sáb': 'Sábado'})
-            
-            return df_consolidado
+        # Borrar particiones de fuentes eliminadas del directorio
+        for nombre, entrada in fuentes_anteriores.items():
+            if nombre not in fuentes_actuales:
+                archivo_particion = os.path.join(directorio_manifiesto, entrada['particion'])
+                if os.path.exists(archivo_particion):
+                    os.remove(archivo_particion)
         
-        return pd.DataFrame()
+        manifiesto = {'version_parser': VERSION_PARSER, 'version_reglas': self.reglas.version,
+                      'fuentes': fuentes_actuales}
+        os.makedirs(directorio_manifiesto, exist_ok=True)
+        archivo_manifiesto = os.path.join(directorio_manifiesto, ARCHIVO_MANIFIESTO)
+        temporal = archivo_manifiesto + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, archivo_manifiesto)
+    
+    def _informar_fuente_procesada(self, tipo: str, ruta: str, registros: int):
+        """Informa la cantidad de registros extraídos de una fuente"""
+        if tipo == 'hcsi':
+            print(f"  - {registros} registros extraídos del HCSI")
+        else:
+            print(f"  - {registros} registros extraídos de {os.path.basename(ruta)}")
     
-    def _procesar_archivo_hcsi_csv(self, archivo_path: str) -> pd.DataFrame:
+    def _procesar_archivo_hcsi_csv(self, archivo_path: str) -> Iterator[pd.DataFrame]:
         """
         Procesa el archivo CSV del HCSI
         que tiene formato tabular con columnas: Especialidad, Profesional, Dia, Horario, TipoTurno
+        Entrega los bloques de iterar_bloques_hcsi a medida que se leen (sin juntarlos).
+        Si la lectura falla se corta ahí: los bloques ya entregados quedan, pero la fuente
+        queda marcada con error y no se guarda su partición.
         """
         try:
-            df = pd.read_csv(archivo_path)
-            registros = []
-            agenda_id_counter = 0
-            
-            print(f"Procesando {len(df)} registros del HCSI...")
-            
-            for idx, row in df.iterrows():
-                # Saltar filas con datos faltantes esenciales
-                if pd.isna(row.get('Especialidad')) or pd.isna(row.get('Dia')) or pd.isna(row.get('Horario')):
-                    continue
-                
-                agenda_id_counter += 1
-                
-                # Extraer datos básicos
-                especialidad = str(row['Especialidad']).strip()
-                profesional = str(row.get('Profesional', '')).strip() if pd.notna(row.get('Profesional')) else ""
-                dia_raw = str(row['Dia']).strip()
-                horario_raw = str(row['Horario']).strip()
-                tipo_turno_raw = str(row.get('TipoTurno', '')).strip() if pd.notna(row.get('TipoTurno')) else ""
-                subespecialidad = str(row.get('Subespecialidad', '')).strip() if pd.notna(row.get('Subespecialidad')) else ""
-                
-                # Mapear días de la semana
-                dia_mapping = {
-                    'LUN': 'Lunes', 'LUNES': 'Lunes',
-                    'MAR': 'Martes', 'MARTES': 'Martes', 
-                    'MIE': 'Miércoles', 'MIERCOLES': 'Miércoles', 'MIÉRCOLES': 'Miércoles',
-                    'JUE': 'Jueves', 'JUEVES': 'Jueves',
-                    'VIE': 'Viernes', 'VIERNES': 'Viernes',
-                    'SAB': 'Sábado', 'SABADO': 'Sábado', 'SÁBADO': 'Sábado', 'SÁB': 'Sábado',
-                    'DOM': 'Domingo', 'DOMINGO': 'Domingo'
-                }
-                dia = dia_mapping.get(dia_raw.upper(), dia_raw)
-                
-                # Procesar horario (formato: "08:00 a 12:00" o "13:00 a 18:00")
-                hora_inicio = ""
-                hora_fin = ""
-                if " a " in horario_raw:
-                    partes_horario = horario_raw.split(" a ")
-                    if len(partes_horario) == 2:
-                        hora_inicio = partes_horario[0].strip()
-                        hora_fin = partes_horario[1].strip()
-                
-                # Crear nombre de agenda combinando especialidad + subespecialidad + profesional
-                nombre_agenda_partes = [especialidad]
-                if subespecialidad and subespecialidad != "GENERAL":
-                    nombre_agenda_partes.append(subespecialidad)
-                if profesional:
-                    nombre_agenda_partes.append(profesional)
-                
-                nombre_agenda = " - ".join(nombre_agenda_partes)
-                
-                # Generar ID único
-                agenda_id = f"HCSI_{agenda_id_counter:03d}_{especialidad}"
-                
-                # Normalizar tipo de turno - USAR SIEMPRE el valor de la base de datos HCSI
-                tipo_turno_normalizado = ""
-                if tipo_turno_raw.upper() == "PROGRAMADO":
-                    tipo_turno_normalizado = "PROGRAMADA"
-                elif tipo_turno_raw.upper() in ["ESPONTANEO", "ESPONTÁNEO"]:
-                    tipo_turno_normalizado = "CAI/Espontánea"
-                else:
-                    tipo_turno_normalizado = tipo_turno_raw.upper()
-                
-                # Limpiar nombre del profesional - Para HCSI: usar directamente sin normalizar
-                doctor_limpio = ""
-                if profesional:
-                    # Para HCSI: Tomar el profesional exactamente como está en la base de datos
-                    doctor_limpio = profesional.strip()
-                
-                # Crear registro
-                registro = {
-                    'agenda_id': agenda_id,
-                    'nombre_original_agenda': nombre_agenda,
-                    'doctor': doctor_limpio,
-                    'area': especialidad.upper(),
-                    'tipo_turno': tipo_turno_normalizado,
-                    'dia': dia,
-                    'hora_inicio': hora_inicio,
-                    'hora_fin': hora_fin,
-                    'efector': 'HCSI',
-                    'ventanilla': ''  # Nueva variable Ventanilla (vacía por ahora)
-                }
-                
-                registros.append(registro)
-            
-            # Crear DataFrame
-            df = pd.DataFrame(registros)
-            
-            # Asignar ventanillas para Hospital Materno (HCSI incluye Hospital Materno)
-            # Nota: En los datos CSV, algunos efectores pueden ser Hospital Materno
-            for idx, row in df.iterrows():
-                if 'MATERNO' in str(row.get('efector', '')).upper():
-                    df.at[idx, 'ventanilla'] = self.asignar_ventanilla_hospital_materno(row['area'])
-            
-            return df
+            yield from self.iterar_bloques_hcsi(archivo_path)
             
         except Exception as e:
             print(f"Error procesando archivo HCSI CSV: {e}")
+            self._error_fuente = str(e)
+    
+    def iterar_bloques_hcsi(self, archivo_path: str) -> Iterator[pd.DataFrame]:
+        """
+        Lee el CSV del HCSI y entrega los registros normalizados bloque por bloque.
+        Con tamano_bloque_hcsi definido la memoria usada queda acotada por el tamaño del
+        bloque; el contador de agenda_id sigue de un bloque al siguiente.
+        Solo se leen las columnas que usa el normalizador, siempre como texto.
+        """
+        with self.medir('lectura'):
+            lector = pd.read_csv(archivo_path, usecols=lambda columna: columna in _COLUMNAS_HCSI,
+                                 dtype=str, chunksize=self.tamano_bloque_hcsi)
+        lector = iter([lector] if self.tamano_bloque_hcsi is None else lector)
+        
+        total_registros = 0
+        primer_id = 1
+        while True:
+            with self.medir('lectura'):
+                bloque = next(lector, None)
+            if bloque is None:
+                break
+            total_registros += len(bloque)
+            with self.medir('extraccion'):
+                df_bloque = self._normalizar_bloque_hcsi(bloque, primer_id)
+            primer_id += len(df_bloque)
+            yield df_bloque
+        
+        print(f"Procesados {total_registros} registros del HCSI")
+    
+    def _normalizar_bloque_hcsi(self, df: pd.DataFrame, primer_id: int) -> pd.DataFrame:
+        """
+        Normaliza un bloque del CSV del HCSI. Todo el procesamiento es por columnas
+        (sin recorrer fila por fila); primer_id es el número del primer agenda_id del bloque.
+        """
+        # Saltar filas con datos faltantes esenciales
+        esenciales = ['Especialidad', 'Dia', 'Horario']
+        if not all(columna in df.columns for columna in esenciales):
+            return pd.DataFrame()
+        df = df.dropna(subset=esenciales).reset_index(drop=True)
+        if df.empty:
             return pd.DataFrame()
+        
+        def columna_texto(nombre: str) -> pd.Series:
+            """Columna como texto sin espacios extremos ('' si falta el valor o la columna)"""
+            if nombre not in df.columns:
+                return pd.Series('', index=df.index, dtype=object)
+            columna = df[nombre]
+            return columna.astype(str).str.strip().where(columna.notna(), '')
+        
+        # Extraer datos básicos
+        especialidad = columna_texto('Especialidad')
+        profesional = columna_texto('Profesional')
+        dia_raw = columna_texto('Dia')
+        horario_raw = columna_texto('Horario')
+        tipo_turno_raw = columna_texto('TipoTurno')
+        subespecialidad = columna_texto('Subespecialidad')
+        
+        # Mapear días de la semana
+        dia_mayus = dia_raw.str.upper()
+        dia = dia_mayus.map(_DIAS_HCSI).fillna(dia_raw)
+        
+        # Procesar horario (formato: "08:00 a 12:00" o "13:00 a 18:00")
+        partes_horario = horario_raw.str.split(' a ', regex=False)
+        horario_valido = partes_horario.str.len() == 2
+        hora_inicio = partes_horario.str[0].str.strip().where(horario_valido, '')
+        hora_fin = partes_horario.str[-1].str.strip().where(horario_valido, '')
+        
+        # Crear nombre de agenda combinando especialidad + subespecialidad + profesional
+        con_subespecialidad = (subespecialidad != '') & (subespecialidad != 'GENERAL')
+        nombre_agenda = (especialidad +
+                         (' - ' + subespecialidad).where(con_subespecialidad, '') +
+                         (' - ' + profesional).where(profesional != '', ''))
+        
+        # Generar ID único (contador correlativo sobre las filas válidas, continuo entre bloques)
+        contador = pd.Series(np.arange(primer_id, primer_id + len(df)), index=df.index)
+        agenda_id = 'HCSI_' + contador.map('{:03d}'.format) + '_' + especialidad
+        
+        # Normalizar tipo de turno - USAR SIEMPRE el valor de la base de datos HCSI
+        tipo_turno_mayus = tipo_turno_raw.str.upper()
+        tipo_turno_normalizado = tipo_turno_mayus.map(_TIPOS_TURNO_HCSI).fillna(tipo_turno_mayus)
+        
+        # Para HCSI: Tomar el profesional exactamente como está en la base de datos
+        df_resultado = pd.DataFrame({
+            'agenda_id': agenda_id,
+            'nombre_original_agenda': nombre_agenda,
+            'doctor': profesional,
+            'area': especialidad.str.upper(),
+            'tipo_turno': tipo_turno_normalizado,
+            'dia': dia,
+            'hora_inicio': hora_inicio,
+            'hora_fin': hora_fin,
+            'efector': 'HCSI',
+            'ventanilla': ''  # Nueva variable Ventanilla (vacía por ahora)
+        })
+        
+        # Asignar ventanillas para Hospital Materno (HCSI incluye Hospital Materno)
+        # Nota: En los datos CSV, algunos efectores pueden ser Hospital Materno
+        es_materno = df_resultado['efector'].str.upper().str.contains('MATERNO', regex=False)
+        if es_materno.any():
+            areas = df_resultado.loc[es_materno, 'area']
+            df_resultado.loc[es_materno, 'ventanilla'] = areas.map(
+                _mapear_valores_unicos(areas, self.asignar_ventanilla_hospital_materno))
+        
+        return df_resultado
 
     def _inferir_efector(self, nombre_archivo: str) -> str:
         """Infiere el nombre del efector desde el nombre del archivo"""
         nombre_base = os.path.splitext(nombre_archivo)[0]
         nombre_upper = nombre_base.upper()
         
-        # Patrones específicos - ORDEN IMPORTANTE: más específicos primero
-        if 'HCSI' in nombre_upper:
-            return 'HCSI'
-        elif 'HOSPITAL BOULOGNE' in nombre_upper:
-            return 'Hospital Boulogne'
-        elif 'HOSPITAL MATERNO' in nombre_upper:
-            return 'Hospital Materno'
-        elif 'HOSPITAL ODONTOLOGICO' in nombre_upper:
-            return 'Hospital Odontológico'
-        elif 'CAPS BARRIO OBRERO' in nombre_upper:
-            return 'CAPS Barrio Obrero'
-        elif 'CAPS BECCAR' in nombre_upper:
-            return 'CAPS Beccar'
-        elif 'CAPS LA RIBERA' in nombre_upper:
-            return 'CAPS La Ribera'
-        elif 'CAPS BAJO BOULOGNE' in nombre_upper or 'CAPS BAJO BOULOGNE' in nombre_upper:
-            return 'CAPS Bajo Boulogne'
-        elif 'CAPS DIAGONAL SALTA' in nombre_upper:
-            return 'CAPS Diagonal Salta'
-        elif 'CAPS SAN ISIDRO LABRADOR' in nombre_upper:
-            return 'CAPS San Isidro Labrador'
-        elif 'CAPS SAN PANTALEON' in nombre_upper:
-            return 'CAPS San Pantaleón'
-        elif 'CAPS MARTINEZ' in nombre_upper:
-            return 'CAPS Martínez'
-        elif 'CAPS VILLA ADELINA' in nombre_upper:
-            return 'CAPS Villa Adelina'
-        elif 'CENTRO EL NIDO' in nombre_upper:
-            return 'Centro El Nido'
-        elif 'CAPS' in nombre_upper:
-            return 'CAPS'  # Fallback genérico
-        elif 'CENTRO' in nombre_upper:
-            return 'Centro de Salud'
+        # Reglas en orden: las más específicas primero, los genéricos (CAPS, CENTRO) al final
+        for textos, efector in self.reglas.efectores:
+            if any(texto in nombre_upper for texto in textos):
+                return efector
         
         return nombre_base
     
     def asignar_ventanilla_hospital_materno(self, area: str) -> str:
         """
         Asigna ventanilla según el área médica para Hospital Materno
-        Basado en el archivo ventanillas_materno.xlsx
+        Basado en el archivo ventanillas_materno.xlsx (listas en el archivo de reglas)
         """
         if not area:
             return ""
         
-        area_upper = area.upper().strip()
-        
-        # Ventanilla PEDIATRIA
-        ventanilla_a = [
-            'PEDIATRIA', 'ADOLESCENCIA', 'ALERGIA', 'ALTO RIESGO', 'DEGLUCION',
-            'CARDIOLOGIA INFANTIL', 'ENDOCRINOLOGIA', 'ESPEIROMETRIA', 'FONOAUDIOLOGIA',
-            'GASTROENTEROLOGIA', 'HEPATOLOGIA', 'GENETICA INFANTIL', 'INFANTO JUVENIL',
-            'INFECTOLOGIA INFANTIL', 'MEDIANO RIESGO', 'NEFROLOGIA', 'NEUMOLOGIA',
-            'NEUROLOGIA', 'ELECTROENCEFALOGRAMA', 'NUTRICION', 'OAES- PEAT',
-            'OFTAMOLOGIA', 'RESIDENTES PEDIATRIA (POST ALTA)', 'RESIDENTES NIÑO SANO',
-            'PSICOLOGIA', 'PSIQUIATRIA', 'TBC (TUBERCULOSIS)'
-        ]
-        
-        # Ventanilla GUARDIA VIEJA
-        ventanilla_b = [
-            'GUARDIA VIEJA', 'TRAUMATOLOGIA', 'DERMATOLOGIA', 'CIRUGIA', 'UROLOGIA',
-            'CRANEO FACIAL', 'OTORRINO', 'AUDIOMETRIA', 'KINESIOLOGIA', 'CIRUGIA PLASTICA',
-            'OTORRINOLARINGOLOGIA'
-        ]
-        
-        # Ventanilla OBSTETRICIA
-        ventanilla_c = [
-            'OBSTETRICIA', 'INFECTOLOGIA ADULTOS', 'TRACTO GENITAL (PAP)', 'CARDIOLOGIA',
-            'PUERPERIO', 'OBSTETRICIA ALTO RIESGO', 'OBSTETRICIA BAJO RIESGO',
-            'RESIDENTES 1º VEZ', 'GINECOLOGIA QUIRURGICA', 'GENETICA', 'INFANTO JUVENIL',
-            'ELECTROCARDIOGRAMA', 'PSICOLOGIA', 'ODONTOLOGIA', 'NUTRICION',
-            'DIABETOLOGIA', 'PLANIFICACION FAMILIAR', 'HEMOTERAPIA'
-        ]
-        
-        # Verificar asignación de ventanilla
-        if area_upper in ventanilla_a:
-            return "PEDIATRIA"
-        elif area_upper in ventanilla_b:
-            return "GUARDIA VIEJA"
-        elif area_upper in ventanilla_c:
-            return "OBSTETRICIA"
-        else:
-            return ""  # No asignada
+        return self.reglas.ventanilla_por_area.get(area.upper().strip(), "")  # "" = no asignada
     
-    def exportar_consolidado(self, df: pd.DataFrame, archivo_salida: str = 'agendas_consolidadas.csv'):
-        """Exporta el DataFrame consolidado a CSV y Excel con agenda_id al final en Excel"""
+    def exportar_consolidado(self, df: pd.DataFrame, archivo_salida: str = 'agendas_consolidadas.csv',
+                             hojas_por_efector: bool = False, formatos: Iterable[str] = FORMATOS_SALIDA):
+        """
+        Exporta el DataFrame consolidado a CSV y Excel con agenda_id al final en Excel.
+        Además genera un Parquet tipado, que es la salida canónica para procesamiento.
+        Con hojas_por_efector el Excel tiene una hoja por efector en lugar de una sola.
+        formatos elige qué archivos se generan ('csv', 'xlsx', 'parquet').
+        """
+        formatos = set(formatos)
         try:
             # Exportar a CSV (orden original)
-            df.to_csv(archivo_salida, index=False, encoding='utf-8')
-            print(f"Archivo CSV exportado a: {archivo_salida}")
+            if 'csv' in formatos:
+                with self.medir('exportacion_csv'):
+                    df.to_csv(archivo_salida, index=False, encoding='utf-8')
+                print(f"Archivo CSV exportado a: {archivo_salida}")
+            
+            if 'parquet' in formatos:
+                with self.medir('exportacion_parquet'):
+                    self.exportar_parquet(df, archivo_salida.replace('.csv', '.parquet'))
+            
+            if 'xlsx' not in formatos:
+                print(f"Total de registros: {len(df)}")
+                return
             
             # Para Excel: reorganizar columnas con agenda_id al final
             df_excel = df.copy()
@@ -849,30 +2008,8 @@ class AgendaNormalizer:
                 df_excel = df_excel[columnas_reordenadas]
             
             archivo_excel = archivo_salida.replace('.csv', '.xlsx')
-            
-            # Crear el archivo Excel simple con formato básico
-            with pd.ExcelWriter(archivo_excel, engine='openpyxl') as writer:
-                # Una sola hoja con las columnas reordenadas
-                df_excel.to_excel(writer, sheet_name='Agendas Consolidadas', index=False)
-                
-                # Obtener el worksheet para aplicar formato básico
-                worksheet = writer.sheets['Agendas Consolidadas']
-                
-                # Ajustar ancho de columnas automáticamente
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    
-                    # Establecer un ancho máximo razonable
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
+            with self.medir('exportacion_xlsx'):
+                self._exportar_excel(df_excel, archivo_excel, hojas_por_efector)
             
             print(f"Archivo Excel exportado a: {archivo_excel}")
             print(f"Total de registros: {len(df)}")
@@ -880,12 +2017,128 @@ class AgendaNormalizer:
         except Exception as e:
             print(f"Error exportando archivos: {e}")
             # Intentar exportar solo CSV como fallback
+            if 'csv' not in formatos:
+                return
             try:
                 df.to_csv(archivo_salida, index=False, encoding='utf-8')
                 print(f"Exportación de CSV exitosa como fallback: {archivo_salida}")
             except Exception as e2:
                 print(f"Error crítico en exportación: {e2}")
     
+    def _exportar_excel(self, df: pd.DataFrame, archivo_excel: str, hojas_por_efector: bool = False):
+        """
+        Escribe el Excel en modo write_only (filas en streaming, sin recorrer celdas
+        después). El ancho de cada columna se calcula antes, sobre el DataFrame.
+        """
+        libro = openpyxl.Workbook(write_only=True)
+        
+        if hojas_por_efector and 'efector' in df.columns:
+            hojas = [(_nombre_hoja_excel(efector), df[df['efector'] == efector])
+                     for efector in df['efector'].dropna().unique()]
+        else:
+            # Una sola hoja con las columnas reordenadas
+            hojas = [('Agendas Consolidadas', df)]
+        
+        fuente_encabezado = openpyxl.styles.Font(bold=True)
+        for nombre_hoja, df_hoja in hojas:
+            worksheet = libro.create_sheet(title=nombre_hoja)
+            
+            # Ajustar ancho de columnas (máximo razonable de 50)
+            for posicion, ancho in enumerate(_anchos_columnas_excel(df_hoja), start=1):
+                letra = openpyxl.utils.get_column_letter(posicion)
+                worksheet.column_dimensions[letra].width = ancho
+            
+            encabezados = []
+            for columna in df_hoja.columns:
+                celda = openpyxl.cell.WriteOnlyCell(worksheet, value=columna)
+                celda.font = fuente_encabezado
+                encabezados.append(celda)
+            worksheet.append(encabezados)
+            
+            valores = df_hoja.astype(object).where(df_hoja.notna(), None)
+            for fila in valores.itertuples(index=False, name=None):
+                worksheet.append(fila)
+        
+        libro.save(archivo_excel)
+    
+    def exportar_parquet(self, df: pd.DataFrame, archivo_parquet: str):
+        """
+        Exporta el consolidado a Parquet con tipos (categorías, minutos enteros) y
+        metadatos de esquema/versión embebidos en el archivo
+        """
+        if pq is None:
+            print("Exportación a Parquet omitida (pyarrow no está instalado)")
+            return
+        try:
+            tabla = pa.Table.from_pandas(tipar_consolidado(df), preserve_index=False)
+            metadatos = dict(tabla.schema.metadata or {})
+            metadatos[CLAVE_METADATOS_PARQUET] = json.dumps({
+                'version_esquema': VERSION_ESQUEMA,
+                'version_parser': VERSION_PARSER,
+                'version_reglas': self.reglas.version,
+                'generado': pd.Timestamp.now().isoformat(timespec='seconds'),
+                'registros': len(df),
+            }).encode('utf-8')
+            pq.write_table(tabla.replace_schema_metadata(metadatos), archivo_parquet)
+            print(f"Archivo Parquet exportado a: {archivo_parquet}")
+        except Exception as e:
+            print(f"Error exportando Parquet: {e}")
+    
+    def exportar_lotes(self, lotes: Iterable[pd.DataFrame], archivo_salida: str = 'agendas_consolidadas.csv',
+                       formatos: Iterable[str] = ('csv', 'parquet'),
+                       archivo_mapa_ids: Optional[str] = None) -> Dict[str, int]:
+        """
+        Exporta lote a lote (por ejemplo los de iter_batches) a CSV y/o Parquet sin armar
+        el consolidado en memoria. El Excel necesita todas las filas para calcular anchos
+        y hojas, así que en este modo se omite. Con archivo_mapa_ids también escribe el
+        mapa agenda_id -> agenda_uid. Devuelve los registros por efector.
+        """
+        formatos = set(formatos)
+        if 'xlsx' in formatos:
+            print("Exportación a Excel omitida: no está disponible al exportar por lotes")
+        escritores = []
+        if 'csv' in formatos:
+            escritores.append(EscritorCSVIncremental(archivo_salida))
+        if 'parquet' in formatos:
+            if pq is None:
+                print("Exportación a Parquet omitida (pyarrow no está instalado)")
+            else:
+                escritores.append(EscritorParquetIncremental(archivo_salida.replace('.csv', '.parquet'),
+                                                             self.reglas.version))
+        
+        escritor_mapa = EscritorCSVIncremental(archivo_mapa_ids) if archivo_mapa_ids else None
+        
+        registros_por_efector: Dict[str, int] = {}
+        try:
+            for df_lote in lotes:
+                with self.medir('exportacion_lotes'):
+                    for escritor in escritores:
+                        escritor.escribir(df_lote)
+                    if escritor_mapa is not None:
+                        escritor_mapa.escribir(mapa_ids_agenda(df_lote))
+                for efector, cantidad in df_lote['efector'].value_counts().items():
+                    registros_por_efector[efector] = registros_por_efector.get(efector, 0) + int(cantidad)
+        finally:
+            for escritor in escritores:
+                escritor.cerrar()
+        
+        for escritor in escritores:
+            if escritor.registros:
+                tipo = 'CSV' if isinstance(escritor, EscritorCSVIncremental) else 'Parquet'
+                print(f"Archivo {tipo} exportado a: {escritor.archivo}")
+        if escritor_mapa is not None and escritor_mapa.registros:
+            print(f"Mapa de agenda_id exportado a: {archivo_mapa_ids}")
+        print(f"Total de registros: {sum(registros_por_efector.values())}")
+        return registros_por_efector
+    
+    def exportar_mapa_ids(self, df: pd.DataFrame, archivo_csv: str):
+        """
+        Escribe el mapa de migración agenda_id -> agenda_uid (una fila por agenda), para
+        pasar a agenda_uid datos guardados con los identificadores correlativos
+        """
+        mapa_ids_agenda(df).to_csv(archivo_csv, index=False, encoding='utf-8')
+        print(f"Mapa de agenda_id exportado a: {archivo_csv}")
+    
     def generar_reporte(self, df: pd.DataFrame):
         """Genera un reporte estadístico de los datos consolidados"""
         print("\n=== REPORTE DE CONSOLIDACIÓN ===")
@@ -915,153 +2168,161 @@ class AgendaNormalizer:
         print(f"Sin área: {len(df[df['area'].str.strip() == ''])}")
         print(f"Sin tipo de turno: {len(df[df['tipo_turno'].str.strip() == ''])}")
         print(f"Sin día: {len(df[df['dia'].str.strip() == ''])}")
+        if 'horario_valido' in df.columns:
+            print(f"Con horario no válido (hora ilegible o inicio = fin): {int((~df['horario_valido']).sum())}")
+        
+        print("\n--- Caché de extracción de componentes ---")
+        consultas = self.estadisticas_cache['aciertos'] + self.estadisticas_cache['fallos']
+        tasa_aciertos = self.estadisticas_cache['aciertos'] / consultas * 100 if consultas else 0.0
+        print(f"Aciertos: {self.estadisticas_cache['aciertos']} ({tasa_aciertos:.1f}%)")
+        print(f"Fallos (títulos parseados): {self.estadisticas_cache['fallos']}")
+        print(f"Desalojos: {self.estadisticas_cache['desalojos']} (capacidad {self.tamano_cache_componentes})")
+        if self.archivo_cache_persistente is not None:
+            print(f"Fallos resueltos por la caché en disco: {self.estadisticas_cache['persistentes']}")
+        if self.directorio_grillas is not None:
+            print(f"Excel leídos desde la grilla guardada: {self.estadisticas_cache['grillas']}")
+        
+        print("\n--- Memoria por columna (KiB) ---")
+        memoria = memoria_por_columna(df)
+        for fila in memoria.itertuples(index=False):
+            print(f"{fila.columna:<24}{fila.tipo:<28}{fila.kib:>8}  (como objetos: {fila.kib_objetos})")
+        print(f"Total: {memoria['kib'].sum()} KiB (como objetos: {memoria['kib_objetos'].sum()} KiB)")
+        
+        self._imprimir_instrumentacion()
+        self._imprimir_telemetria_patrones()
+        
+        if self.estadisticas_incremental['reutilizados']:
+            print("\n--- Procesamiento incremental ---")
+            print(f"Fuentes reutilizadas del manifiesto: {self.estadisticas_incremental['reutilizados']}")
+            print(f"Fuentes reprocesadas: {self.estadisticas_incremental['reprocesados']}")
 
+    def _imprimir_instrumentacion(self):
+        """Tabla resumen de tiempos por etapa y por archivo (y memoria pico si se midió)"""
+        etapas = self.instrumentacion['etapas']
+        if not etapas:
+            return
+        memoria_etapas = self.instrumentacion['memoria_etapas_kib']
+        print("\n--- Tiempos por etapa ---")
+        print(f"{'etapa':<22}{'seg':>9}{'memoria KiB':>13}")
+        for etapa, segundos in etapas.items():
+            print(f"{etapa:<22}{segundos:>9.3f}{memoria_etapas.get(etapa, '-'):>13}")
+        
+        archivos = self.instrumentacion['archivos']
+        if archivos:
+            print("\n--- Tiempos por archivo ---")
+            print(f"{'efector':<28}{'registros':>10}{'seg':>9}{'memoria KiB':>13}")
+            for medicion in sorted(archivos.values(), key=lambda m: m.get('segundos', 0), reverse=True):
+                memoria = medicion.get('memoria_pico_kib')
+                print(f"{medicion['efector'][:27]:<28}{medicion.get('registros', 0):>10}"
+                      f"{medicion.get('segundos', 0):>9.3f}{'-' if memoria is None else memoria:>13}")
+        if self.instrumentacion['memoria_pico_kib'] is not None:
+            print(f"Memoria pico del procesamiento: {self.instrumentacion['memoria_pico_kib']} KiB")
+    
+    def exportar_reporte_ejecucion(self, archivo_reporte: str, df: Optional[pd.DataFrame],
+                                   parametros: Optional[Dict] = None,
+                                   registros_por_efector: Optional[Dict[str, int]] = None):
+        """
+        Escribe en JSON el reporte de la corrida: tiempos, memoria, caché y registros.
+        En modo streaming no hay consolidado: se pasa df=None y los conteos por efector.
+        """
+        if df is not None:
+            registros_por_efector = df['efector'].value_counts().to_dict() if 'efector' in df.columns else {}
+        registros_por_efector = registros_por_efector or {}
+        reporte = {
+            'generado': pd.Timestamp.now().isoformat(timespec='seconds'),
+            'version_parser': VERSION_PARSER,
+            'version_reglas': self.reglas.version,
+            'parametros': parametros or {},
+            'registros': len(df) if df is not None else sum(registros_por_efector.values()),
+            'registros_por_efector': registros_por_efector,
+            'memoria_columnas_kib': ({fila.columna: int(fila.kib) for fila in memoria_por_columna(df).itertuples()}
+                                     if df is not None else {}),
+            'cache_componentes': dict(self.estadisticas_cache),
+            'incremental': dict(self.estadisticas_incremental),
+            'etapas_segundos': {etapa: round(segundos, 4) for etapa, segundos in self.instrumentacion['etapas'].items()},
+            'memoria_etapas_kib': dict(self.instrumentacion['memoria_etapas_kib']),
+            'archivos': {
+                nombre: {**medicion,
+                         'segundos': round(medicion.get('segundos', 0.0), 4),
+                         'etapas': {etapa: round(segundos, 4) for etapa, segundos in medicion['etapas'].items()}}
+                for nombre, medicion in self.instrumentacion['archivos'].items()
+            },
+            'memoria_pico_kib': self.instrumentacion['memoria_pico_kib'],
+        }
+        with open(archivo_reporte, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"Reporte de ejecución exportado a: {archivo_reporte}")
+    
+    def exportar_telemetria_patrones(self, archivo_csv: str) -> pd.DataFrame:
+        """
+        Escribe la tabla de telemetría por patrón (requiere telemetria_patrones=True).
+        Con la caché de componentes cada título único se evalúa una sola vez, así que
+        los contadores son por título distinto, no por fila de horario (con jobs > 1
+        cada proceso tiene su propia caché y un título repetido se cuenta una vez por proceso).
+        """
+        tabla = _TelemetriaPatrones.tabla(self.instrumentacion['patrones'])
+        tabla.to_csv(archivo_csv, index=False, encoding='utf-8')
+        print(f"Telemetría de patrones exportada a: {archivo_csv}")
+        return tabla
+    
+    def _imprimir_telemetria_patrones(self, cantidad: int = 10):
+        """Los patrones que más tiempo consumieron en la corrida"""
+        tabla = _TelemetriaPatrones.tabla(self.instrumentacion['patrones'])
+        if tabla.empty:
+            return
+        print(f"\n--- Patrones más costosos ({cantidad}) ---")
+        print(f"{'grupo':<12}{'evaluaciones':>13}{'coincid.':>10}{'seg':>9}{'max µs':>9}  patrón")
+        for fila in tabla.nlargest(cantidad, 'segundos').itertuples():
+            print(f"{fila.grupo:<12}{fila.evaluaciones:>13}{fila.coincidencias:>10}{fila.segundos:>9.4f}"
+                  f"{fila.max_us:>9.0f}  {fila.patron[:50]}")
+        sin_uso = tabla[(tabla['coincidencias'] == 0) & (tabla['grupo'] != 'exclusion')]
+        if not sin_uso.empty:
+            print(f"Patrones sin coincidencias en esta corrida: {len(sin_uso)}")
+    
     def limpiar_texto(self, texto: str) -> str:
         """Limpia caracteres especiales y de codificación problemáticos"""
         if not texto or pd.isna(texto):
             return ""
         
-        # Limpiar caracteres de codificación problemáticos
-        texto_limpio = str(texto)
-        
-        # Reemplazar caracteres problemáticos comunes
-        reemplazos = {
-            'Ã_x008d_': 'Í',
-            'Ã_x0081_': 'Á',
-            'Ã_x0081_N': 'ÁN',
-            'MÃ‰DICA': 'MÉDICA',
-            'CLÃ_x008d_NICA': 'CLÍNICA',
-            'PEDIÃ_x0081_TRICA': 'PEDIÁTRICA',
-            'BARILÃ_x0081_': 'BARILÁ',
-            'INÃ‰S': 'INÉS',
-            'Ã‰S': 'ÉS',
-            'Ã‰': 'É',
-            'Ã\u201dNICA': 'ÓNICA',
-            'Ã\u201d': 'Ó',
-            'VERÃ\u201dNICA': 'VERÓNICA',
-            '├ô': 'Ó',  # Mapeo específico para VER├ôNICA
-            'VER├ôNICA': 'VERÓNICA',  # Mapeo completo para VERÓNICA
-            'MUÃ\u2019OZ': 'MUÑOZ',  # Mapeo para MUÑOZ
-            'Ã\u2019OZ': 'ÑOZ',  # Mapeo genérico para Ñ
-            'Ã\u2019': 'Ñ',  # Mapeo genérico para Ñ
-            'NOEMÃ_x008d_': 'NOEMÍ',  # Mapeo específico para NOEMÍ
-            'ODONTOLOGÃ_x008d_A': 'ODONTOLOGÍA',  # Mapeo específico para ODONTOLOGÍA
-            'Ã¡': 'á',
-            'Ã©': 'é',
-            'Ã­': 'í',
-            'Ã³': 'ó',
-            'Ãº': 'ú',
-            'Ã±': 'ñ',
-            'Ã\u00d1': 'Ñ',
-            'Ãü': 'ü',
-            'Ã‚': 'Â',
-            'Ã¢': 'â',
-            'Ã¨': 'è',
-            'Ã¬': 'ì',
-            'Ã²': 'ò',
-            'Ã¹': 'ù',
-            'Ã§': 'ç'
-        }
-        
-        for problema, solucion in reemplazos.items():
-            if problema in texto_limpio:
-                texto_limpio = texto_limpio.replace(problema, solucion)
+        texto_limpio = _REPARADOR_LIMPIEZA.reparar(str(texto))
         
         # Mapeo adicional para casos específicos como TABOADA
         if 'TABOADA' in texto_limpio:
-            # Usar expresión regular para capturar cualquier secuencia problemática antes de NICA
-            import re
-            texto_limpio = re.sub(r'VER[^A-Z]*NICA', 'VERÓNICA', texto_limpio)
+            texto_limpio = _VERONICA_REGEX.sub('VERÓNICA', texto_limpio)
         
         return texto_limpio.strip()
     
-    def _procesar_formato_odontologico(self, df: pd.DataFrame, efector: str) -> pd.DataFrame:
+    def limpiar_columna(self, serie: pd.Series) -> pd.Series:
+        """Versión por lotes de limpiar_texto: limpia solo los valores únicos de la columna"""
+        unicos = serie.dropna().unique()
+        limpios = {valor: self.limpiar_texto(valor) for valor in unicos}
+        return serie.map(limpios).fillna("")
+    
+    def _procesar_formato_odontologico(self, hoja: pd.DataFrame, efector: str) -> pd.DataFrame:
         """
         Procesa el formato específico del Hospital Odontológico donde:
         - Una fila tiene el nombre de la agenda/doctor en columna A
         - Las filas siguientes tienen Día, Hora inicio, Hora fin en columnas A, B, C
         """
-        registros = []
-        agenda_actual = ""
-        agenda_id_counter = 0  # Contador para generar IDs únicos de agenda
-        agenda_actual_id = ""
-        
-        i = 0
-        while i < len(df):
-            row = df.iloc[i]
-            
-            # Saltar filas vacías
-            if pd.isna(row.iloc[0]) or str(row.iloc[0]).strip() == "":
-                i += 1
-                continue
-                
-            primera_celda = str(row.iloc[0]).strip().upper()
-            
-            # Saltar encabezados del archivo
-            if primera_celda in ['HOSPITAL ODONTOLOGICO SAN ISIDRO']:
-                i += 1
-                continue
+        with self.medir('clasificacion'):
+            tiene_a, tiene_b, tiene_c = (hoja[col].notna() for col in range(_COLUMNAS_AGENDA))
+            texto_a = hoja[0].where(tiene_a, '').astype(str).str.strip()
+            primera_celda = texto_a.str.upper()
+            texto_b = hoja[1].where(tiene_b, '').astype(str).str.strip()
             
-            # Si es una fila de encabezado de tabla (Día, Hora inicio, Hora fin)
-            if primera_celda in ['DÍA', 'DIA']:
-                i += 1
-                continue
+            # Saltar filas vacías, encabezados del archivo y encabezados de tabla (Día, Hora inicio, Hora fin)
+            fila_util = (tiene_a & (texto_a != '') &
+                         ~primera_celda.isin(['HOSPITAL ODONTOLOGICO SAN ISIDRO', 'DÍA', 'DIA']))
             
             # Si la columna B está vacía, probablemente sea una agenda/doctor
-            if pd.isna(row.iloc[1]) or str(row.iloc[1]).strip() == "" or str(row.iloc[1]).strip() == "NaN":
-                agenda_actual = self.decodificar_caracteres_especiales(str(row.iloc[0]).strip())
-                agenda_id_counter += 1
-                # Generar ID único que incluye el efector y un contador secuencial  
-                agenda_actual_id = f"{efector}_{agenda_id_counter:03d}_{agenda_actual}"
-                i += 1
-                continue
-            
-            # Si llegamos aquí, debería ser una fila de horario
-            # Verificar que tenga día, hora inicio y hora fin
-            if len(row) >= 3 and pd.notna(row.iloc[1]) and pd.notna(row.iloc[2]):
-                dia_raw = str(row.iloc[0]).strip()
-                hora_inicio = self._formatear_hora(row.iloc[1])
-                hora_fin = self._formatear_hora(row.iloc[2])
-                
-                # Mapear días
-                dia_mapping = {
-                    'LUNES': 'Lunes', 'MARTES': 'Martes', 'MIÉRCOLES': 'Miércoles',
-                    'MIERCOLES': 'Miércoles', 'JUEVES': 'Jueves', 'VIERNES': 'Viernes',
-                    'SÁBADO': 'Sábado', 'SABADO': 'Sábado', 'SÁB': 'Sábado', 'DOMINGO': 'Domingo'
-                }
-                dia = dia_mapping.get(dia_raw.upper(), dia_raw)
-                
-                # Solo procesar si tenemos datos completos
-                if agenda_actual and dia and hora_inicio and hora_fin:
-                    # Procesar componentes de la agenda
-                    agenda_limpia_para_procesamiento = self.limpiar_texto(agenda_actual)
-                    componentes = self.extraer_componentes_agenda(agenda_limpia_para_procesamiento)
-                    
-                    # Para otros centros: preservar el formato original del doctor (sin limpiar)
-                    doctor_original = componentes['doctor']  # Mantener formato original
-                    
-                    registro = {
-                        'agenda_id': agenda_actual_id,
-                        'nombre_original_agenda': agenda_actual,  # SIN LIMPIAR - exactamente como está
-                        'doctor': doctor_original,  # SIN LIMPIAR - exactamente como está extraído
-                        'area': self.limpiar_texto(componentes['area']),
-                        'tipo_turno': self.limpiar_texto(componentes['tipo_turno']),
-                        'dia': dia,
-                        'hora_inicio': hora_inicio,
-                        'hora_fin': hora_fin,
-                        'efector': efector,
-                        'ventanilla': ''  # Nueva variable Ventanilla (vacía por ahora)
-                    }
-                    
-                    # Asignar ventanilla para Hospital Materno
-                    if efector == 'Hospital Materno':
-                        registro['ventanilla'] = self.asignar_ventanilla_hospital_materno(componentes['area'])
-                    
-                    registros.append(registro)
-            
-            i += 1
+            columna_b_vacia = ~tiene_b | texto_b.isin(['', 'NaN'])
+            es_titulo = fila_util & columna_b_vacia
+            # Si no, debería ser una fila de horario con día, hora inicio y hora fin
+            es_horario = fila_util & ~columna_b_vacia & tiene_c
         
-        return pd.DataFrame(registros)
+        with self.medir('extraccion'):
+            return self._construir_registros_fragmentados(hoja, es_titulo, es_horario, efector, '_formatear_hora',
+                                                          agenda_id_al_final=False, requiere_ambas_horas=True)
 
     def _formatear_hora(self, valor_hora) -> str:
         """Formatea una hora desde diferentes formatos posibles"""
@@ -1091,79 +2352,852 @@ class AgendaNormalizer:
         Postprocesamiento específico para Hospital Materno.
         Limpia el área para agendas específicas que no deben tenerla.
         """
-        # Lista de agendas de Hospital Materno que NO deben tener área
-        agendas_sin_area_materno = [
-            # Agendas de Recien Nacido
-            'Agenda 16 Recien Nacido',
-            'Agenda 17 Recien Nacido',
-            'Agenda 36 Recien Nacido',
-            'Agenda 43 Recien Nacido',
-            'Agenda 44 Recien Nacido',
-            'Agenda 45 Recien Nacido',
-            'Agenda 46 Recien Nacido',
-            'Agenda 47 Recien Nacido',
-            'Agenda 48 Recien Nacido',
-            'Agenda 49 Recien Nacido',
-            'Agenda 50 Recien Nacido',
-            'Agenda 51 Recien Nacido',
-            'Agenda 52 Recien Nacido',
-            'Agenda 53 Recien Nacido',
-            'Agenda 54 Recien Nacido',
-            'Agenda 55 Recien Nacido',
-            'Agenda 56 Recien Nacido',
-            'Agenda 57 Recien Nacido',
-            'Agenda 58 Recien Nacido',
-            'Agenda 59 Recien Nacido',
-            'Agenda 60 Recien Nacido',
-            'Agenda 61 Recien Nacido',
-            'Agenda 62 Recien Nacido',
-            'Agenda 63 Recien Nacido',
-            # Agendas de Guardia y Especialidades específicas
-            '01. GUARDIA OBSTETRICIA',
-            'HEMATO ONCOLOGIA- DRA MOUSTEN BARBARA',
-            '02. GUARDIA GINECOLOGIA',
-            '01. GUARDIA REINGRESO OBSTETRICIA',
-            'TRIAGE OBSTETRICIA'
-        ]
-        
         # Aplicar la lógica: limpiar área para agendas específicas
         df_resultado = df.copy()
-        mask = df_resultado['nombre_original_agenda'].isin(agendas_sin_area_materno)
+        mask = df_resultado['nombre_original_agenda'].isin(self.reglas.agendas_sin_area_materno)
         df_resultado.loc[mask, 'area'] = ''
         
         return df_resultado
 
+# ---------------------------------------------------------------------------
+# Exportación a Excel
+# ---------------------------------------------------------------------------
+_CARACTERES_INVALIDOS_HOJA = re.compile(r'[\[\]:*?/\\]')
+
+def _nombre_hoja_excel(nombre: str) -> str:
+    """Nombre de hoja válido para Excel (sin caracteres reservados, máximo 31)"""
+    return _CARACTERES_INVALIDOS_HOJA.sub('-', str(nombre))[:31] or 'Hoja'
+
+def _anchos_columnas_excel(df: pd.DataFrame, ancho_maximo: int = 50) -> List[int]:
+    """Ancho de cada columna: el texto más largo (encabezado incluido) + 2, con tope"""
+    anchos = []
+    for columna in df.columns:
+        largo_valores = df[columna].dropna().astype(str).str.len().max()
+        largo = max(len(str(columna)), 0 if pd.isna(largo_valores) else int(largo_valores))
+        anchos.append(min(largo + 2, ancho_maximo))
+    return anchos
+
+# ---------------------------------------------------------------------------
+# Esquema de la salida tipada (Parquet)
+# ---------------------------------------------------------------------------
+# Versión del esquema de columnas/tipos; subirla cuando cambie la forma de la salida
+VERSION_ESQUEMA = 2
+CLAVE_METADATOS_PARQUET = b'agendas_consolidadas'
+
+COLUMNAS_CATEGORICAS = ['efector', 'dia', 'area', 'tipo_turno', 'ventanilla']
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+def _tipo_categorico(serie: pd.Series, columna: str):
+    """Categoría de una columna de pocos valores (dia ordenado de lunes a domingo)"""
+    if columna == 'dia':
+        otros = sorted(set(serie.dropna()) - set(DIAS_SEMANA))
+        return pd.CategoricalDtype(DIAS_SEMANA + otros, ordered=True)
+    return 'category'
+
+def tipar_consolidado(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve una copia del consolidado con tipos de la salida canónica: categorías para
+    las columnas de pocos valores (dia ordenado de lunes a domingo) y minutos enteros
+    """
+    df_tipado = df.copy()
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df_tipado.columns:
+            df_tipado[columna] = df_tipado[columna].astype(_tipo_categorico(df_tipado[columna], columna))
+    for columna in ['minuto_inicio', 'minuto_fin', 'duracion_min']:
+        if columna in df_tipado.columns:
+            df_tipado[columna] = df_tipado[columna].astype('Int16')
+    return df_tipado
+
+def _tipo_texto_arrow():
+    """Texto respaldado por pyarrow con NaN como faltante (el 'str' de pandas 3); None sin pyarrow"""
+    if pa is None:
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3 no tiene la variante con NaN
+        return pd.StringDtype('pyarrow')
+
+def compactar_consolidado(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pasa el consolidado en memoria a tipos compactos (modifica df y lo devuelve):
+    categorías para las columnas de pocos valores y texto Arrow para el resto, en lugar
+    de un objeto de Python por celda. Los valores no cambian (el CSV sale igual).
+    """
+    tipo_texto = _tipo_texto_arrow()
+    for columna in df.columns:
+        serie = df[columna]
+        if columna in COLUMNAS_CATEGORICAS:
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                df[columna] = serie.astype(_tipo_categorico(serie, columna))
+        elif (tipo_texto is not None and serie.dtype == object and
+              pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty')):
+            df[columna] = serie.astype(tipo_texto)
+    return df
+
+def memoria_por_columna(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Memoria de cada columna (KiB) con su tipo actual y la que ocuparían las columnas de
+    texto como objetos de Python (el consolidado sin compactar o leído del CSV con pandas 2)
+    """
+    actual = df.memory_usage(index=False, deep=True)
+    textos = [columna for columna in df.columns
+              if isinstance(df[columna].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(df[columna])]
+    como_objetos = actual.copy()
+    como_objetos[textos] = df[textos].astype(object).memory_usage(index=False, deep=True)
+    return pd.DataFrame({
+        'columna': df.columns,
+        'tipo': [str(tipo) for tipo in df.dtypes],
+        'kib': (actual // 1024).to_numpy(),
+        'kib_objetos': (como_objetos // 1024).to_numpy(),
+    })
+
+def leer_metadatos_parquet(archivo_parquet: str) -> Dict:
+    """Lee los metadatos de versión embebidos por exportar_parquet ({} si no los tiene)"""
+    # Se leen del pie del archivo: EscritorParquetIncremental los agrega recién al cerrar
+    metadatos = pq.read_metadata(archivo_parquet).metadata or {}
+    if CLAVE_METADATOS_PARQUET not in metadatos:
+        return {}
+    return json.loads(metadatos[CLAVE_METADATOS_PARQUET])
+
+# ---------------------------------------------------------------------------
+# Salidas incrementales (streaming)
+# ---------------------------------------------------------------------------
+# Escriben los lotes de AgendaNormalizer.iter_batches a medida que llegan, sin armar
+# el consolidado en memoria. Concatenar los lotes y exportarlos de una vez da los
+# mismos archivos (el Parquet, con otros límites de row group).
+
+class EscritorCSVIncremental:
+    """CSV que se escribe de a lotes; las columnas son las del primer lote"""
+    
+    def __init__(self, archivo_csv: str):
+        self.archivo = archivo_csv
+        self.columnas: Optional[List[str]] = None
+        self.registros = 0
+    
+    def escribir(self, df_lote: pd.DataFrame):
+        if self.columnas is None:
+            self.columnas = list(df_lote.columns)
+            df_lote.to_csv(self.archivo, index=False, encoding='utf-8')
+        else:
+            df_lote.reindex(columns=self.columnas).to_csv(self.archivo, mode='a', header=False,
+                                                          index=False, encoding='utf-8')
+        self.registros += len(df_lote)
+    
+    def cerrar(self):
+        pass
+
+
+class EscritorParquetIncremental:
+    """
+    Parquet que se escribe de a lotes (un row group por lote) con los mismos tipos que
+    exportar_parquet. Las categorías de cada lote van con su propio diccionario; el
+    esquema es el del primer lote y los metadatos de versión se agregan al cerrar,
+    cuando ya se conoce la cantidad de registros.
+    """
+    
+    def __init__(self, archivo_parquet: str, version_reglas: str):
+        self.archivo = archivo_parquet
+        self.version_reglas = version_reglas
+        self.columnas: Optional[List[str]] = None
+        self.esquema = None
+        self.escritor = None
+        self.registros = 0
+    
+    def escribir(self, df_lote: pd.DataFrame):
+        if self.columnas is None:
+            self.columnas = list(df_lote.columns)
+        tabla = pa.Table.from_pandas(tipar_consolidado(df_lote.reindex(columns=self.columnas)),
+                                     preserve_index=False)
+        if self.escritor is None:
+            self.esquema = self._esquema_comun(tabla.schema)
+            self.escritor = pq.ParquetWriter(self.archivo, self.esquema)
+        self.escritor.write_table(tabla.cast(self.esquema))
+        self.registros += len(df_lote)
+    
+    @staticmethod
+    def _esquema_comun(esquema):
+        """
+        El tamaño del índice de cada diccionario depende de las categorías del lote y
+        una columna vacía se infiere como nula: se fijan tipos que sirvan para todos
+        """
+        campos = []
+        for campo in esquema:
+            if pa.types.is_dictionary(campo.type):
+                campo = campo.with_type(pa.dictionary(pa.int32(), campo.type.value_type, campo.type.ordered))
+            elif pa.types.is_null(campo.type):
+                campo = campo.with_type(pa.string())
+            campos.append(campo)
+        return pa.schema(campos, metadata=esquema.metadata)
+    
+    def cerrar(self):
+        if self.escritor is None:
+            return
+        self.escritor.add_key_value_metadata({CLAVE_METADATOS_PARQUET: json.dumps({
+            'version_esquema': VERSION_ESQUEMA,
+            'version_parser': VERSION_PARSER,
+            'version_reglas': self.version_reglas,
+            'generado': pd.Timestamp.now().isoformat(timespec='seconds'),
+            'registros': self.registros,
+        }).encode('utf-8')})
+        self.escritor.close()
+
+# ---------------------------------------------------------------------------
+# Procesamiento incremental
+# ---------------------------------------------------------------------------
+# El manifiesto guarda, por cada archivo fuente, el hash de su contenido y la
+# partición (DataFrame en pickle) que se extrajo de él. La versión del parser es la
+# huella del código de extracción (VERSION_PARSER, más abajo) y la de las reglas la
+# del archivo de reglas: un cambio en cualquiera de los dos invalida todo el manifiesto.
+ARCHIVO_MANIFIESTO = 'manifiesto_fuentes.json'
+DIRECTORIO_PARTICIONES = 'particiones'
+
+def _hash_archivo(ruta: str) -> str:
+    """SHA-256 del contenido de un archivo"""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+# ---------------------------------------------------------------------------
+# Caché en disco de componentes extraídos
+# ---------------------------------------------------------------------------
+# Entre corridas casi todos los títulos se repiten: sus componentes se guardan en un
+# SQLite junto a las salidas, cada uno con la versión (huella) de las reglas y el
+# código de los que depende (ver AgendaNormalizer.versiones_componentes).
+ARCHIVO_CACHE_COMPONENTES = 'cache_componentes.sqlite'
+COMPONENTES_AGENDA = ('doctor', 'area', 'tipo_turno')
+
+def _huella(*partes) -> str:
+    """Hash corto y estable de reglas/código, para versionar valores guardados"""
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()[:16]
+
+def _versiones_componentes(cascada_areas: _CascadaPrioridad) -> Dict[str, str]:
+    """Huella por componente (ver AgendaNormalizer.versiones_componentes) con la cascada de áreas dada"""
+    base = _huella(_REPARADOR_CODIFICACION.reemplazos,
+                   inspect.getsource(AgendaNormalizer.extraer_componentes_agenda),
+                   inspect.getsource(AgendaNormalizer.decodificar_caracteres_especiales),
+                   inspect.getsource(_ReparadorMojibake),
+                   inspect.getsource(AgendaNormalizer._coincide),
+                   inspect.getsource(_literales_requeridos),
+                   inspect.getsource(_requisitos_patron),
+                   inspect.getsource(_requisitos_cubiertos),
+                   inspect.getsource(_prefiltro_valido))
+    tipo_turno = _huella(base, _TIPOS_PATTERNS, inspect.getsource(AgendaNormalizer._extraer_area_y_tipo),
+                         [regex.pattern for regex in (_GENERAL_REGEX, _GENERAL_LEITES_REGEX,
+                                                      _GENERAL_CON_GUION_REGEX, _GENERAL_AL_INICIO_REGEX)])
+    area = _huella(tipo_turno, cascada_areas.nombres, [regex.pattern for regex in cascada_areas.regex],
+                   _COMITE_FAMILIAS_REGEX.pattern, inspect.getsource(_CascadaPrioridad))
+    doctor = _huella(base, inspect.getsource(AgendaNormalizer._extraer_doctor),
+                     inspect.getsource(_ReglaDoctor),
+                     [(regla.patron.pattern, regla.requeridos, regla.alternativos, regla.formato)
+                      for regla in _REGLAS_DOCTOR],
+                     [regex.pattern for regex in (_PALABRAS_EXCLUIR_REGEX, _UBICACION_EXACTA_REGEX,
+                                                  _SOLO_NUMERO_REGEX, _CONTIENE_UBICACION_REGEX,
+                                                  _SUFIJOS_DOCTOR_REGEX, _PREFIJO_DOCTOR_REGEX,
+                                                  _PREFIJO_LIC_REGEX, _CONSULTORIO_NUMERO_REGEX)],
+                     sorted(_PROCEDIMIENTOS_MEDICOS))
+    return {'doctor': doctor, 'area': area, 'tipo_turno': tipo_turno}
+
+class _CachePersistenteComponentes:
+    """
+    Tabla (título limpio, componente, versión) -> valor. Al abrirse carga en memoria
+    solo las filas de las versiones vigentes; los valores nuevos se acumulan y se
+    escriben en lote (guardar) para no hacer una transacción por título.
+    """
+    TAMANO_LOTE = 500
+    
+    def __init__(self, archivo: str, versiones: Dict[str, str]):
+        self.versiones = dict(versiones)
+        self._pendientes: List[Tuple[str, str, str, str]] = []
+        self._conexion = sqlite3.connect(archivo, timeout=30)
+        with self._conexion:
+            self._conexion.execute(
+                'CREATE TABLE IF NOT EXISTS componentes ('
+                'titulo TEXT NOT NULL, componente TEXT NOT NULL, version TEXT NOT NULL, valor TEXT NOT NULL, '
+                'PRIMARY KEY (titulo, componente, version)) WITHOUT ROWID')
+        self._valores: Dict[str, Dict[str, str]] = {}
+        for componente, version in self.versiones.items():
+            for titulo, valor in self._conexion.execute(
+                    'SELECT titulo, valor FROM componentes WHERE componente = ? AND version = ?', (componente, version)):
+                self._valores.setdefault(titulo, {})[componente] = valor
+    
+    def obtener(self, titulo: str) -> Dict[str, str]:
+        """Componentes guardados del título (puede faltar alguno o todos)"""
+        return dict(self._valores.get(titulo, ()))
+    
+    def agregar(self, titulo: str, componentes: Dict[str, str]):
+        """Registra los componentes que todavía no estaban guardados para la versión vigente"""
+        guardados = self._valores.setdefault(titulo, {})
+        for componente, version in self.versiones.items():
+            if componente not in guardados:
+                guardados[componente] = componentes[componente]
+                self._pendientes.append((titulo, componente, version, componentes[componente]))
+        if len(self._pendientes) >= self.TAMANO_LOTE:
+            self.guardar()
+    
+    def guardar(self):
+        """Escribe los valores pendientes en una sola transacción"""
+        if not self._pendientes:
+            return
+        with self._conexion:
+            self._conexion.executemany('INSERT OR REPLACE INTO componentes VALUES (?, ?, ?, ?)', self._pendientes)
+        self._pendientes.clear()
+    
+    def podar(self):
+        """Borra los valores de versiones que ya no son las vigentes"""
+        with self._conexion:
+            for componente, version in self.versiones.items():
+                self._conexion.execute('DELETE FROM componentes WHERE componente = ? AND version <> ?',
+                                       (componente, version))
+    
+    def cerrar(self):
+        self.guardar()
+        self._conexion.close()
+
+# ---------------------------------------------------------------------------
+# Grillas de celdas decodificadas
+# ---------------------------------------------------------------------------
+# Decodificar el XML de un .xlsx es lo más caro de la corrida y no depende de las
+# reglas: las celdas (A, B, C) de cada Excel se guardan en un archivo Arrow (IPC)
+# junto con el hash del Excel. Cada celda va como un tipo (uint8) y su texto, así
+# que se reconstruye con el mismo tipo de Python que devuelve _leer_filas_excel.
+# La versión del lector invalida las grillas si cambia la forma de leer las celdas,
+# los valores que se toman como faltantes o la cantidad de columnas leídas.
+DIRECTORIO_GRILLAS = 'grillas'
+VERSION_LECTOR = _huella(inspect.getsource(AgendaNormalizer._leer_filas_excel), inspect.getsource(_normalizar_celda),
+                         repr(sorted(_VALORES_NA_EXCEL)), _COLUMNAS_AGENDA)
+
+_CELDA_VACIA, _CELDA_TEXTO, _CELDA_ENTERO, _CELDA_REAL, _CELDA_BOOL, _CELDA_FECHA_HORA, _CELDA_HORA = range(7)
+_DECODIFICAR_CELDA = {
+    _CELDA_TEXTO: str,
+    _CELDA_ENTERO: int,
+    _CELDA_REAL: float,
+    _CELDA_BOOL: lambda texto: texto == 'True',
+    _CELDA_FECHA_HORA: datetime.datetime.fromisoformat,
+    _CELDA_HORA: datetime.time.fromisoformat,
+}
+
+def _codificar_celda(valor) -> Tuple[int, Optional[str]]:
+    """(tipo, texto) de una celda; ValueError si el tipo no se puede guardar"""
+    if valor is None:
+        return _CELDA_VACIA, None
+    if isinstance(valor, str):
+        return _CELDA_TEXTO, valor
+    if isinstance(valor, bool):
+        return _CELDA_BOOL, str(valor)
+    if isinstance(valor, int):
+        return _CELDA_ENTERO, str(valor)
+    if isinstance(valor, float):
+        return _CELDA_REAL, repr(valor)
+    if isinstance(valor, datetime.datetime):
+        return _CELDA_FECHA_HORA, valor.isoformat()
+    if isinstance(valor, datetime.time):
+        return _CELDA_HORA, valor.isoformat()
+    raise ValueError(f"tipo de celda no soportado: {type(valor).__name__}")
+
+def _archivo_grilla(directorio_grillas: str, archivo_excel: str) -> str:
+    nombre = os.path.basename(archivo_excel)
+    return os.path.join(directorio_grillas, hashlib.sha1(nombre.encode('utf-8')).hexdigest()[:16] + '.arrow')
+
+def _guardar_grilla(directorio_grillas: str, archivo_excel: str, hash_archivo: str, filas: List[Tuple]):
+    """Guarda las filas leídas de un Excel (si alguna celda no se puede guardar, no hace nada)"""
+    try:
+        columnas = {}
+        for posicion in range(_COLUMNAS_AGENDA):
+            tipos, textos = zip(*(_codificar_celda(fila[posicion]) for fila in filas)) if filas else ((), ())
+            columnas[f"tipo_{posicion}"] = pa.array(tipos, type=pa.uint8())
+            columnas[f"valor_{posicion}"] = pa.array(textos, type=pa.string())
+    except ValueError as e:
+        print(f"Grilla no guardada para {os.path.basename(archivo_excel)}: {e}")
+        return
+    tabla = pa.table(columnas).replace_schema_metadata({
+        'archivo': os.path.basename(archivo_excel), 'sha256': hash_archivo, 'version_lector': VERSION_LECTOR})
+    os.makedirs(directorio_grillas, exist_ok=True)
+    destino = _archivo_grilla(directorio_grillas, archivo_excel)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    with pa.OSFile(temporal, 'wb') as salida, pa.ipc.new_file(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    os.replace(temporal, destino)
+
+def _leer_grilla_guardada(directorio_grillas: str, archivo_excel: str, hash_archivo: str) -> Optional[List[Tuple]]:
+    """Filas guardadas de un Excel si la grilla corresponde a su contenido actual (si no, None)"""
+    origen = _archivo_grilla(directorio_grillas, archivo_excel)
+    if not os.path.exists(origen):
+        return None
+    try:
+        with pa.memory_map(origen) as entrada:
+            tabla = pa.ipc.open_file(entrada).read_all()
+    except (OSError, pa.ArrowInvalid) as e:
+        print(f"Advertencia: grilla ilegible para {os.path.basename(archivo_excel)} ({e}); se lee el Excel")
+        return None
+    metadatos = tabla.schema.metadata or {}
+    if (metadatos.get(b'sha256') != hash_archivo.encode('utf-8') or
+            metadatos.get(b'version_lector') != VERSION_LECTOR.encode('utf-8')):
+        return None
+    
+    columnas = []
+    for posicion in range(_COLUMNAS_AGENDA):
+        tipos = tabla.column(f"tipo_{posicion}").to_numpy()
+        valores = tabla.column(f"valor_{posicion}").to_numpy(zero_copy_only=False)
+        # Los textos quedan como están; solo se convierten las celdas de otros tipos
+        for indice in np.flatnonzero(tipos > _CELDA_TEXTO):
+            valores[indice] = _DECODIFICAR_CELDA[tipos[indice]](valores[indice])
+        columnas.append(valores.tolist())
+    return list(zip(*columnas))
+
+def _podar_grillas(directorio_grillas: str, nombres_vigentes: Iterable[str]):
+    """Borra las grillas de archivos que ya no están en el directorio de agendas"""
+    if not os.path.isdir(directorio_grillas):
+        return
+    vigentes = {os.path.basename(_archivo_grilla(directorio_grillas, nombre)) for nombre in nombres_vigentes}
+    for archivo in os.listdir(directorio_grillas):
+        if archivo.endswith('.arrow') and archivo not in vigentes:
+            os.remove(os.path.join(directorio_grillas, archivo))
+
+# Versión del parser para el manifiesto de particiones: huella del código y las tablas
+# que deciden lo que se extrae de cada fuente (lectura de celdas, clasificación de
+# filas, armado de registros, HCSI, odontológico, Hospital Materno y componentes).
+# Las reglas externas se versionan aparte; editar el CLI, los reportes o la
+# exportación no invalida las particiones.
+_CODIGO_PARSER = (
+    AgendaNormalizer.obtener_componentes_agenda, AgendaNormalizer._componentes_con_cache_persistente,
+    AgendaNormalizer.decodificar_columna, AgendaNormalizer._leer_hoja_agenda, AgendaNormalizer._leer_grilla,
+    AgendaNormalizer.procesar_archivo_excel, AgendaNormalizer._clasificar_filas,
+    AgendaNormalizer._construir_registros_fragmentados, AgendaNormalizer._construir_registros,
+    AgendaNormalizer._hora_desde_celda, AgendaNormalizer._listar_fuentes,
+    AgendaNormalizer.iterar_fuente, AgendaNormalizer._bloques_fuente, AgendaNormalizer._procesar_archivo_hcsi_csv,
+    AgendaNormalizer.iterar_bloques_hcsi, AgendaNormalizer._normalizar_bloque_hcsi,
+    AgendaNormalizer._inferir_efector, AgendaNormalizer.asignar_ventanilla_hospital_materno,
+    AgendaNormalizer.limpiar_texto, AgendaNormalizer.limpiar_columna,
+    AgendaNormalizer._procesar_formato_odontologico, AgendaNormalizer._formatear_hora,
+    AgendaNormalizer._postprocesar_hospital_materno, _ReglasAgendas, _mapear_valores_unicos,
+    _codificar_celda, _leer_grilla_guardada,
+)
+VERSION_PARSER = _huella(VERSION_LECTOR, _versiones_componentes(_CascadaPrioridad([])),
+                         [inspect.getsource(codigo) for codigo in _CODIGO_PARSER],
+                         _DIAS_NORMALIZADOS, _DIAS_HCSI, sorted(_COLUMNAS_HCSI), _TIPOS_TURNO_HCSI,
+                         _REPARADOR_LIMPIEZA.reemplazos,
+                         [regex.pattern for regex in (_DIAS_SEMANA_REGEX, _HORA_REGEX, _VERONICA_REGEX)])
+
+class _ParticionIncremental:
+    """
+    Partición de una fuente que se escribe bloque a bloque (un pickle por bloque) en un
+    archivo temporal. confirmar la deja en su lugar y devuelve la entrada del manifiesto;
+    descartar borra el temporal si la fuente no se terminó de procesar.
+    """
+    
+    def __init__(self, directorio_manifiesto: str, nombre: str):
+        os.makedirs(os.path.join(directorio_manifiesto, DIRECTORIO_PARTICIONES), exist_ok=True)
+        self.particion = os.path.join(DIRECTORIO_PARTICIONES,
+                                      hashlib.sha1(nombre.encode('utf-8')).hexdigest()[:16] + '.pkl')
+        self.archivo = os.path.join(directorio_manifiesto, self.particion)
+        self.temporal = self.archivo + '.tmp'
+        self._salida = open(self.temporal, 'wb')
+        self.registros = 0
+    
+    def escribir(self, df_bloque: pd.DataFrame):
+        pickle.dump(df_bloque, self._salida, protocol=pickle.HIGHEST_PROTOCOL)
+        self.registros += len(df_bloque)
+    
+    def confirmar(self, tipo: str, efector: str, hash_archivo: str) -> Dict:
+        self._salida.close()
+        os.replace(self.temporal, self.archivo)
+        return {
+            'sha256': hash_archivo,
+            'tipo': tipo,
+            'efector': efector,
+            'registros': self.registros,
+            'particion': self.particion,
+        }
+    
+    def descartar(self):
+        self._salida.close()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+def _bloques_particion(archivo, primero: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    """Bloques de una partición abierta (ver _leer_particion); cierra el archivo al terminar"""
+    with archivo:
+        yield primero
+        while True:
+            try:
+                yield pickle.load(archivo)
+            except EOFError:
+                return
+
+def _procesar_fuente_en_proceso(tarea: Tuple[str, str, str, Dict]) -> Tuple[pd.DataFrame, Dict[str, int], Dict]:
+    """
+    Procesa una fuente dentro de un proceso de trabajo (ProcessPoolExecutor).
+    Debe ser una función de módulo para poder enviarse al proceso hijo.
+    Devuelve el DataFrame extraído, las estadísticas de la caché de componentes y la
+    instrumentación (tiempos/memoria) del archivo.
+    """
+    tipo, ruta, efector, configuracion = tarea
+    normalizador = AgendaNormalizer(**configuracion)
+    df = normalizador.procesar_fuente(tipo, ruta, efector)
+    return df, normalizador.estadisticas_cache, normalizador.instrumentacion
+
+# Filas mínimas por fragmento al cortar una hoja: con menos, arrancar procesos cuesta
+# más que lo que se gana
+FILAS_MINIMAS_FRAGMENTO = 2000
+
+def _fragmentos_hoja(es_titulo: np.ndarray, procesos: int,
+                     filas_minimas: int = FILAS_MINIMAS_FRAGMENTO) -> List[Tuple[int, int]]:
+    """
+    Corta la hoja en hasta `procesos` rangos de filas [inicio, fin) de tamaño parecido.
+    Cada corte cae en una fila de título, así ninguna agenda queda repartida entre dos
+    fragmentos. Devuelve un solo rango si la hoja es demasiado chica para cortarla.
+    """
+    total = len(es_titulo)
+    procesos = min(procesos, total // max(filas_minimas, 1))
+    if procesos < 2:
+        return [(0, total)]
+    posiciones_titulo = np.flatnonzero(es_titulo)
+    cortes = []
+    for k in range(1, procesos):
+        # Primer título en o después de la fila objetivo
+        indice = np.searchsorted(posiciones_titulo, k * total // procesos)
+        if indice < len(posiciones_titulo):
+            cortes.append(int(posiciones_titulo[indice]))
+    limites = [0] + sorted(set(corte for corte in cortes if 0 < corte < total)) + [total]
+    return list(zip(limites[:-1], limites[1:]))
+
+# Normalizador de cada proceso de trabajo de fragmentos: se crea una vez por proceso
+# (reglas, cachés y caché en disco) y se reutiliza para todos sus fragmentos
+_NORMALIZADOR_PROCESO: Optional['AgendaNormalizer'] = None
+
+def _iniciar_proceso_fragmentos(configuracion: Dict):
+    """Inicializador del ProcessPoolExecutor de fragmentos"""
+    global _NORMALIZADOR_PROCESO
+    _NORMALIZADOR_PROCESO = AgendaNormalizer(**configuracion)
+    _NORMALIZADOR_PROCESO._abrir_cache_persistente()
+
+def _construir_fragmento_en_proceso(tarea: Tuple) -> Tuple[pd.DataFrame, Dict[str, int], Dict]:
+    """
+    Construye los registros de un fragmento de hoja con el normalizador del proceso.
+    Igual que _procesar_fuente_en_proceso devuelve también las estadísticas de la caché
+    y la instrumentación, pero solo las de este fragmento (la caché de componentes se
+    conserva entre fragmentos).
+    """
+    hoja, es_titulo, es_horario, efector, formato_hora, agenda_id_al_final, requiere_ambas_horas, primer_numero = tarea
+    normalizador = _NORMALIZADOR_PROCESO
+    normalizador.estadisticas_cache = dict.fromkeys(normalizador.estadisticas_cache, 0)
+    normalizador.reiniciar_instrumentacion()
+    try:
+        df = normalizador._construir_registros(hoja, es_titulo, es_horario, efector,
+                                               getattr(normalizador, formato_hora), agenda_id_al_final,
+                                               requiere_ambas_horas, primer_numero)
+    finally:
+        if normalizador._cache_persistente is not None:
+            normalizador._cache_persistente.guardar()
+    return df, normalizador.estadisticas_cache, normalizador.instrumentacion
+
 # Función principal para uso fácil
-def main():
-    """Función principal para ejecutar el procesamiento"""
-    # Configurar rutas
+def _crear_parser_argumentos() -> argparse.ArgumentParser:
+    """Opciones de línea de comandos de agendas.py"""
     directorio_actual = os.path.dirname(os.path.abspath(__file__))
-    directorio_agendas = os.path.join(directorio_actual, "datos", "excel_originales", "agendas_originales")
-    archivo_salida = os.path.join(directorio_actual, "datos", "csv_procesado", "agendas_consolidadas.csv")
+    parser = argparse.ArgumentParser(description="Normaliza y consolida las agendas médicas de los efectores")
+    parser.add_argument('--entrada', '--input', dest='entrada',
+                        default=os.path.join(directorio_actual, "datos", "excel_originales", "agendas_originales"),
+                        help="Directorio con los Excel de agendas (el CSV del HCSI se busca en el directorio padre)")
+    parser.add_argument('--salida', '--output', dest='salida',
+                        default=os.path.join(directorio_actual, "datos", "csv_procesado"),
+                        help="Directorio donde se escriben los archivos consolidados y el manifiesto")
+    parser.add_argument('--solo', '--only', dest='solo', action='append', metavar='EFECTOR',
+                        help="Procesa solo este efector (se puede repetir). La salida lleva el efector en el nombre")
+    parser.add_argument('--formatos', '--formats', dest='formatos', default=','.join(FORMATOS_SALIDA),
+                        help="Formatos de salida separados por coma: csv,xlsx,parquet")
+    parser.add_argument('--sin-reporte', '--skip-report', dest='sin_reporte', action='store_true',
+                        help="No imprime el reporte estadístico al final")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Cantidad de procesos para leer archivos en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--procesos-por-archivo', type=int, default=1,
+                        help="Procesos para una hoja grande, cortada en los títulos de agenda (0 = todos los núcleos)")
+    parser.add_argument('--filas-minimas-fragmento', type=int, default=None,
+                        help=f"Filas mínimas de cada fragmento de hoja (por defecto {FILAS_MINIMAS_FRAGMENTO})")
+    parser.add_argument('--perfil', '--profile', dest='perfil', action='store_true',
+                        help="Ejecuta bajo cProfile e imprime las funciones más costosas")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Mide la memoria pico por archivo y por etapa con tracemalloc (más lento)")
+    parser.add_argument('--telemetria-patrones', action='store_true',
+                        help="Cuenta coincidencias y tiempo por patrón de extracción y los exporta a CSV "
+                             "(reprocesa todas las fuentes)")
+    parser.add_argument('--completo', action='store_true',
+                        help="Ignora el manifiesto y las cachés en disco y reprocesa todas las fuentes")
+    parser.add_argument('--sin-cache-persistente', action='store_true',
+                        help="No usa la caché en disco de componentes extraídos")
+    parser.add_argument('--sin-cache-grillas', action='store_true',
+                        help="Lee siempre los Excel en lugar de las grillas de celdas guardadas")
+    parser.add_argument('--bloque-hcsi', type=int, default=None,
+                        help="Lee el CSV del HCSI en bloques de N filas para acotar la memoria")
+    parser.add_argument('--excel-por-efector', action='store_true',
+                        help="Genera el Excel con una hoja por efector")
+    parser.add_argument('--vigilar', '--watch', dest='vigilar', action='store_true',
+                        help="Queda corriendo y reprocesa cuando cambian las fuentes o las reglas")
+    parser.add_argument('--intervalo', type=float, default=5.0,
+                        help="Con --vigilar, segundos entre revisiones de las fuentes")
+    parser.add_argument('--espera', type=float, default=10.0,
+                        help="Con --vigilar, segundos sin cambios antes de procesar")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Exporta CSV/Parquet fuente por fuente sin armar el consolidado en memoria "
+                             "(sin Excel ni reporte estadístico)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """
+    Función principal para ejecutar el procesamiento.
+    Devuelve True si la corrida (o, en modo vigilancia, la última corrida) fue exitosa
+    """
+    parser = _crear_parser_argumentos()
+    args = parser.parse_args(argv)
+    
+    formatos = [formato.strip().lower() for formato in args.formatos.split(',') if formato.strip()]
+    desconocidos = sorted(set(formatos) - set(FORMATOS_SALIDA))
+    if desconocidos:
+        parser.error(f"formatos no soportados: {', '.join(desconocidos)} (opciones: {', '.join(FORMATOS_SALIDA)})")
+    args.formatos = formatos
+    
+    if args.vigilar:
+        return _vigilar(args)
+    if not args.perfil:
+        return _ejecutar(args)
+    
+    import cProfile
+    import pstats
+    perfilador = cProfile.Profile()
+    resultado = perfilador.runcall(_ejecutar, args)
+    print("\n=== PERFIL DE EJECUCIÓN (30 funciones con más tiempo acumulado) ===")
+    pstats.Stats(perfilador).sort_stats('cumulative').print_stats(30)
+    return resultado
+
+def _ejecutar(args: argparse.Namespace) -> bool:
+    """
+    Corre las etapas pedidas por línea de comandos: procesar, exportar y reportar.
+    Devuelve False si no se pudo procesar (falta el directorio o alguna fuente falló)
+    """
+    # Configurar rutas
+    directorio_agendas = args.entrada
+    directorio_salida = args.salida
+    nombre_salida = "agendas_consolidadas"
+    if args.solo:
+        nombre_salida += "_" + "_".join(re.sub(r'\W+', '_', efector.strip()).strip('_') for efector in args.solo)
     
     # Verificar que existe el directorio de agendas
     if not os.path.exists(directorio_agendas):
         print(f"Error: No se encontró el directorio {directorio_agendas}")
-        return
+        return False
+    os.makedirs(directorio_salida, exist_ok=True)
     
     # Crear instancia del normalizador
-    normalizador = AgendaNormalizer()
+    # La telemetría mide los patrones: con la caché en disco casi no se ejecutarían
+    archivo_cache = os.path.join(directorio_salida, ARCHIVO_CACHE_COMPONENTES)
+    if args.completo and os.path.exists(archivo_cache):
+        os.remove(archivo_cache)
+    usar_cache = not (args.sin_cache_persistente or args.telemetria_patrones)
+    directorio_grillas = os.path.join(directorio_salida, DIRECTORIO_GRILLAS)
+    if args.completo and os.path.isdir(directorio_grillas):
+        shutil.rmtree(directorio_grillas)
+    normalizador = AgendaNormalizer(tamano_bloque_hcsi=args.bloque_hcsi, medir_memoria=args.memoria,
+                                    telemetria_patrones=args.telemetria_patrones,
+                                    archivo_cache_persistente=archivo_cache if usar_cache else None,
+                                    procesos_por_archivo=args.procesos_por_archivo,
+                                    directorio_grillas=None if args.sin_cache_grillas else directorio_grillas,
+                                    filas_minimas_fragmento=args.filas_minimas_fragmento)
     
     # Procesar archivos
     print("Iniciando procesamiento de agendas...")
     print(f"Procesando archivos desde: {directorio_agendas}")
-    df_consolidado = normalizador.procesar_directorio(directorio_agendas)
+    # Las particiones reutilizadas no pasan por los patrones: la telemetría necesita reprocesar todo
+    if args.completo or args.telemetria_patrones:
+        archivo_manifiesto = os.path.join(directorio_salida, ARCHIVO_MANIFIESTO)
+        if os.path.exists(archivo_manifiesto):
+            os.remove(archivo_manifiesto)
     
-    if not df_consolidado.empty:
-        # Exportar resultados
-        normalizador.exportar_consolidado(df_consolidado, archivo_salida)
-        
-        # Generar reporte
+    # Las salidas se escriben en un directorio temporal dentro de la salida y se publican
+    # al final con os.replace: quien las lea (el dashboard) nunca ve un archivo a medio escribir
+    directorio_temporal = tempfile.mkdtemp(prefix='.publicando_', dir=directorio_salida)
+    try:
+        if args.streaming:
+            exportado = _ejecutar_streaming(args, normalizador, directorio_agendas, directorio_salida,
+                                            directorio_temporal, nombre_salida)
+        else:
+            exportado = _ejecutar_consolidado(args, normalizador, directorio_agendas, directorio_salida,
+                                              directorio_temporal, nombre_salida)
+        fallidas = [nombre for nombre, medicion in normalizador.instrumentacion['archivos'].items()
+                    if 'error' in medicion]
+        if exportado:
+            publicados = _publicar_salidas(directorio_temporal, directorio_salida)
+            print(f"Salidas publicadas en {directorio_salida}: {', '.join(publicados)}")
+            if fallidas:
+                print(f"\nProcesamiento completado con errores en: {', '.join(fallidas)}")
+            else:
+                print("\n¡Procesamiento completado exitosamente!")
+        else:
+            print("No se encontraron archivos para procesar o no se pudo extraer información.")
+    finally:
+        shutil.rmtree(directorio_temporal, ignore_errors=True)
+    return not fallidas
+
+def _limpiar_publicaciones_pendientes(directorio_salida: str):
+    """Borra los directorios temporales .publicando_* que dejó una corrida interrumpida"""
+    if not os.path.isdir(directorio_salida):
+        return
+    for nombre in os.listdir(directorio_salida):
+        ruta = os.path.join(directorio_salida, nombre)
+        if nombre.startswith('.publicando_') and os.path.isdir(ruta):
+            print(f"Borrando salidas sin publicar de una corrida anterior: {nombre}")
+            shutil.rmtree(ruta, ignore_errors=True)
+
+def _rutas_salida(directorio: str, nombre_salida: str) -> Dict[str, str]:
+    """Archivos de una corrida, con el sufijo de --solo que lleve nombre_salida"""
+    def ruta(prefijo: str, extension: str) -> str:
+        return os.path.join(directorio, nombre_salida.replace('agendas_consolidadas', prefijo) + extension)
+    return {
+        'consolidado': ruta('agendas_consolidadas', '.csv'),
+        'reporte': ruta('reporte_ejecucion', '.json'),
+        'mapa_ids': ruta('mapa_agenda_ids', '.csv'),
+        'telemetria': ruta('telemetria_patrones', '.csv'),
+    }
+
+def _parametros_corrida(args: argparse.Namespace) -> Dict:
+    return {'jobs': args.jobs, 'formatos': args.formatos, 'solo': args.solo, 'memoria': args.memoria,
+            'streaming': args.streaming}
+
+def _ejecutar_consolidado(args: argparse.Namespace, normalizador: 'AgendaNormalizer', directorio_agendas: str,
+                          directorio_salida: str, directorio_temporal: str, nombre_salida: str) -> bool:
+    """Procesa el directorio completo y escribe las salidas en directorio_temporal"""
+    rutas = _rutas_salida(directorio_temporal, nombre_salida)
+    df_consolidado = normalizador.procesar_directorio(directorio_agendas, jobs=args.jobs,
+                                                      directorio_manifiesto=directorio_salida,
+                                                      efectores=args.solo)
+    if df_consolidado.empty:
+        return False
+    
+    # Exportar resultados
+    normalizador.exportar_consolidado(df_consolidado, rutas['consolidado'], hojas_por_efector=args.excel_por_efector,
+                                      formatos=args.formatos)
+    normalizador.exportar_mapa_ids(df_consolidado, rutas['mapa_ids'])
+    
+    # Reporte de la corrida (tiempos y memoria) junto a las salidas
+    normalizador.exportar_reporte_ejecucion(rutas['reporte'], df_consolidado, _parametros_corrida(args))
+    
+    if args.telemetria_patrones:
+        normalizador.exportar_telemetria_patrones(rutas['telemetria'])
+    
+    # Generar reporte
+    if not args.sin_reporte:
         normalizador.generar_reporte(df_consolidado)
-        
-        print("\n¡Procesamiento completado exitosamente!")
-    else:
-        print("No se encontraron archivos para procesar o no se pudo extraer información.")
+    return True
+
+def _ejecutar_streaming(args: argparse.Namespace, normalizador: 'AgendaNormalizer', directorio_agendas: str,
+                        directorio_salida: str, directorio_temporal: str, nombre_salida: str) -> bool:
+    """Variante de _ejecutar_consolidado que exporta lote a lote con iter_batches"""
+    rutas = _rutas_salida(directorio_temporal, nombre_salida)
+    lotes = normalizador.iter_batches(directorio_agendas, jobs=args.jobs, directorio_manifiesto=directorio_salida,
+                                      efectores=args.solo)
+    registros_por_efector = normalizador.exportar_lotes(lotes, rutas['consolidado'], formatos=args.formatos,
+                                                        archivo_mapa_ids=rutas['mapa_ids'])
+    if not registros_por_efector:
+        return False
+    
+    normalizador.exportar_reporte_ejecucion(rutas['reporte'], None, _parametros_corrida(args), registros_por_efector)
+    if args.telemetria_patrones:
+        normalizador.exportar_telemetria_patrones(rutas['telemetria'])
+    if not args.sin_reporte:
+        print("\nRegistros por efector:")
+        for efector, cantidad in sorted(registros_por_efector.items(), key=lambda item: -item[1]):
+            print(f"  {efector}: {cantidad}")
+        normalizador._imprimir_instrumentacion()
+    return True
+
+def _publicar_salidas(directorio_temporal: str, directorio_salida: str) -> List[str]:
+    """
+    Mueve las salidas generadas a su lugar definitivo. os.replace es atómico dentro del
+    mismo sistema de archivos (por eso el temporal está dentro de la salida): cada archivo
+    se ve completo, el anterior o el nuevo. El Parquet va último para que no quede más
+    nuevo que un CSV todavía sin publicar (el dashboard elige el más reciente).
+    """
+    nombres = sorted(os.listdir(directorio_temporal), key=lambda nombre: (nombre.endswith('.parquet'), nombre))
+    for nombre in nombres:
+        os.replace(os.path.join(directorio_temporal, nombre), os.path.join(directorio_salida, nombre))
+    return nombres
+
+# ---------------------------------------------------------------------------
+# Modo vigilancia
+# ---------------------------------------------------------------------------
+# Revisa cada cierto intervalo (polling, sin dependencias) la fecha y el tamaño de las
+# fuentes y del archivo de reglas. Ante un cambio espera a que los archivos dejen de
+# cambiar (una copia o un guardado en curso) y vuelve a correr el procesamiento: el
+# manifiesto hace que solo se reprocesen las fuentes que cambiaron.
+
+def _firma_fuentes(directorio_agendas: str, archivo_reglas: str = ARCHIVO_REGLAS) -> Dict[str, Tuple[int, int]]:
+    """(mtime, tamaño) de cada fuente de agendas y del archivo de reglas"""
+    rutas = [os.path.join(os.path.dirname(directorio_agendas), "Agendas HCSI.csv"), archivo_reglas]
+    if os.path.isdir(directorio_agendas):
+        # ~$ son los archivos de bloqueo que deja Excel mientras un libro está abierto
+        rutas += [os.path.join(directorio_agendas, archivo) for archivo in os.listdir(directorio_agendas)
+                  if archivo.endswith(('.xlsx', '.xls')) and not archivo.startswith('~$')]
+    firma = {}
+    for ruta in rutas:
+        try:
+            estado = os.stat(ruta)
+        except FileNotFoundError:
+            continue
+        firma[os.path.basename(ruta)] = (estado.st_mtime_ns, estado.st_size)
+    return firma
+
+def _describir_cambios(anterior: Dict[str, Tuple[int, int]], actual: Dict[str, Tuple[int, int]]) -> List[str]:
+    cambios = [f"+ {nombre}" for nombre in sorted(actual.keys() - anterior.keys())]
+    cambios += [f"- {nombre}" for nombre in sorted(anterior.keys() - actual.keys())]
+    cambios += [f"~ {nombre}" for nombre in sorted(actual.keys() & anterior.keys())
+                if actual[nombre] != anterior[nombre]]
+    return cambios
+
+def _vigilar(args: argparse.Namespace):
+    """
+    Procesa al iniciar y cada vez que cambian las fuentes, hasta Ctrl+C.
+    Si una corrida falla se reintenta en el intervalo siguiente aunque no haya cambios.
+    Devuelve True si la última corrida fue exitosa (o si no llegó a correr ninguna).
+    """
+    print(f"Vigilando {args.entrada} (cada {args.intervalo:g} s, espera {args.espera:g} s tras un cambio). "
+          f"Ctrl+C para terminar.")
+    _limpiar_publicaciones_pendientes(args.salida)
+    firma = None  # fuentes de la última corrida exitosa
+    intentada = None  # fuentes de la última corrida, exitosa o no
+    try:
+        while True:
+            actual = _firma_fuentes(args.entrada)
+            if actual != intentada and intentada is not None:
+                # Esperar a que las fuentes dejen de cambiar antes de procesar
+                while True:
+                    time.sleep(args.espera)
+                    estable = _firma_fuentes(args.entrada)
+                    if estable == actual:
+                        break
+                    actual = estable
+                print(f"\n[{time.strftime('%H:%M:%S')}] Cambios en las fuentes: "
+                      f"{', '.join(_describir_cambios(intentada, actual))}")
+            elif actual != firma and intentada is not None:
+                print(f"\n[{time.strftime('%H:%M:%S')}] Reintentando tras el error de la corrida anterior")
+            if actual != firma:
+                try:
+                    exitosa = _ejecutar(args)
+                except Exception as e:
+                    # Un archivo dañado no debe detener la vigilancia
+                    print(f"Error en el procesamiento: {e}")
+                    exitosa = False
+                intentada = actual
+                if exitosa:
+                    firma = actual
+                    # --completo solo tiene sentido en la primera corrida
+                    args.completo = False
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("\nVigilancia terminada")
+    return firma == intentada
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Código de salida para tareas programadas: 1 si la corrida falló
+    sys.exit(0 if main() else 1)
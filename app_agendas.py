@@ -6,6 +6,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import datetime
 import os
+from agendas import agregar_minutos_del_dia, compactar_consolidado, memoria_por_columna
 
 # Configuración de la página
 st.set_page_config(
@@ -18,57 +19,93 @@ st.set_page_config(
 st.title("Agendas salud")
 st.markdown("### Dashboard interactivo para visualización de horarios")
 
+ARCHIVO_CSV = "datos/csv_procesado/agendas_consolidadas.csv"
+ARCHIVO_PARQUET = "datos/csv_procesado/agendas_consolidadas.parquet"
+
+def leer_parquet_consolidado(archivo):
+    """
+    Lee el Parquet tipado del ETL y lo deja con la misma forma que la lectura del CSV:
+    NaN donde el CSV tenía celdas vacías y minutos como float. Las categorías se
+    conservan (solo se quita la categoría vacía)
+    """
+    df = pd.read_parquet(archivo)
+    for columna in df.columns:
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            if '' in serie.cat.categories:
+                df[columna] = serie.cat.remove_categories([''])
+        elif pd.api.types.is_string_dtype(serie):
+            df[columna] = serie.mask(serie == '')
+        elif pd.api.types.is_integer_dtype(serie):
+            df[columna] = serie.astype('float64')
+    return df
+
+def rellenar_vacios(serie, valor):
+    """fillna que también sirve para columnas categóricas (agrega la categoría si falta)"""
+    if isinstance(serie.dtype, pd.CategoricalDtype) and valor not in serie.cat.categories:
+        serie = serie.cat.add_categories([valor])
+    return serie.fillna(valor)
+
+def firma_archivos_datos():
+    """Fecha de modificación del CSV y del Parquet: cambia cuando el ETL publica datos nuevos"""
+    return tuple(os.path.getmtime(archivo) if os.path.exists(archivo) else None
+                 for archivo in (ARCHIVO_CSV, ARCHIVO_PARQUET))
+
 @st.cache_data
-def cargar_datos():
-    """Carga los datos de agendas consolidadas"""
+def cargar_datos(firma_archivos=None):
+    """
+    Carga los datos de agendas consolidadas (Parquet si está al día, si no CSV).
+    firma_archivos solo forma parte de la clave de la caché: al publicarse datos nuevos
+    (por ejemplo con agendas.py --vigilar) la próxima recarga los vuelve a leer.
+    Devuelve también la memoria por columna del DataFrame cargado (memoria_por_columna),
+    calculada una sola vez junto con los datos
+    """
     try:
-        df = pd.read_csv("datos/csv_procesado/agendas_consolidadas.csv")
+        df = None
+        if (os.path.exists(ARCHIVO_PARQUET) and
+                (not os.path.exists(ARCHIVO_CSV) or os.path.getmtime(ARCHIVO_PARQUET) >= os.path.getmtime(ARCHIVO_CSV))):
+            try:
+                df = leer_parquet_consolidado(ARCHIVO_PARQUET)
+            except Exception:
+                df = None
+        if df is None:
+            df = pd.read_csv(ARCHIVO_CSV)
+        
+        # Categorías y texto Arrow en lugar de un objeto por celda: la copia de cada
+        # sesión (st.cache_data) y los df.copy() de cada recarga ocupan mucho menos
+        df = compactar_consolidado(df)
         
         # Limpiar datos
-        df['doctor'] = df['doctor'].fillna('Sin asignar')
-        df['area'] = df['area'].fillna('Sin área')
-        df['tipo_turno'] = df['tipo_turno'].fillna('No especificado')
-        df['ventanilla'] = df['ventanilla'].fillna('')  # Nueva columna Ventanilla
+        df['doctor'] = rellenar_vacios(df['doctor'], 'Sin asignar')
+        df['area'] = rellenar_vacios(df['area'], 'Sin área')
+        df['tipo_turno'] = rellenar_vacios(df['tipo_turno'], 'No especificado')
+        df['ventanilla'] = rellenar_vacios(df['ventanilla'], '')  # Nueva columna Ventanilla
         
-        # Convertir horas a datetime para mejor manejo
-        df['hora_inicio_dt'] = pd.to_datetime(df['hora_inicio'], format='%H:%M', errors='coerce').dt.time
-        df['hora_fin_dt'] = pd.to_datetime(df['hora_fin'], format='%H:%M', errors='coerce').dt.time
+        # Horas como minutos del día (calculadas en el ETL; si el CSV es anterior, se calculan acá)
+        if 'minuto_inicio' not in df.columns:
+            df = agregar_minutos_del_dia(df)
         
-        return df
+        return df, memoria_por_columna(df)
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
 
 def calcular_horas_medico(df_doctor):
     """Calcula las horas semanales totales de un médico"""
     try:
-        total_horas = 0
+        # Diferencia en minutos (las horas ilegibles quedan como NaN y no suman)
+        diferencia = df_doctor['minuto_fin'] - df_doctor['minuto_inicio']
         
-        for _, row in df_doctor.iterrows():
-            try:
-                # Convertir horarios a datetime
-                inicio = pd.to_datetime(row['hora_inicio'], format='%H:%M')
-                fin = pd.to_datetime(row['hora_fin'], format='%H:%M')
-                
-                # Calcular diferencia en horas
-                diferencia = fin - inicio
-                horas = diferencia.total_seconds() / 3600
-                
-                # Solo sumar si es un valor válido y positivo
-                if horas > 0:
-                    total_horas += horas
-                    
-            except (ValueError, TypeError):
-                # Si hay error en la conversión, saltar este registro
-                continue
+        # Solo sumar si es un valor válido y positivo
+        total_horas = diferencia[diferencia > 0].sum() / 60
         
-        return round(total_horas, 2)
+        return round(float(total_horas), 2)
     
     except Exception as e:
         return 0
 
 # Cargar datos
-df = cargar_datos()
+df, memoria_columnas = cargar_datos(firma_archivos_datos())
 
 if df.empty:
     st.error("No se pudieron cargar los datos. Verifica que existe el archivo datos/csv_procesado/agendas_consolidadas.csv")
@@ -116,6 +153,25 @@ ventanilla_seleccionada = st.sidebar.selectbox(
     ventanillas_disponibles
 )
 
+# Memoria de los datos cargados: lo que ocupa cada columna compactada y lo que
+# ocuparía como objetos de Python (CSV leído sin compactar)
+with st.sidebar.expander("Memoria de los datos"):
+    total_kib = int(memoria_columnas['kib'].sum())
+    total_objetos_kib = int(memoria_columnas['kib_objetos'].sum())
+    st.metric(
+        label="Memoria total",
+        value=f"{total_kib / 1024:,.1f} MiB",
+        delta=f"{(total_kib - total_objetos_kib) / 1024:,.1f} MiB vs. objetos",
+        delta_color="inverse"
+    )
+    st.dataframe(
+        memoria_columnas.sort_values('kib', ascending=False).rename(columns={
+            'columna': 'Columna', 'tipo': 'Tipo', 'kib': 'KiB', 'kib_objetos': 'KiB como objetos'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
 # Aplicar filtros
 df_filtrado = df.copy()
 
@@ -139,7 +195,7 @@ col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     # Contar agendas únicas (combinación de nombre_original_agenda + efector)
-    total_agendas_unicas = df_filtrado.groupby(['nombre_original_agenda', 'efector']).ngroups
+    total_agendas_unicas = df_filtrado.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups
     total_registros = len(df_filtrado)
     st.metric(
         label="Total de agendas",
@@ -183,7 +239,7 @@ with tab1:
         # Gráfico de agendas únicas por área médica
         df_areas = df_filtrado[df_filtrado['area'] != 'Sin área']
         if not df_areas.empty:
-            areas_count_series = df_areas.groupby('area').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups).sort_values(ascending=False).head(10)
+            areas_count_series = df_areas.groupby('area', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups).sort_values(ascending=False).head(10)
             
             fig_areas = px.bar(
                 x=areas_count_series.values,
@@ -202,7 +258,7 @@ with tab1:
     with col2:
         # Gráfico de agendas únicas por día de la semana
         if not df_filtrado.empty:
-            dias_count = df_filtrado.groupby('dia').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups)
+            dias_count = df_filtrado.groupby('dia', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups)
             
             fig_dias = px.pie(
                 values=dias_count.values,
@@ -217,7 +273,7 @@ with tab1:
     
     # Gráfico de agendas únicas por efector
     if not df_filtrado.empty:
-        efectores_count = df_filtrado.groupby('efector').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups)
+        efectores_count = df_filtrado.groupby('efector', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups)
         
         fig_efectores = px.bar(
             x=efectores_count.index,
@@ -261,17 +317,17 @@ with tab2:
             if 'hora_inicio' in df_dia.columns:
                 # Crear bins de horas
                 df_dia_copy = df_dia.copy()
-                df_dia_copy['hora_inicio_num'] = pd.to_datetime(df_dia_copy['hora_inicio'], format='%H:%M', errors='coerce').dt.hour
+                df_dia_copy['hora_inicio_num'] = df_dia_copy['minuto_inicio'] // 60
                 
                 if dia_analisis == 'TODOS':
                     # Para TODOS los días, agrupar por día y hora
-                    heatmap_data = df_dia_copy.groupby(['dia', 'hora_inicio_num']).size().reset_index(name='count')
+                    heatmap_data = df_dia_copy.groupby(['dia', 'hora_inicio_num'], observed=True).size().reset_index(name='count')
                     titulo_heatmap = "Intensidad de agendas - Todos los días"
                     y_label = 'Día'
                     y_column = 'dia'
                 else:
                     # Para un día específico, agrupar por efector y hora
-                    heatmap_data = df_dia_copy.groupby(['efector', 'hora_inicio_num']).size().reset_index(name='count')
+                    heatmap_data = df_dia_copy.groupby(['efector', 'hora_inicio_num'], observed=True).size().reset_index(name='count')
                     titulo_heatmap = f"Intensidad de agendas - {dia_analisis}"
                     y_label = 'Centro de salud'
                     y_column = 'efector'
@@ -292,7 +348,7 @@ with tab2:
             # Top médicos del día/todos los días (agendas únicas)
             df_medicos_dia = df_dia[df_dia['doctor'] != 'Sin asignar']
             if not df_medicos_dia.empty:
-                medicos_dia = df_medicos_dia.groupby('doctor').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups).sort_values(ascending=False).head(10)
+                medicos_dia = df_medicos_dia.groupby('doctor', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups).sort_values(ascending=False).head(10)
 
                 titulo_medicos = f"Top médicos - {dia_analisis}" if dia_analisis != 'TODOS' else "Top médicos - Todos los días"
                 fig_medicos = px.bar(
@@ -351,7 +407,7 @@ with tab3:
         
         with col1:
             # Contar agendas únicas del médico
-            agendas_unicas_doctor = df_doctor.groupby(['nombre_original_agenda', 'efector']).ngroups
+            agendas_unicas_doctor = df_doctor.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups
             st.metric("Total de agendas", agendas_unicas_doctor)
         
         with col2:
@@ -405,7 +461,7 @@ with tab3:
                     """)
         
         # Horarios del doctor por día (tabla existente)
-        horarios_doctor = df_doctor.groupby('dia').agg({
+        horarios_doctor = df_doctor.groupby('dia', observed=True).agg({
             'hora_inicio': lambda x: ', '.join(sorted(set(x.astype(str)))),
             'hora_fin': lambda x: ', '.join(sorted(set(x.astype(str)))),
             'efector': lambda x: ', '.join(set(x)),
@@ -424,15 +480,15 @@ with tab4:
     
     # Comparativa de métricas por efector
     def contar_agendas_unicas_por_efector(x):
-        return x.groupby(['nombre_original_agenda', 'efector']).ngroups
+        return x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups
     
-    metricas_efector = df_filtrado.groupby('efector').agg({
+    metricas_efector = df_filtrado.groupby('efector', observed=True).agg({
         'doctor': lambda x: x[x != 'Sin asignar'].nunique(),
         'area': lambda x: x.nunique()
     })
     
     # Calcular agendas únicas por separado
-    agendas_por_efector = df_filtrado.groupby('efector').apply(contar_agendas_unicas_por_efector)
+    agendas_por_efector = df_filtrado.groupby('efector', observed=True).apply(contar_agendas_unicas_por_efector)
     metricas_efector['Total agendas'] = agendas_por_efector
     
     metricas_efector = metricas_efector.rename(columns={
@@ -586,7 +642,7 @@ with tab5:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        agendas_mostradas = df_mostrar.groupby(['nombre_original_agenda', 'efector']).ngroups
+        agendas_mostradas = df_mostrar.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups
         st.metric("Agendas mostradas", agendas_mostradas, delta=f"{len(df_mostrar)} horarios")
     
     with col2:
@@ -612,7 +668,7 @@ with tab5:
             if 'doctor' in df_mostrar.columns:
                 df_medicos_vista = df_mostrar[df_mostrar['doctor'] != 'Sin asignar']
                 if not df_medicos_vista.empty:
-                    top_doctores = df_medicos_vista.groupby('doctor').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups).sort_values(ascending=False).head(5)
+                    top_doctores = df_medicos_vista.groupby('doctor', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups).sort_values(ascending=False).head(5)
                     if not top_doctores.empty:
                         st.write("**Top 5 médicos:**")
                         for i, (doctor, count) in enumerate(top_doctores.items(), 1):
@@ -627,7 +683,7 @@ with tab5:
             if 'area' in df_mostrar.columns:
                 df_areas_vista = df_mostrar[df_mostrar['area'] != 'Sin área']
                 if not df_areas_vista.empty:
-                    top_areas = df_areas_vista.groupby('area').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups).sort_values(ascending=False).head(5)
+                    top_areas = df_areas_vista.groupby('area', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups).sort_values(ascending=False).head(5)
                     if not top_areas.empty:
                         st.write("**Top 5 especialidades:**")
                         for i, (area, count) in enumerate(top_areas.items(), 1):
@@ -680,7 +736,7 @@ with tab6:
         
         with col1:
             # Contar agendas únicas en el calendario
-            total_agendas_calendario = df_calendario.groupby(['nombre_original_agenda', 'efector']).ngroups
+            total_agendas_calendario = df_calendario.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups
             total_horarios_calendario = len(df_calendario)
             st.metric("Total agendas", total_agendas_calendario, delta=f"{total_horarios_calendario} horarios")
         
@@ -779,10 +835,8 @@ with tab6:
         
         # Preparar datos para el timeline
         df_timeline = df_calendario.copy()
-        df_timeline['hora_inicio_num'] = pd.to_datetime(df_timeline['hora_inicio'], format='%H:%M', errors='coerce').dt.hour + \
-                                       pd.to_datetime(df_timeline['hora_inicio'], format='%H:%M', errors='coerce').dt.minute / 60
-        df_timeline['hora_fin_num'] = pd.to_datetime(df_timeline['hora_fin'], format='%H:%M', errors='coerce').dt.hour + \
-                                    pd.to_datetime(df_timeline['hora_fin'], format='%H:%M', errors='coerce').dt.minute / 60
+        df_timeline['hora_inicio_num'] = df_timeline['minuto_inicio'] / 60
+        df_timeline['hora_fin_num'] = df_timeline['minuto_fin'] / 60
         
         # Crear gráfico Gantt-style
         fig_timeline = go.Figure()
@@ -840,7 +894,7 @@ with tab6:
         st.subheader("Resumen por médico")
         
         if not df_calendario.empty:
-            resumen_doctores = df_calendario.groupby('doctor').agg({
+            resumen_doctores = df_calendario.groupby('doctor', observed=True).agg({
                 'dia': lambda x: ', '.join(sorted(set(x))),
                 'hora_inicio': lambda x: f"{min(x)} - {max(x)}",
                 'tipo_turno': lambda x: ', '.join(set(x.dropna()))
@@ -851,7 +905,7 @@ with tab6:
             })
             
             # Contar agendas únicas por médico
-            resumen_doctores['Total agendas'] = df_calendario.groupby('doctor').apply(lambda x: x.groupby(['nombre_original_agenda', 'efector']).ngroups)
+            resumen_doctores['Total agendas'] = df_calendario.groupby('doctor', observed=True).apply(lambda x: x.groupby(['nombre_original_agenda', 'efector'], observed=True).ngroups)
             
             st.dataframe(resumen_doctores, use_container_width=True)
         else:
@@ -977,27 +1031,25 @@ with tab7:
             """Detecta médicos con horarios superpuestos"""
             superposiciones = []
             
+            # Sin horas legibles no hay superposición que comparar (y pd.NA no se puede evaluar como bool)
+            df_analisis = df_analisis.dropna(subset=['minuto_inicio', 'minuto_fin'])
+
             # Agrupar por médico
-            medicos_horarios = df_analisis[df_analisis['doctor'] != 'Sin asignar'].groupby('doctor')
+            medicos_horarios = df_analisis[df_analisis['doctor'] != 'Sin asignar'].groupby('doctor', observed=True)
             
             for medico, datos_medico in medicos_horarios:
-                # Convertir horas a formato datetime para comparación
-                datos_medico = datos_medico.copy()
-                datos_medico['hora_inicio_dt'] = pd.to_datetime(datos_medico['hora_inicio'], format='%H:%M', errors='coerce')
-                datos_medico['hora_fin_dt'] = pd.to_datetime(datos_medico['hora_fin'], format='%H:%M', errors='coerce')
-                
                 # Agrupar por día
-                dias_medico = datos_medico.groupby('dia')
+                dias_medico = datos_medico.groupby('dia', observed=True)
                 
                 for dia, horarios_dia in dias_medico:
-                    horarios_dia = horarios_dia.sort_values('hora_inicio_dt')
+                    horarios_dia = horarios_dia.sort_values('minuto_inicio')
                     
                     # Comparar horarios del mismo día
                     for i, (idx1, row1) in enumerate(horarios_dia.iterrows()):
                         for idx2, row2 in horarios_dia.iloc[i+1:].iterrows():
                             # Verificar superposición
-                            if (row1['hora_inicio_dt'] < row2['hora_fin_dt'] and 
-                                row1['hora_fin_dt'] > row2['hora_inicio_dt']):
+                            if (row1['minuto_inicio'] < row2['minuto_fin'] and 
+                                row1['minuto_fin'] > row2['minuto_inicio']):
                                 
                                 superposiciones.append({
                                     'medico': medico,
@@ -1072,7 +1124,7 @@ with tab7:
             
             # Resumen por médico
             st.subheader("Resumen de conflictos por médico")
-            resumen_conflictos = df_superposiciones.groupby('medico').agg({
+            resumen_conflictos = df_superposiciones.groupby('medico', observed=True).agg({
                 'dia': lambda x: ', '.join(sorted(set(x))),
                 'tipo_conflicto': lambda x: ', '.join(set(x))
             }).rename(columns={
@@ -1082,7 +1134,7 @@ with tab7:
             resumen_conflictos['Total conflictos'] = df_superposiciones['medico'].value_counts()
             
             # Agregar información de tipos de agenda para cada médico con conflictos
-            tipos_agenda_por_medico = df_gerencial[df_gerencial['doctor'].isin(df_superposiciones['medico'].unique())].groupby('doctor')['tipo_turno'].apply(lambda x: ', '.join(sorted(set(x)))).to_dict()
+            tipos_agenda_por_medico = df_gerencial[df_gerencial['doctor'].isin(df_superposiciones['medico'].unique())].groupby('doctor', observed=True)['tipo_turno'].apply(lambda x: ', '.join(sorted(set(x)))).to_dict()
             resumen_conflictos['Tipos de agenda'] = resumen_conflictos.index.map(tipos_agenda_por_medico)
             
             st.dataframe(resumen_conflictos, use_container_width=True)
@@ -1140,7 +1192,7 @@ with tab8:
         st.subheader("Análisis de agendas duplicadas")
         
         # Encontrar agendas con el mismo nombre pero diferentes IDs
-        nombre_counts = df_filtrado.groupby(['nombre_original_agenda', 'efector']).agg({
+        nombre_counts = df_filtrado.groupby(['nombre_original_agenda', 'efector'], observed=True).agg({
             'agenda_id': 'nunique'
         }).reset_index()
         
@@ -1170,7 +1222,7 @@ with tab8:
                 df_duplicado = df_filtrado[
                     (df_filtrado['nombre_original_agenda'] == nombre_agenda) & 
                     (df_filtrado['efector'] == efector)
-                ].groupby(['agenda_id', 'dia']).agg({
+                ].groupby(['agenda_id', 'dia'], observed=True).agg({
                     'hora_inicio': 'first',
                     'hora_fin': 'first',
                     'doctor': 'first',
@@ -1196,7 +1248,7 @@ with tab8:
         # Análisis por centro
         st.subheader("Análisis por centro de salud")
         
-        resumen_centros = df_filtrado.groupby('efector').agg({
+        resumen_centros = df_filtrado.groupby('efector', observed=True).agg({
             'agenda_id': 'nunique',
             'nombre_original_agenda': 'nunique'
         }).reset_index()
@@ -1295,7 +1347,7 @@ with tab9:
         # Análisis por efector
         st.subheader(f"Distribución por centro de salud")
         
-        resumen_efector = df_sin_asignar.groupby('efector').agg({
+        resumen_efector = df_sin_asignar.groupby('efector', observed=True).agg({
             'nombre_original_agenda': 'nunique',
             campo_seleccionado: 'count'
         }).reset_index()
@@ -1488,9 +1540,9 @@ with tab10:
             }
             
             # Función para verificar si un horario está fuera del horario de ventanilla
-            def es_horario_fuera_ventanilla(hora_inicio_str, hora_fin_str, ventanilla):
+            def es_horario_fuera_ventanilla(minuto_inicio, minuto_fin, ventanilla):
                 try:
-                    if pd.isna(hora_inicio_str) or pd.isna(hora_fin_str) or not ventanilla in horarios_ventanilla:
+                    if pd.isna(minuto_inicio) or pd.isna(minuto_fin) or not ventanilla in horarios_ventanilla:
                         return False
                     
                     # Obtener horarios específicos de la ventanilla
@@ -1498,8 +1550,8 @@ with tab10:
                     hora_fin_ventanilla = horarios_ventanilla[ventanilla]['fin']
                     
                     # Convertir horas a números
-                    inicio = pd.to_datetime(hora_inicio_str, format='%H:%M').hour + pd.to_datetime(hora_inicio_str, format='%H:%M').minute / 60
-                    fin = pd.to_datetime(hora_fin_str, format='%H:%M').hour + pd.to_datetime(hora_fin_str, format='%H:%M').minute / 60
+                    inicio = minuto_inicio / 60
+                    fin = minuto_fin / 60
                     
                     # Verificar si está fuera del horario de ventanilla
                     return inicio < hora_inicio_ventanilla or fin > hora_fin_ventanilla
@@ -1577,7 +1629,7 @@ with tab10:
                     # Aplicar función de verificación específica para esta ventanilla
                     df_ventanilla_con_horarios = df_ventanilla_con_horarios.copy()
                     df_ventanilla_con_horarios['horario_fuera_ventanilla'] = df_ventanilla_con_horarios.apply(
-                        lambda row: es_horario_fuera_ventanilla(row['hora_inicio'], row['hora_fin'], ventanilla), axis=1
+                        lambda row: es_horario_fuera_ventanilla(row['minuto_inicio'], row['minuto_fin'], ventanilla), axis=1
                     )
                     
                     # Filtrar agendas fuera de horario de ventanilla
@@ -1614,15 +1666,17 @@ with tab10:
                         st.warning(f"Se encontraron {total_fuera_horario} horarios fuera del horario de {ventanilla} ({int(hora_inicio_ventanilla)}:00 - {hora_fin_display})")
                         
                         # Tabla detallada - cada horario como una fila separada
-                        tabla_fuera_horario = df_fuera_horario_ventanilla[['nombre_original_agenda', 'doctor', 'dia', 'hora_inicio', 'hora_fin', 'tipo_turno', 'efector']].copy()
+                        tabla_fuera_horario = df_fuera_horario_ventanilla[['nombre_original_agenda', 'doctor', 'dia', 'hora_inicio', 'hora_fin', 'tipo_turno', 'efector', 'minuto_inicio', 'minuto_fin']].copy()
                         tabla_fuera_horario = tabla_fuera_horario.sort_values(['nombre_original_agenda', 'dia', 'hora_inicio'])
                         
                         # Agregar columna de observaciones específicas para cada horario
                         def generar_observacion_horario(row):
                             observaciones = []
                             try:
-                                inicio = pd.to_datetime(row['hora_inicio'], format='%H:%M').hour + pd.to_datetime(row['hora_inicio'], format='%H:%M').minute / 60
-                                fin = pd.to_datetime(row['hora_fin'], format='%H:%M').hour + pd.to_datetime(row['hora_fin'], format='%H:%M').minute / 60
+                                if pd.isna(row['minuto_inicio']) or pd.isna(row['minuto_fin']):
+                                    raise ValueError("hora ilegible")
+                                inicio = row['minuto_inicio'] / 60
+                                fin = row['minuto_fin'] / 60
                                 
                                 if inicio < hora_inicio_ventanilla:
                                     observaciones.append(f"Inicia antes de {int(hora_inicio_ventanilla)}:00")
@@ -1635,6 +1689,7 @@ with tab10:
                             return " | ".join(observaciones)
                         
                         tabla_fuera_horario['observaciones'] = tabla_fuera_horario.apply(generar_observacion_horario, axis=1)
+                        tabla_fuera_horario = tabla_fuera_horario.drop(columns=['minuto_inicio', 'minuto_fin'])
                         
                         # Renombrar columnas para mejor visualización
                         tabla_fuera_horario_display = tabla_fuera_horario.rename(columns={
@@ -1715,7 +1770,7 @@ with tab10:
             
             # Mostrar agendas sin asignar (más relevante que áreas)
             st.markdown("**Agendas sin ventanilla asignada:**")
-            agendas_sin_ventanilla = df_sin_ventanilla.groupby('nombre_original_agenda').size().reset_index()
+            agendas_sin_ventanilla = df_sin_ventanilla.groupby('nombre_original_agenda', observed=True).size().reset_index()
             agendas_sin_ventanilla.columns = ['Agenda', 'Registros']
             agendas_sin_ventanilla = agendas_sin_ventanilla.sort_values('Registros', ascending=False)
             
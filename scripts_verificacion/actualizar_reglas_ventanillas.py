@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Actualiza las ventanillas del Hospital Materno en datos/reglas/reglas_agendas.json
+a partir de datos/ventanillas/ventanillas_materno.xlsx.
+
+En el Excel cada columna es una ventanilla (encabezado) con sus áreas debajo. Las
+áreas nuevas se agregan a la ventanilla correspondiente; las que ya estaban en las
+reglas se conservan (incluye correcciones hechas a mano, como ADOLESCENCIA).
+Si hubo cambios se sube la versión de las reglas.
+
+Uso:
+    python actualizar_reglas_ventanillas.py            # muestra los cambios
+    python actualizar_reglas_ventanillas.py --guardar  # además los escribe
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ARCHIVO_REGLAS = os.path.join(script_dir, '..', 'datos', 'reglas', 'reglas_agendas.json')
+ARCHIVO_VENTANILLAS = os.path.join(script_dir, '..', 'datos', 'ventanillas', 'ventanillas_materno.xlsx')
+
+
+def ventanillas_desde_excel(archivo_excel: str) -> dict:
+    """{ventanilla: [áreas]} leído del Excel (encabezado = ventanilla)"""
+    df = pd.read_excel(archivo_excel)
+    ventanillas = {}
+    for columna in df.columns:
+        nombre = str(columna).strip().upper()
+        ventanillas[nombre] = [str(area).strip().upper() for area in df[columna].dropna() if str(area).strip()]
+    return ventanillas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza las ventanillas del Materno con el Excel")
+    parser.add_argument('--guardar', action='store_true', help="Escribe los cambios en el archivo de reglas")
+    args = parser.parse_args()
+
+    with open(ARCHIVO_REGLAS, 'r', encoding='utf-8') as f:
+        reglas = json.load(f)
+
+    grupos = {grupo['ventanilla']: grupo for grupo in reglas['ventanillas_materno']}
+    cambios = []
+    for ventanilla, areas in ventanillas_desde_excel(ARCHIVO_VENTANILLAS).items():
+        grupo = grupos.get(ventanilla)
+        if grupo is None:
+            grupo = {'ventanilla': ventanilla, 'areas': []}
+            reglas['ventanillas_materno'].append(grupo)
+            grupos[ventanilla] = grupo
+            cambios.append(f"nueva ventanilla {ventanilla}")
+        for area in areas:
+            if area not in grupo['areas']:
+                grupo['areas'].append(area)
+                cambios.append(f"{ventanilla}: + {area}")
+
+    if not cambios:
+        print("✅ Las reglas ya contienen todas las áreas del Excel de ventanillas")
+        return
+
+    print(f"🔍 {len(cambios)} cambios respecto del Excel de ventanillas:")
+    for cambio in cambios:
+        print(f"   {cambio}")
+
+    if args.guardar:
+        reglas['version'] += 1
+        with open(ARCHIVO_REGLAS, 'w', encoding='utf-8') as f:
+            json.dump(reglas, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"✅ Reglas guardadas (versión {reglas['version']})")
+    else:
+        print("Use --guardar para escribirlos en el archivo de reglas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark repetible del normalizador sobre las agendas sintéticas (1x, 10x, 100x).
+
+Por cada escala genera los archivos si no existen (generar_agendas_sinteticas.py),
+procesa el directorio varias veces y se queda con el mejor tiempo de cada etapa.
+Después hace una corrida adicional con tracemalloc para la memoria pico por etapa
+(se mide aparte porque tracemalloc distorsiona los tiempos).
+
+Reporta segundos, filas por segundo y memoria pico (KiB) por etapa.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))
+
+from agendas import AgendaNormalizer  # noqa: E402
+from generar_agendas_sinteticas import generar_escala  # noqa: E402
+
+
+def ejecutar_corrida(directorio_agendas: str, medir_memoria: bool, jobs: int, procesos_por_archivo: int = 1):
+    """Procesa y exporta una vez; devuelve (registros, segundos totales, instrumentación)"""
+    normalizador = AgendaNormalizer(medir_memoria=medir_memoria, procesos_por_archivo=procesos_por_archivo)
+    inicio = time.perf_counter()
+    df = normalizador.procesar_directorio(directorio_agendas, jobs=jobs)
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        normalizador.exportar_consolidado(df, os.path.join(directorio_temporal, 'agendas_consolidadas.csv'))
+    return len(df), time.perf_counter() - inicio, normalizador.instrumentacion
+
+
+def medir_escala(directorio_agendas: str, repeticiones: int, jobs: int, procesos_por_archivo: int = 1) -> dict:
+    """Mejor tiempo por etapa en varias repeticiones y memoria pico de una corrida aparte"""
+    mejores_etapas = {}
+    mejor_total = None
+    registros = 0
+    for _ in range(repeticiones):
+        registros, total, instrumentacion = ejecutar_corrida(directorio_agendas, False, jobs, procesos_por_archivo)
+        mejor_total = total if mejor_total is None else min(mejor_total, total)
+        for etapa, segundos in instrumentacion['etapas'].items():
+            mejores_etapas[etapa] = min(mejores_etapas.get(etapa, segundos), segundos)
+
+    _, _, instrumentacion_memoria = ejecutar_corrida(directorio_agendas, True, jobs, procesos_por_archivo)
+
+    return {
+        'registros': registros,
+        'segundos_total': round(mejor_total, 4),
+        'filas_por_segundo_total': round(registros / mejor_total) if mejor_total else None,
+        'memoria_pico_kib': instrumentacion_memoria['memoria_pico_kib'],
+        'etapas': {
+            etapa: {
+                'segundos': round(segundos, 4),
+                'filas_por_segundo': round(registros / segundos) if segundos else None,
+                'memoria_pico_kib': instrumentacion_memoria['memoria_etapas_kib'].get(etapa),
+            }
+            for etapa, segundos in mejores_etapas.items()
+        },
+    }
+
+
+def imprimir_resultado(escala: int, resultado: dict):
+    print(f"\n📊 Escala {escala}x: {resultado['registros']} registros en {resultado['segundos_total']:.3f} s "
+          f"({resultado['filas_por_segundo_total']} filas/s), memoria pico {resultado['memoria_pico_kib']} KiB")
+    print(f"{'etapa':<22}{'seg':>9}{'filas/s':>12}{'memoria KiB':>13}")
+    for etapa, medicion in resultado['etapas'].items():
+        filas_por_segundo = medicion['filas_por_segundo']
+        memoria = medicion['memoria_pico_kib']
+        print(f"{etapa:<22}{medicion['segundos']:>9.3f}{'-' if filas_por_segundo is None else filas_por_segundo:>12}"
+              f"{'-' if memoria is None else memoria:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del normalizador con agendas sintéticas")
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10, 100],
+                        help="Factores de escala a medir (por defecto 1 10 100)")
+    parser.add_argument('--datos', default=os.path.join(script_dir, '..', 'datos', 'sinteticos'),
+                        help="Directorio con las carpetas escala_N (se generan si faltan)")
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help="Corridas por escala; se toma el mejor tiempo de cada etapa")
+    parser.add_argument('--jobs', type=int, default=1, help="Procesos para procesar_directorio")
+    parser.add_argument('--procesos-por-archivo', type=int, default=1,
+                        help="Procesos para cada hoja grande, cortada en los títulos de agenda")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--json', help="Guarda los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    resultados = {}
+    for escala in args.escalas:
+        directorio_agendas = os.path.join(args.datos, f"escala_{escala}", 'agendas_originales')
+        if not os.path.isdir(directorio_agendas):
+            print(f"🛠️  Generando agendas sintéticas escala {escala}x...")
+            generar_escala(args.datos, escala, args.semilla)
+
+        print(f"⏱️  Midiendo escala {escala}x ({args.repeticiones} repeticiones)...")
+        resultados[escala] = medir_escala(directorio_agendas, args.repeticiones, args.jobs,
+                                         args.procesos_por_archivo)
+
+    for escala, resultado in resultados.items():
+        imprimir_resultado(escala, resultado)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compara dos consolidados de agendas (CSV o Parquet) agenda por agenda.
+
+Las agendas se emparejan por agenda_uid, que no cambia cuando se agregan o quitan
+otras agendas del mismo efector (agenda_id sí, porque es un contador). Si un
+consolidado es anterior a agenda_uid, se calcula a partir de sus propias columnas.
+
+Informa agendas nuevas, eliminadas y modificadas (datos de la agenda u horarios).
+
+Uso:
+    python comparar_consolidados.py anterior.csv actual.csv
+    python comparar_consolidados.py anterior.parquet actual.parquet --salida diferencias.csv
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))
+
+from agendas import agregar_agenda_uid  # noqa: E402
+
+CAMPOS_AGENDA = ['efector', 'nombre_original_agenda', 'doctor', 'area', 'tipo_turno', 'ventanilla']
+CAMPOS_HORARIO = ['dia', 'hora_inicio', 'hora_fin']
+
+
+def cargar_consolidado(archivo: str) -> pd.DataFrame:
+    """Consolidado como texto, con agenda_uid (calculado si el archivo no lo tiene)"""
+    if archivo.endswith('.parquet'):
+        df = pd.read_parquet(archivo)
+        df = df.astype(object).where(df.notna(), '').astype(str)
+    else:
+        df = pd.read_csv(archivo, keep_default_na=False, dtype=str)
+    if 'agenda_uid' not in df.columns:
+        print(f"   {os.path.basename(archivo)} no tiene agenda_uid: se calcula desde sus columnas")
+        df = agregar_agenda_uid(df)
+    return df
+
+
+def resumir_agendas(df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por agenda_uid con sus datos y sus horarios ordenados como texto"""
+    horarios = (df[CAMPOS_HORARIO].agg(' '.join, axis=1)
+                .groupby(df['agenda_uid']).agg(lambda franjas: ' | '.join(sorted(franjas))))
+    datos = df.drop_duplicates('agenda_uid').set_index('agenda_uid')[['agenda_id'] + CAMPOS_AGENDA]
+    return datos.assign(horarios=horarios)
+
+
+def comparar(anterior: pd.DataFrame, actual: pd.DataFrame) -> pd.DataFrame:
+    """Tabla de diferencias: agenda_uid, cambio (nueva/eliminada/modificada) y detalle"""
+    filas = []
+    for uid in actual.index.difference(anterior.index):
+        filas.append((uid, 'nueva', actual.at[uid, 'efector'], actual.at[uid, 'nombre_original_agenda'], ''))
+    for uid in anterior.index.difference(actual.index):
+        filas.append((uid, 'eliminada', anterior.at[uid, 'efector'], anterior.at[uid, 'nombre_original_agenda'], ''))
+    for uid in anterior.index.intersection(actual.index):
+        cambios = [f"{campo}: {anterior.at[uid, campo]!r} -> {actual.at[uid, campo]!r}"
+                   for campo in CAMPOS_AGENDA + ['horarios'] if anterior.at[uid, campo] != actual.at[uid, campo]]
+        if cambios:
+            filas.append((uid, 'modificada', actual.at[uid, 'efector'], actual.at[uid, 'nombre_original_agenda'],
+                          '; '.join(cambios)))
+    return pd.DataFrame(filas, columns=['agenda_uid', 'cambio', 'efector', 'nombre_original_agenda', 'detalle'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos consolidados de agendas por agenda_uid")
+    parser.add_argument('anterior', help="Consolidado anterior (CSV o Parquet)")
+    parser.add_argument('actual', help="Consolidado actual (CSV o Parquet)")
+    parser.add_argument('--salida', help="Guarda la tabla de diferencias en este CSV")
+    parser.add_argument('--detalle', type=int, default=20, help="Cantidad de diferencias a mostrar")
+    args = parser.parse_args()
+
+    print(f"🔍 Comparando {args.anterior} con {args.actual}")
+    anterior = resumir_agendas(cargar_consolidado(args.anterior))
+    actual = resumir_agendas(cargar_consolidado(args.actual))
+    diferencias = comparar(anterior, actual)
+
+    print(f"\n📊 Agendas: {len(anterior)} antes, {len(actual)} ahora")
+    for cambio in ['nueva', 'eliminada', 'modificada']:
+        print(f"   {cambio}s: {int((diferencias['cambio'] == cambio).sum())}")
+    renumeradas = anterior.index.intersection(actual.index)
+    renumeradas = int((anterior.loc[renumeradas, 'agenda_id'] != actual.loc[renumeradas, 'agenda_id']).sum())
+    print(f"   con otro agenda_id (mismo agenda_uid): {renumeradas}")
+
+    for fila in diferencias.head(args.detalle).itertuples(index=False):
+        print(f"   [{fila.cambio}] {fila.efector} - {fila.nombre_original_agenda}"
+              + (f": {fila.detalle}" if fila.detalle else ''))
+
+    if args.salida:
+        diferencias.to_csv(args.salida, index=False, encoding='utf-8')
+        print(f"\n✅ Diferencias guardadas en: {args.salida}")
+    elif diferencias.empty:
+        print("\n✅ Sin diferencias entre los consolidados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Verifica que una optimización del parser no cambie resultados.
+
+Compara el agendas.py actual con una versión de referencia tomada de git (por
+defecto el primer commit del repositorio, es decir el parser original):
+
+1. Por título: corre decodificar_caracteres_especiales y extraer_componentes_agenda
+   de ambas versiones sobre cada título único de los corpus y compara doctor, area,
+   tipo_turno y el texto decodificado. También mide cuánto tarda cada título.
+2. Por fila: procesa cada directorio completo con ambas versiones y compara el
+   consolidado (recorrido de filas, horarios, agenda_id, ventanillas).
+3. Con --procesos-por-archivo distinto de 1, el consolidado de la versión actual con
+   las hojas cortadas en fragmentos debe ser byte a byte el CSV de la corrida
+   secuencial.
+
+Los corpus por defecto son los datos reales y las agendas sintéticas que existan
+en datos/sinteticos/. Termina con código 1 si encuentra alguna diferencia.
+
+Uso:
+    python comparar_parser.py
+    python comparar_parser.py --referencia HEAD~3 --lentos 30
+    python comparar_parser.py --procesos-por-archivo 4 --filas-minimas-fragmento 200
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+directorio_repo = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, directorio_repo)
+
+import agendas  # noqa: E402
+
+CAMPOS_TITULO = ['doctor', 'area', 'tipo_turno', 'decodificado']
+
+
+def cargar_referencia(referencia: str, directorio_temporal: str):
+    """Importa agendas.py tal como estaba en el commit indicado"""
+    fuente = subprocess.run(['git', 'show', f"{referencia}:agendas.py"], cwd=directorio_repo,
+                            capture_output=True, text=True, encoding='utf-8', check=True).stdout
+    ruta = os.path.join(directorio_temporal, 'agendas_referencia.py')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(fuente)
+    spec = importlib.util.spec_from_file_location('agendas_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def primer_commit() -> str:
+    salida = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=directorio_repo,
+                            capture_output=True, text=True, check=True).stdout
+    return salida.split()[0]
+
+
+def csv_en_silencio(normalizador, directorio: str) -> str:
+    """procesar_directorio sin los mensajes de progreso, como texto CSV"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = normalizador.procesar_directorio(directorio)
+    return df.to_csv(index=False)
+
+
+def procesar_en_silencio(normalizador, directorio: str) -> pd.DataFrame:
+    """procesar_directorio sin los mensajes de progreso, normalizado como texto (vía CSV)"""
+    return pd.read_csv(io.StringIO(csv_en_silencio(normalizador, directorio)), keep_default_na=False, dtype=str)
+
+
+def comparar_fragmentado(directorio: str, procesos: int, filas_minimas: int = None) -> list:
+    """
+    Diferencias entre la corrida secuencial y la de hojas cortadas en fragmentos
+    (procesos_por_archivo) de la versión actual; el CSV tiene que ser idéntico
+    """
+    secuencial = csv_en_silencio(agendas.AgendaNormalizer(), directorio)
+    fragmentado = csv_en_silencio(agendas.AgendaNormalizer(procesos_por_archivo=procesos,
+                                                           filas_minimas_fragmento=filas_minimas), directorio)
+    if secuencial == fragmentado:
+        return []
+    return comparar_filas(pd.read_csv(io.StringIO(secuencial), keep_default_na=False, dtype=str),
+                          pd.read_csv(io.StringIO(fragmentado), keep_default_na=False, dtype=str)) or \
+        ["el CSV fragmentado no es idéntico byte a byte al secuencial"]
+
+
+def componentes_titulo(normalizador, titulo: str) -> dict:
+    """Mismo recorrido que sigue un título en el procesamiento de los Excel"""
+    componentes = normalizador.extraer_componentes_agenda(normalizador.limpiar_texto(titulo))
+    return {
+        'doctor': componentes['doctor'],
+        'area': normalizador.limpiar_texto(componentes['area']),
+        'tipo_turno': normalizador.limpiar_texto(componentes['tipo_turno']),
+        'decodificado': normalizador.decodificar_caracteres_especiales(titulo),
+    }
+
+
+def medir_titulo(normalizador, titulo: str, repeticiones: int):
+    """Componentes del título y el mejor tiempo (segundos) en varias repeticiones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = componentes_titulo(normalizador, titulo)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return resultado, mejor
+
+
+def comparar_filas(df_referencia: pd.DataFrame, df_actual: pd.DataFrame) -> list:
+    """Diferencias entre consolidados, sobre las columnas que existen en la referencia"""
+    faltantes = [columna for columna in df_referencia.columns if columna not in df_actual.columns]
+    if faltantes:
+        return [f"faltan columnas: {', '.join(faltantes)}"]
+    if len(df_referencia) != len(df_actual):
+        return [f"cantidad de filas distinta: {len(df_referencia)} vs {len(df_actual)}"]
+    diferencias = []
+    df_actual = df_actual[df_referencia.columns]
+    for columna in df_referencia.columns:
+        distintas = df_referencia[columna] != df_actual[columna]
+        for indice in distintas[distintas].index[:5]:
+            diferencias.append(f"fila {indice}, {columna}: {df_referencia.at[indice, columna]!r} -> "
+                               f"{df_actual.at[indice, columna]!r}")
+        if distintas.sum() > 5:
+            diferencias.append(f"... y {distintas.sum() - 5} filas más distintas en {columna}")
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el parser actual con una versión de referencia")
+    parser.add_argument('--referencia', help="Commit de git con el agendas.py de referencia "
+                                             "(por defecto el primer commit del repositorio)")
+    parser.add_argument('--directorios', nargs='+',
+                        help="Directorios de agendas a comparar (por defecto datos reales y sintéticos)")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones para medir cada título")
+    parser.add_argument('--lentos', type=int, default=15, help="Cantidad de títulos más lentos a mostrar")
+    parser.add_argument('--procesos-por-archivo', type=int, default=1,
+                        help="Compara además la corrida con hojas cortadas en fragmentos contra la secuencial")
+    parser.add_argument('--filas-minimas-fragmento', type=int, default=None,
+                        help="Filas mínimas por fragmento (por defecto la de agendas.py)")
+    args = parser.parse_args()
+
+    referencia = args.referencia or primer_commit()
+    directorios = args.directorios or (
+        [os.path.join(directorio_repo, 'datos', 'excel_originales', 'agendas_originales')] +
+        sorted(glob.glob(os.path.join(directorio_repo, 'datos', 'sinteticos', 'escala_*', 'agendas_originales')))
+    )
+
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        modulo_referencia = cargar_referencia(referencia, directorio_temporal)
+    normalizador_referencia = modulo_referencia.AgendaNormalizer()
+    normalizador_actual = agendas.AgendaNormalizer()
+    print(f"🔍 Comparando agendas.py actual con la versión {referencia[:10]}")
+
+    diferencias_filas = {}
+    titulos = set()
+    for directorio in directorios:
+        if not os.path.isdir(directorio):
+            print(f"❌ No existe el directorio: {directorio}")
+            sys.exit(1)
+        print(f"   Procesando {directorio}")
+        df_referencia = procesar_en_silencio(normalizador_referencia, directorio)
+        df_actual = procesar_en_silencio(normalizador_actual, directorio)
+        diferencias = comparar_filas(df_referencia, df_actual)
+        if diferencias:
+            diferencias_filas[directorio] = diferencias
+        if args.procesos_por_archivo != 1:
+            diferencias = comparar_fragmentado(directorio, args.procesos_por_archivo, args.filas_minimas_fragmento)
+            if diferencias:
+                diferencias_filas[f"{directorio} (fragmentado)"] = diferencias
+        # Los títulos del HCSI se arman desde columnas y no pasan por la extracción
+        for df in (df_referencia, df_actual):
+            titulos.update(df.loc[df['efector'] != 'HCSI', 'nombre_original_agenda'])
+
+    # Comparación y tiempos por título
+    divergencias = []
+    tiempos = []
+    for titulo in sorted(titulos):
+        resultado_referencia, segundos_referencia = medir_titulo(normalizador_referencia, titulo, args.repeticiones)
+        resultado_actual, segundos_actual = medir_titulo(normalizador_actual, titulo, args.repeticiones)
+        for campo in CAMPOS_TITULO:
+            if resultado_referencia[campo] != resultado_actual[campo]:
+                divergencias.append((titulo, campo, resultado_referencia[campo], resultado_actual[campo]))
+        tiempos.append((segundos_actual, segundos_referencia, titulo))
+
+    print(f"\n📊 Títulos únicos comparados: {len(titulos)}")
+    total_referencia = sum(t[1] for t in tiempos)
+    total_actual = sum(t[0] for t in tiempos)
+    print(f"   Tiempo total por título: referencia {total_referencia * 1000:.1f} ms, "
+          f"actual {total_actual * 1000:.1f} ms")
+
+    print(f"\n🐢 Títulos más lentos (versión actual):")
+    print(f"{'actual µs':>10}{'ref µs':>10}  título")
+    for segundos_actual, segundos_referencia, titulo in sorted(tiempos, reverse=True)[:args.lentos]:
+        print(f"{segundos_actual * 1e6:>10.0f}{segundos_referencia * 1e6:>10.0f}  {titulo}")
+
+    if divergencias:
+        print(f"\n❌ {len(divergencias)} diferencias por título:")
+        for titulo, campo, valor_referencia, valor_actual in divergencias:
+            print(f"   {titulo!r} [{campo}]: {valor_referencia!r} -> {valor_actual!r}")
+    for directorio, diferencias in diferencias_filas.items():
+        print(f"\n❌ Diferencias en el consolidado de {directorio}:")
+        for diferencia in diferencias:
+            print(f"   {diferencia}")
+
+    if divergencias or diferencias_filas:
+        sys.exit(1)
+    print("\n✅ Sin diferencias: el parser actual produce los mismos resultados que la referencia")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Genera agendas sintéticas con los mismos formatos que los archivos reales, para medir
+el rendimiento del normalizador a distintas escalas (1x, 10x, 100x).
+
+Por cada escala crea:
+    <salida>/escala_<N>/agendas_originales/*.xlsx   (formato general y Odontológico)
+    <salida>/escala_<N>/Agendas HCSI.csv            (formato tabular del HCSI)
+
+La escala 1x tiene aproximadamente el tamaño de los datos reales. Con la misma
+semilla se generan siempre los mismos archivos.
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import random
+
+import openpyxl
+
+# Efectores con el nombre de archivo que reconoce _inferir_efector
+EFECTORES = [
+    ('CAPS Barrio Obrero', 'Agendas activas CAPS Barrio Obrero.xlsx'),
+    ('CAPS Beccar', 'Agendas activas CAPS Beccar.xlsx'),
+    ('CAPS Diagonal Salta', 'Agendas activas CAPS Diagonal Salta.xlsx'),
+    ('CAPS La Ribera', 'Agendas activas CAPS La Ribera.xlsx'),
+    ('CAPS Martinez', 'Agendas activas CAPS Martinez.xlsx'),
+    ('CAPS San Isidro Labrador', 'Agendas activas CAPS San Isidro Labrador.xlsx'),
+    ('CAPS San Pantaleon', 'Agendas activas CAPS San Pantaleon.xlsx'),
+    ('CAPS Villa Adelina', 'Agendas activas CAPS Villa Adelina.xlsx'),
+    ('CAPS bajo Boulogne', 'Agendas activas CAPS bajo Boulogne.xlsx'),
+    ('Centro El Nido', 'Agendas activas Centro El Nido.xlsx'),
+    ('Hospital Boulogne', 'Agendas activas Hospital Boulogne.xlsx'),
+    ('Hospital Materno', 'Agendas Activas Hospital Materno.xlsx'),
+]
+ARCHIVO_ODONTOLOGICO = 'Agendas activas Hospital Odontologico.xlsx'
+
+# Agendas por archivo y filas del HCSI a escala 1x (similar a los datos reales)
+AGENDAS_POR_ARCHIVO = 55
+FILAS_HCSI = 800
+
+AREAS = [
+    'PEDIATRIA', 'ODONTOLOGIA', 'ODONTOLOGÍA', 'SALUD MENTAL', 'KINESIOLOGIA', 'CLINICA MEDICA',
+    'MEDICO CLINICO', 'PSICOLOGIA', 'PSICOLOGIA INFANTIL', 'CARDIOLOGIA', 'NUTRICION', 'GINECOLOGIA',
+    'GINECOLOGÍA', 'PSIQUIATRIA', 'OBSTETRICIA', 'ECOGRAFIA', 'MEDICINA FAMILIAR', 'TRAUMATOLOGÍA',
+    'ONCOLOGÍA', 'ENFERMERIA', 'RADIOLOGIA', 'DERMATOLOGIA', 'FONOAUDIOLOGIA', 'NEUROLOGIA',
+    'OTORRINOLARINGOLOGIA', 'OFTALMOLOGÍA', 'PSICOPEDAGOGIA', 'ODONTOLOGIA PEDIATRICA',
+    'GUARDIA CLINICA MEDICA ADULTOS', 'NUTRICION INFANTIL', 'DEGLUCION INFANTIL',
+]
+APELLIDOS = [
+    'PEREZ', 'GOMEZ', 'RODRIGUEZ', 'FERNANDEZ', 'LOPEZ', 'MARTINEZ', 'GARCIA', 'SANCHEZ', 'ROMERO',
+    'DI MARTINO', 'DE ANDRADE', 'BOSSI PONCE', 'MUÑOZ', 'IBAÑEZ', 'COLOMBO', 'VARELA', 'ORTIZ',
+]
+NOMBRES = [
+    'MARIA', 'LAURA', 'NICOLAS', 'VERÓNICA', 'ROMINA', 'AGUSTIN', 'CAROLINA', 'JULIETA', 'MARTÍN',
+    'DANIELA EUGENIA', 'ANA MARIA', 'EZEQUIEL', 'MA. NOELIA', 'INÉS',
+]
+PREFIJOS_PROFESIONAL = ['DR. ', 'DRA. ', 'DRA ', 'Dr. ', 'LIC. ', 'LIC ', '']
+SUFIJOS_TURNO = [
+    '', '', '', ' - PROGRAMADA', ' - ESPONTANEA', ' PROGRAMADA', ' - EVENTUAL ESPONTANEA',
+    ' - CAI', ' - A LA BREVEDAD', ' - SOBRETURNO', ' - TRATAMIENTO', ' - AGENDA BIS', ' - DIU',
+    ' - CONSULTORIO 3',
+]
+TITULOS_SIN_PROFESIONAL = [
+    'EVALUACIONES NIDO', 'PEDIATRIA - RESIDENTE', 'AGENDA RESIDENTES - CAI', '01. GUARDIA OBSTETRICIA',
+    'Agenda 16 Recien Nacido', 'RONDA SANITARIA', 'COMITE DE FAMILIAS', 'GENERAL',
+]
+DIAS = ['Lunes', 'Martes', 'Miercoles', 'Miércoles', 'Jueves', 'Viernes', 'Sabado', 'Sáb']
+DIAS_HCSI = ['Lun', 'Mar', 'Mie', 'Jue', 'Vie', 'Sab']
+TIPOS_TURNO_HCSI = ['Programado', 'Programado', 'Espontaneo', 'Guardia']
+
+
+def romper_codificacion(texto: str, aleatorio: random.Random, proporcion: float = 0.05) -> str:
+    """Algunos títulos llegan con la codificación rota (UTF-8 leído como Windows-1252)"""
+    if aleatorio.random() < proporcion:
+        return texto.encode('utf-8').decode('cp1252', errors='replace')
+    return texto
+
+
+def generar_titulo(aleatorio: random.Random) -> str:
+    """Título de agenda con los patrones de nombres de los archivos reales"""
+    if aleatorio.random() < 0.08:
+        titulo = aleatorio.choice(TITULOS_SIN_PROFESIONAL)
+    else:
+        profesional = (aleatorio.choice(PREFIJOS_PROFESIONAL) + aleatorio.choice(APELLIDOS) + ' ' +
+                       aleatorio.choice(NOMBRES))
+        separador = aleatorio.choice([' - ', ' - ', ' ', '-'])
+        titulo = aleatorio.choice(AREAS) + separador + profesional + aleatorio.choice(SUFIJOS_TURNO)
+    return romper_codificacion(titulo, aleatorio)
+
+
+def generar_horarios(aleatorio: random.Random):
+    """Entre 1 y 5 franjas (día, hora inicio, hora fin)"""
+    horarios = []
+    for _ in range(aleatorio.randint(1, 5)):
+        inicio = aleatorio.choice([7, 8, 8, 9, 12, 13, 14])
+        minutos = aleatorio.choice([0, 0, 30, 45])
+        fin = min(inicio + aleatorio.choice([2, 3, 4, 5, 6]), 23)
+        horarios.append((aleatorio.choice(DIAS), datetime.time(inicio, minutos), datetime.time(fin, 0)))
+    return horarios
+
+
+def escribir_excel_general(ruta: str, efector: str, cantidad_agendas: int, aleatorio: random.Random):
+    """Formato general: título (A con B y C vacías), encabezado 'Día' y filas de horarios"""
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append([efector.upper()])
+    for numero in range(cantidad_agendas):
+        hoja.append([generar_titulo(aleatorio), None, None, 'Efector' if numero == 0 else efector])
+        hoja.append(['Día', 'Hora inicio', 'Hora fin', efector])
+        for dia, inicio, fin in generar_horarios(aleatorio):
+            hoja.append([dia, inicio, fin, efector])
+    libro.save(ruta)
+
+
+def escribir_excel_odontologico(ruta: str, cantidad_agendas: int, aleatorio: random.Random):
+    """Formato del Hospital Odontológico: encabezado del hospital y bloques agenda/horarios"""
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(['HOSPITAL ODONTOLOGICO SAN ISIDRO'])
+    for numero in range(cantidad_agendas):
+        titulo = aleatorio.choice(['RADIOLOGIA', 'ODONTOLOGÍA ADULTOS', 'ODONTOLOGIA PEDIATRICA', 'CIRUGIA']) + \
+            ' - ' + aleatorio.choice(['', 'DRA ', 'DR. ']) + aleatorio.choice(APELLIDOS) + ' ' + aleatorio.choice(NOMBRES)
+        titulo = romper_codificacion(titulo, aleatorio)
+        hoja.append([titulo, None, None, 'Efector' if numero == 0 else 'Hospital Odontologico'])
+        hoja.append(['Día', 'Hora inicio', 'Hora fin', 'Hospital Odontologico'])
+        for dia, inicio, fin in generar_horarios(aleatorio):
+            hoja.append([dia, inicio, fin, 'Hospital Odontologico'])
+    libro.save(ruta)
+
+
+def escribir_csv_hcsi(ruta: str, cantidad_filas: int, aleatorio: random.Random):
+    """Formato tabular del HCSI con las mismas columnas que el export real"""
+    columnas = ['Especialidadid', 'Especialidad', 'Subespecialidad', 'Profesional', 'Dia', 'Horario',
+                'TipoTurno', 'Duracion', '', 'Equipo', 'Validado por Emilio', 'Validado por CAT', 'Estado']
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(columnas)
+        for _ in range(cantidad_filas):
+            especialidad = aleatorio.choice(AREAS)
+            inicio = aleatorio.choice([7, 8, 9, 13, 14])
+            escritor.writerow([
+                aleatorio.randint(1, 200), especialidad,
+                aleatorio.choice(['GENERAL', 'GENERAL', 'ADULTOS', 'INFANTIL']),
+                aleatorio.choice(APELLIDOS) + ' ,' + aleatorio.choice(NOMBRES) if aleatorio.random() < 0.9 else '',
+                aleatorio.choice(DIAS_HCSI), f"{inicio:02d}:00 a {inicio + 4:02d}:00",
+                aleatorio.choice(TIPOS_TURNO_HCSI), '15 min.', '', '', 'FALSE', 'FALSE', '',
+            ])
+
+
+def generar_escala(directorio_salida: str, escala: int, semilla: int = 42) -> str:
+    """Genera el juego completo de archivos para una escala; devuelve su directorio de agendas"""
+    aleatorio = random.Random(semilla + escala)
+    directorio_escala = os.path.join(directorio_salida, f"escala_{escala}")
+    directorio_agendas = os.path.join(directorio_escala, 'agendas_originales')
+    os.makedirs(directorio_agendas, exist_ok=True)
+
+    for efector, nombre_archivo in EFECTORES:
+        escribir_excel_general(os.path.join(directorio_agendas, nombre_archivo), efector,
+                               AGENDAS_POR_ARCHIVO * escala, aleatorio)
+    escribir_excel_odontologico(os.path.join(directorio_agendas, ARCHIVO_ODONTOLOGICO),
+                                AGENDAS_POR_ARCHIVO * escala, aleatorio)
+    escribir_csv_hcsi(os.path.join(directorio_escala, 'Agendas HCSI.csv'), FILAS_HCSI * escala, aleatorio)
+    return directorio_agendas
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Genera agendas sintéticas para benchmarks")
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10, 100],
+                        help="Factores de escala a generar (por defecto 1 10 100)")
+    parser.add_argument('--salida', default=os.path.join(script_dir, '..', 'datos', 'sinteticos'),
+                        help="Directorio donde se crean las carpetas escala_N")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    for escala in args.escalas:
+        print(f"🛠️  Generando escala {escala}x...")
+        directorio_agendas = generar_escala(args.salida, escala, args.semilla)
+        print(f"✅ Archivos en: {directorio_agendas}")
+
+
+if __name__ == "__main__":
+    main()
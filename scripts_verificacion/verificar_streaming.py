@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Verifica el modo streaming (iter_batches / --streaming) sobre agendas sintéticas.
+
+Con un CSV del HCSI de varios bloques (tamano_bloque_hcsi chico) comprueba que:
+- el HCSI sale en varios lotes, secuencial, con procesos de trabajo y al reutilizar
+  las particiones del manifiesto;
+- los lotes concatenados dan lo mismo que procesar_directorio;
+- el CSV escrito lote a lote es idéntico al de exportar_consolidado.
+
+Sale con código 1 si alguna comprobación falla.
+
+Uso:
+    python verificar_streaming.py
+    python verificar_streaming.py --tamano-bloque 50 --jobs 2
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))
+
+from agendas import AgendaNormalizer, compactar_consolidado  # noqa: E402
+from generar_agendas_sinteticas import generar_escala  # noqa: E402
+
+
+def lotes_hcsi(lotes) -> int:
+    """Cantidad de lotes que vienen del HCSI"""
+    return sum(1 for lote in lotes if (lote['efector'] == 'HCSI').all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica que el HCSI salga por bloques en modo streaming")
+    parser.add_argument('--tamano-bloque', type=int, default=100, help="Filas por bloque del HCSI")
+    parser.add_argument('--jobs', type=int, default=2, help="Procesos para la corrida en paralelo")
+    args = parser.parse_args()
+
+    fallas = []
+
+    def comprobar(condicion: bool, descripcion: str):
+        print(f"   {'✅' if condicion else '❌'} {descripcion}")
+        if not condicion:
+            fallas.append(descripcion)
+
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        directorio_agendas = generar_escala(directorio_temporal, 1)
+        filas_hcsi = len(pd.read_csv(os.path.join(os.path.dirname(directorio_agendas), 'Agendas HCSI.csv')))
+        bloques_esperados = -(-filas_hcsi // args.tamano_bloque)
+        directorio_manifiesto = os.path.join(directorio_temporal, 'manifiesto')
+        print(f"🔍 HCSI sintético de {filas_hcsi} filas en bloques de {args.tamano_bloque}")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            referencia = AgendaNormalizer().procesar_directorio(directorio_agendas)
+            normalizador = AgendaNormalizer(tamano_bloque_hcsi=args.tamano_bloque)
+            secuencial = list(normalizador.iter_batches(directorio_agendas,
+                                                        directorio_manifiesto=directorio_manifiesto))
+            paralelo = list(normalizador.iter_batches(directorio_agendas, jobs=args.jobs))
+            reutilizado = list(normalizador.iter_batches(directorio_agendas,
+                                                         directorio_manifiesto=directorio_manifiesto))
+            reutilizados = normalizador.estadisticas_incremental['reutilizados']
+
+        print("\n📊 Lotes del HCSI:")
+        comprobar(lotes_hcsi(secuencial) == bloques_esperados,
+                  f"secuencial: {lotes_hcsi(secuencial)} lotes (esperados {bloques_esperados})")
+        comprobar(lotes_hcsi(paralelo) == bloques_esperados,
+                  f"con {args.jobs} procesos: {lotes_hcsi(paralelo)} lotes")
+        comprobar(reutilizados > 0 and lotes_hcsi(reutilizado) == bloques_esperados,
+                  f"desde particiones ({reutilizados} fuentes reutilizadas): {lotes_hcsi(reutilizado)} lotes")
+
+        print("\n📊 Resultado:")
+        referencia_texto = referencia.astype(str)
+        for nombre, lotes in [('secuencial', secuencial), ('paralelo', paralelo), ('particiones', reutilizado)]:
+            consolidado = compactar_consolidado(pd.concat(lotes, ignore_index=True))
+            comprobar(consolidado.astype(str).equals(referencia_texto),
+                      f"lotes concatenados ({nombre}) = procesar_directorio")
+
+        archivo_consolidado = os.path.join(directorio_temporal, 'consolidado', 'agendas_consolidadas.csv')
+        archivo_lotes = os.path.join(directorio_temporal, 'lotes', 'agendas_consolidadas.csv')
+        os.makedirs(os.path.dirname(archivo_consolidado))
+        os.makedirs(os.path.dirname(archivo_lotes))
+        with contextlib.redirect_stdout(io.StringIO()):
+            AgendaNormalizer().exportar_consolidado(referencia, archivo_consolidado, formatos=('csv',))
+            normalizador.exportar_lotes(normalizador.iter_batches(directorio_agendas), archivo_lotes,
+                                        formatos=('csv',))
+        with open(archivo_consolidado, 'rb') as a, open(archivo_lotes, 'rb') as b:
+            comprobar(a.read() == b.read(), "CSV por lotes idéntico al de exportar_consolidado")
+
+    if fallas:
+        print(f"\n❌ {len(fallas)} comprobaciones fallaron")
+        sys.exit(1)
+    print("\n✅ El streaming entrega el HCSI por bloques con el mismo resultado")
+
+
+if __name__ == "__main__":
+    main()
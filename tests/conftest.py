@@ -0,0 +1,21 @@
+"""
+Fixtures compartidas de las pruebas: agendas sintéticas generadas con
+scripts_verificacion/generar_agendas_sinteticas.py (escala 1x, semilla fija).
+"""
+
+import os
+import sys
+
+import pytest
+
+directorio_repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, directorio_repo)
+sys.path.insert(0, os.path.join(directorio_repo, 'scripts_verificacion'))
+
+from generar_agendas_sinteticas import generar_escala  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def directorio_sintetico(tmp_path_factory) -> str:
+    """Directorio de agendas sintéticas 1x (el CSV del HCSI queda en el directorio padre)"""
+    return generar_escala(str(tmp_path_factory.mktemp('sinteticos')), 1)
@@ -0,0 +1,59 @@
+"""
+Equivalencia del parser (lo que verifica scripts_verificacion/comparar_parser.py)
+sobre las agendas sintéticas: el agendas.py actual contra el del primer commit,
+y la corrida con hojas cortadas en fragmentos contra la secuencial.
+"""
+
+import numpy as np
+import pytest
+
+import agendas
+from comparar_parser import (cargar_referencia, comparar_filas, comparar_fragmentado, componentes_titulo,
+                             primer_commit, procesar_en_silencio)
+
+
+@pytest.fixture(scope='module')
+def modulo_referencia(tmp_path_factory):
+    return cargar_referencia(primer_commit(), str(tmp_path_factory.mktemp('referencia')))
+
+
+@pytest.fixture(scope='module')
+def consolidados(modulo_referencia, directorio_sintetico):
+    """Consolidado de la referencia y del actual, como texto"""
+    return (procesar_en_silencio(modulo_referencia.AgendaNormalizer(), directorio_sintetico),
+            procesar_en_silencio(agendas.AgendaNormalizer(), directorio_sintetico))
+
+
+def test_consolidado_igual_a_referencia(consolidados):
+    df_referencia, df_actual = consolidados
+    assert len(df_referencia) > 0
+    assert comparar_filas(df_referencia, df_actual) == []
+
+
+def test_titulos_iguales_a_referencia(modulo_referencia, consolidados):
+    normalizador_referencia = modulo_referencia.AgendaNormalizer()
+    normalizador_actual = agendas.AgendaNormalizer()
+    titulos = set()
+    for df in consolidados:
+        titulos.update(df.loc[df['efector'] != 'HCSI', 'nombre_original_agenda'])
+    divergencias = [(titulo, componentes_titulo(normalizador_referencia, titulo),
+                     componentes_titulo(normalizador_actual, titulo))
+                    for titulo in sorted(titulos)]
+    assert titulos
+    assert [d for d in divergencias if d[1] != d[2]] == []
+
+
+def test_fragmentos_cortan_en_titulos():
+    es_titulo = np.zeros(1000, dtype=bool)
+    es_titulo[::7] = True
+    fragmentos = agendas._fragmentos_hoja(es_titulo, 4, filas_minimas=100)
+    assert len(fragmentos) == 4
+    assert fragmentos[0][0] == 0 and fragmentos[-1][1] == len(es_titulo)
+    for (_, fin), (inicio, _) in zip(fragmentos[:-1], fragmentos[1:]):
+        assert fin == inicio and es_titulo[inicio]
+    # Una hoja chica no se corta
+    assert agendas._fragmentos_hoja(es_titulo, 4, filas_minimas=600) == [(0, len(es_titulo))]
+
+
+def test_fragmentado_identico_a_secuencial(directorio_sintetico):
+    assert comparar_fragmentado(directorio_sintetico, 3, filas_minimas=50) == []
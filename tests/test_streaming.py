@@ -0,0 +1,74 @@
+"""
+Modo streaming (lo que verifica scripts_verificacion/verificar_streaming.py) sobre
+las agendas sintéticas: el HCSI sale en varios lotes y el resultado es el mismo
+que el de procesar_directorio.
+"""
+
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from agendas import AgendaNormalizer, compactar_consolidado
+from verificar_streaming import lotes_hcsi
+
+TAMANO_BLOQUE = 100
+
+
+@pytest.fixture(scope='module')
+def corridas(directorio_sintetico, tmp_path_factory):
+    """Lotes secuenciales, con procesos de trabajo y desde particiones, más la referencia"""
+    directorio_manifiesto = str(tmp_path_factory.mktemp('manifiesto'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        referencia = AgendaNormalizer().procesar_directorio(directorio_sintetico)
+        normalizador = AgendaNormalizer(tamano_bloque_hcsi=TAMANO_BLOQUE)
+        secuencial = list(normalizador.iter_batches(directorio_sintetico,
+                                                    directorio_manifiesto=directorio_manifiesto))
+        paralelo = list(normalizador.iter_batches(directorio_sintetico, jobs=2))
+        reutilizado = list(normalizador.iter_batches(directorio_sintetico,
+                                                     directorio_manifiesto=directorio_manifiesto))
+    return {
+        'referencia': referencia,
+        'secuencial': secuencial,
+        'paralelo': paralelo,
+        'particiones': reutilizado,
+        'reutilizados': normalizador.estadisticas_incremental['reutilizados'],
+    }
+
+
+def bloques_esperados(directorio_sintetico: str) -> int:
+    filas_hcsi = len(pd.read_csv(os.path.join(os.path.dirname(directorio_sintetico), 'Agendas HCSI.csv')))
+    return -(-filas_hcsi // TAMANO_BLOQUE)
+
+
+@pytest.mark.parametrize('corrida', ['secuencial', 'paralelo', 'particiones'])
+def test_hcsi_en_varios_lotes(corridas, directorio_sintetico, corrida):
+    esperados = bloques_esperados(directorio_sintetico)
+    assert esperados > 1
+    assert lotes_hcsi(corridas[corrida]) == esperados
+
+
+def test_particiones_reutilizadas(corridas):
+    assert corridas['reutilizados'] > 0
+
+
+@pytest.mark.parametrize('corrida', ['secuencial', 'paralelo', 'particiones'])
+def test_lotes_concatenados_igual_a_procesar_directorio(corridas, corrida):
+    consolidado = compactar_consolidado(pd.concat(corridas[corrida], ignore_index=True))
+    assert consolidado.astype(str).equals(corridas['referencia'].astype(str))
+
+
+def test_csv_por_lotes_identico(corridas, directorio_sintetico, tmp_path):
+    archivo_consolidado = tmp_path / 'consolidado' / 'agendas_consolidadas.csv'
+    archivo_lotes = tmp_path / 'lotes' / 'agendas_consolidadas.csv'
+    archivo_consolidado.parent.mkdir()
+    archivo_lotes.parent.mkdir()
+    normalizador = AgendaNormalizer(tamano_bloque_hcsi=TAMANO_BLOQUE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        AgendaNormalizer().exportar_consolidado(corridas['referencia'], str(archivo_consolidado),
+                                                formatos=('csv',))
+        normalizador.exportar_lotes(normalizador.iter_batches(directorio_sintetico), str(archivo_lotes),
+                                    formatos=('csv',))
+    assert archivo_consolidado.read_bytes() == archivo_lotes.read_bytes()